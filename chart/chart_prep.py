@@ -0,0 +1,127 @@
+import os
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# --- 차트 데이터 준비 (공용) ---
+# 쿼리 결과 크기와 관계없이 Plotly Figure(브라우저로 보내는 JSON)가 일정 크기를 넘지 않도록
+#   - 범주형: 상위 N개 + '기타' 하나로 묶음
+#   - 수치형 분포: 원본 행 대신 미리 계산한 구간(bin)별 개수만 전달
+#   - 점이 많은 선/산점도: WebGL(Scattergl) 사용
+#   - 완성된 Figure의 JSON 크기가 한도를 넘으면 텍스트 라벨을 빼고, 그래도 크면 그리지 않음
+CHART_TOP_N = int(os.environ.get("CHART_TOP_N", "20"))
+OTHERS_LABEL = "기타"
+HIST_BINS = int(os.environ.get("CHART_HIST_BINS", "30"))
+MAX_BARS = 200                      # 순서가 있는 x축(구간/날짜)에서 막대 대신 선으로 그리는 기준
+WEBGL_POINT_THRESHOLD = int(os.environ.get("CHART_WEBGL_POINTS", "5000"))
+FIGURE_MAX_BYTES = int(os.environ.get("CHART_MAX_FIGURE_KB", "1024")) * 1024
+
+def top_n_counts(values, n=CHART_TOP_N, label_col="label", count_col="count"):
+    """값별 개수 상위 n개와 나머지 합계('기타')를 DataFrame으로 반환합니다."""
+    counts = pd.Series(values).dropna().value_counts()
+    return top_n_frame(counts.rename_axis(label_col).reset_index(name=count_col), label_col, count_col, n)
+
+def top_n_frame(frame, x, y, n=CHART_TOP_N):
+    """이미 집계된 (x, y) 행에서 y 상위 n개만 남기고 나머지는 '기타' 한 행으로 합칩니다."""
+    if len(frame) <= n:
+        return frame
+    ordered = frame.sort_values(y, ascending=False)
+    top = ordered.head(n)
+    others = pd.DataFrame({x: [OTHERS_LABEL], y: [ordered[y].iloc[n:].sum()]})
+    return pd.concat([top[[x, y]].astype({x: str}), others], ignore_index=True)
+
+def histogram_bins(values, bins=HIST_BINS):
+    """수치형 값의 구간별 개수(bin_start, bin_end, count)를 계산합니다."""
+    numbers = pd.to_numeric(pd.Series(values), errors="coerce").dropna()
+    if numbers.empty:
+        return pd.DataFrame(columns=["bin_start", "bin_end", "count"])
+    counts, edges = np.histogram(numbers.to_numpy(dtype=float), bins=bins)
+    return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+
+def bar_chart(frame, x, y, title=None, labels=None, color=None, text=True):
+    """(이미 줄인) 집계 결과로 막대 차트를 만듭니다."""
+    return px.bar(frame, x=x, y=y, title=title, labels=labels, color=color, text_auto=text)
+
+def histogram_chart(values, title=None, bins=HIST_BINS, x_label=None):
+    """미리 계산한 구간별 개수로 히스토그램 모양의 막대 차트를 만듭니다. (원본 행은 전달하지 않음)"""
+    binned = histogram_bins(values, bins)
+    fig = go.Figure(go.Bar(x=(binned["bin_start"] + binned["bin_end"]) / 2, y=binned["count"],
+                           width=binned["bin_end"] - binned["bin_start"],
+                           customdata=binned[["bin_start", "bin_end"]],
+                           hovertemplate="%{customdata[0]:.4g} ~ %{customdata[1]:.4g}<br>count=%{y}<extra></extra>"))
+    fig.update_layout(title=title, bargap=0, xaxis_title=x_label, yaxis_title="count")
+    return cap_figure_size(fig)
+
+def line_chart(frame, x, y, title=None, labels=None):
+    """점이 많으면 WebGL(Scattergl)로 선 차트를 만듭니다."""
+    render_mode = "webgl" if len(frame) > WEBGL_POINT_THRESHOLD else "svg"
+    return px.line(frame, x=x, y=y, title=title, labels=labels, render_mode=render_mode)
+
+def xy_chart(frame, x, y, ordered=False, title=None, labels=None):
+    """집계된 (x, y) 결과에 맞는 차트를 만듭니다.
+    순서 없는 범주는 상위 N개 + '기타' 막대, 순서 있는 x(구간/날짜)는 막대 또는 (많으면) 선 차트.
+    크기 한도를 넘으면 None을 반환합니다."""
+    if not ordered:
+        fig = bar_chart(top_n_frame(frame, x, y), x, y, title=title, labels=labels)
+    elif len(frame) <= MAX_BARS:
+        fig = bar_chart(frame, x, y, title=title, labels=labels, text=len(frame) <= 50)
+    else:
+        fig = line_chart(frame, x, y, title=title, labels=labels)
+    return cap_figure_size(fig)
+
+def figure_bytes(fig):
+    """브라우저로 전송될 Figure JSON 크기(바이트)
+    측정값을 Figure에 기록해 두어 Figure 캐시가 크기를 재려고 다시 직렬화하지 않게 합니다. (측정 후에는 Figure를 수정하지 않음)"""
+    nbytes = len(fig.to_json().encode("utf-8"))
+    fig._json_bytes = nbytes
+    return nbytes
+
+def cap_figure_size(fig, max_bytes=FIGURE_MAX_BYTES):
+    """Figure JSON이 max_bytes를 넘으면 텍스트 라벨/hover 데이터를 빼고, 그래도 크면 None을 반환합니다."""
+    if fig is None or figure_bytes(fig) <= max_bytes:
+        return fig
+    fig.update_traces(text=None, texttemplate=None, customdata=None, hovertemplate=None)
+    return fig if figure_bytes(fig) <= max_bytes else None
+
+def _category_bar(values, label, title, top_n, color=True, min_bars=1):
+    counts = top_n_counts(values, top_n, label_col=label, count_col='Count')
+    if len(counts) < min_bars:
+        return None
+    fig = bar_chart(counts, label, 'Count', title=title, color=label if color else None)
+    if color:
+        fig.update_layout(showlegend=False)
+    return cap_figure_size(fig)
+
+def _category_pie(values, label, title, top_n, max_slices=8):
+    counts = top_n_counts(values, top_n, label_col=label, count_col='Count')
+    if not 1 < len(counts) < max_slices:
+        return None
+    return px.pie(counts, names=label, values='Count', title=title)
+
+def result_chart_specs(df, top_n=CHART_TOP_N, hist_bins=HIST_BINS):
+    """쿼리 결과에서 자동으로 그리는 표준 차트 목록 [(섹션 제목, 차트 이름, builder, spec)]
+    spec은 차트 종류와 설정(상위 N개, 구간 수)으로, Figure 캐시 키에 함께 넣어 설정이 바뀌면 다시 만들게 합니다."""
+    specs = []
+    if 'status' in df.columns:
+        specs.append(("Status Distribution", "status_bar", lambda: _category_bar(df['status'], 'Status', "Count by Status", top_n),
+                      ("bar", top_n)))
+        specs.append(("Status Distribution", "status_pie", lambda: _category_pie(df['status'], 'Status', "Proportion by Status", top_n),
+                      ("pie", top_n)))
+    if 'result' in df.columns:
+        specs.append(("Result Distribution", "result_bar", lambda: _category_bar(df['result'], 'Result', "Count by Result", top_n),
+                      ("bar", top_n)))
+    if 'owner' in df.columns: # 담당자가 많아도 상위 N개 + 기타
+        specs.append(("Count by Owner", "owner_bar",
+                      lambda: _category_bar(df['owner'], 'Owner', "Count by Owner", top_n, color=False, min_bars=2),
+                      ("bar", top_n)))
+    numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
+    if 'id' in numeric_cols and len(numeric_cols) > 1:
+        numeric_cols.remove('id')
+    for num_col in numeric_cols:
+        def build_histogram(num_col=num_col):
+            valid_num_data = df[num_col].dropna()
+            if valid_num_data.nunique() <= 1: return None
+            return histogram_chart(valid_num_data, title=f"Histogram of {num_col}", bins=hist_bins, x_label=num_col) # 구간별 개수만 전달
+        specs.append((f"Distribution of {num_col}", f"histogram({num_col})", build_histogram, ("histogram", hist_bins)))
+    return specs
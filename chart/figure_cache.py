@@ -0,0 +1,99 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# --- Plotly Figure 캐시 ---
+# 쿼리 결과가 그대로인데 다른 위젯 입력으로 스크립트가 다시 실행될 때 같은 차트를 다시 만들지 않도록
+# (DataFrame 지문, 차트 이름/옵션) 키로 완성된 Figure를 보관합니다.
+# 메모리 한도(FIGURE_CACHE_MAX_MB)를 넘으면 가장 오래 사용하지 않은 Figure부터 제거합니다.
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get("FIGURE_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+def dataframe_fingerprint(df):
+    """컬럼 이름/타입과 값으로 만든 DataFrame 지문 (내용이 같으면 같은 값)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    try:
+        hashed = pd.util.hash_pandas_object(df, index=True)
+    except TypeError: # 리스트 등 해시할 수 없는 값이 있는 컬럼
+        hashed = pd.util.hash_pandas_object(df.astype(str), index=True)
+    digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+def figure_size(fig):
+    """Figure JSON 크기(바이트). chart_prep.figure_bytes로 이미 측정한 Figure는 다시 직렬화하지 않습니다."""
+    nbytes = getattr(fig, "_json_bytes", None)
+    return nbytes if nbytes is not None else len(fig.to_json().encode("utf-8"))
+
+class FigureCache:
+    """Figure JSON 크기 기준 LRU 캐시 + 차트 종류별 생성 시간 통계"""
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (fig, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._timings = {}              # 차트 이름 -> {"count", "total_ms", "max_ms", "last_ms"}
+
+    def get_or_build(self, fingerprint, name, builder, *spec):
+        """캐시된 Figure를 반환하고, 없으면 builder()로 만들어 저장합니다.
+        (Figure 또는 None, 캐시 적중 여부, 생성 시간 ms) 튜플을 반환합니다. 반환된 Figure는 수정하지 마세요."""
+        key = (fingerprint, name) + spec
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0], True, 0.0
+            self._stats["misses"] += 1
+        start = time.perf_counter()
+        fig = builder()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record_timing(name, elapsed_ms)
+        if fig is not None:
+            self._put(key, fig)
+        return fig, False, elapsed_ms
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries), bytes=self._bytes,
+                         timings={name: dict(t) for name, t in self._timings.items()})
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _put(self, key, fig):
+        nbytes = figure_size(fig)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (fig, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, old_bytes) = self._entries.popitem(last=False)
+                self._bytes -= old_bytes
+                self._stats["evictions"] += 1
+
+    def _record_timing(self, name, elapsed_ms):
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+            timing["count"] += 1
+            timing["total_ms"] += elapsed_ms
+            timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+            timing["last_ms"] = elapsed_ms
+
+_cache = FigureCache()
+
+def get_figure_cache():
+    """프로세스 전체에서 공유하는 Figure 캐시를 반환합니다."""
+    return _cache
@@ -1,6 +1,9 @@
 import streamlit as st
 import sys
 import os
+import time
+import importlib
+import datetime
 
 # 상대 경로를 사용하여 모듈 경로 추가
 current_dir = os.path.dirname(os.path.abspath(__file__)) #현재 파일이 있는 디렉토리 가져오기
@@ -10,75 +13,106 @@ module_paths = [
     os.path.join(current_dir, "rfpanal")
 ]
 for path in module_paths:
-    sys.path.append(path)
+    if path not in sys.path:
+        sys.path.append(path)
 
-import sqlagent1
-import sqlquery1
-import barchart1
-import fileupload1
-import fileupload2
-import pdfsplit1
-import pdfmerge1
-import extracturl1
-import scapp
+# --- 메뉴별 페이지 등록 ---
+# 각 메뉴의 탭 이름과 모듈 이름만 등록해두고, 실제 import는 해당 탭이 처음 사용될 때 수행합니다.
+# (google.generativeai, PyMuPDF, pdfplumber, xlwings 등 무거운 패키지를 시작 시 모두 불러오지 않기 위함)
+PAGE_REGISTRY = {
+    "제안관리": [
+        ("LLM조회", "sqlagent1"),
+        ("SQL조회", "sqlquery1"),
+        ("통계", "barchart1"),
+    ],
+    "파일관리": [
+        ("Read Files", "fileupload1"),
+        ("Upload Files", "fileupload2"),
+        ("PDF분할", "pdfsplit1"),
+        ("PDF병합", "pdfmerge1"),
+        ("URL추출", "extracturl1"),
+    ],
+    "요구사항분석": [
+        ("RFP분석", "scapp"),
+        ("쿼리 기록", "slowquery1"),  # 페이지별 쿼리 실행 기록 / 느린 쿼리
+    ],
+}
+
+@st.cache_resource
+def get_import_timings():
+    """모듈별 최초 import 소요 시간(초)을 저장하는 딕셔너리 (프로세스 단위로 유지)"""
+    return {}
+
+def load_page_module(module_name):
+    """페이지 모듈을 처음 사용할 때 import하고, 소요 시간을 기록합니다."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    get_import_timings()[module_name] = time.perf_counter() - start
+    return module
+
+# 버튼 key에는 "button"을 넣습니다. 버튼 값은 Session State API로 설정할 수 없으므로 복원하지 않습니다.
+BUTTON_KEY_MARKER = "button"
+
+def _is_restorable(key, value):
+    """Session State API로 다시 설정해도 되는 위젯 값인지 확인합니다.
+    (버튼, 파일 업로더, DataFrame 등은 제외. 업로드 파일은 각 페이지가 저장소 경로를 별도 키로 유지)"""
+    if isinstance(value, bool): # 체크박스/토글 값은 복원
+        return BUTTON_KEY_MARKER not in key
+    if isinstance(value, (str, int, float, datetime.date, datetime.time)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(_is_restorable(key, v) for v in value)
+    return False
+
+def preserve_inactive_page_state(active_module):
+    """렌더링되지 않는 페이지의 위젯 값이 Streamlit에 의해 정리되지 않도록 다시 설정합니다."""
+    page_keys = st.session_state.setdefault('_page_widget_keys', {})
+    for module_name, keys in page_keys.items():
+        if module_name == active_module:
+            continue
+        for key in keys:
+            if key in st.session_state and _is_restorable(key, st.session_state[key]):
+                st.session_state[key] = st.session_state[key]
+
+def run_page(module_name):
+    """페이지 모듈을 불러와 main()을 실행합니다. 오류는 화면에 표시합니다."""
+    keys_before = set(st.session_state.keys())
+    try:
+        module = load_page_module(module_name)
+        module.main()
+    except Exception as e:
+        st.error(f"{module_name} 모듈 실행 중 오류 발생: {e}")
+    # 이 페이지가 만든 세션 키를 기록 (다른 탭을 보는 동안 값 유지용)
+    new_keys = set(st.session_state.keys()) - keys_before
+    page_keys = st.session_state.setdefault('_page_widget_keys', {})
+    page_keys.setdefault(module_name, set()).update(new_keys)
 
 def main():
     st.sidebar.header("메뉴 선택")
-    option = st.sidebar.selectbox("옵션을 선택하세요.", ["제안관리", "파일관리", "요구사항분석"])
+    option = st.sidebar.selectbox("옵션을 선택하세요.", list(PAGE_REGISTRY.keys()))
 
-    if option == "제안관리":
-        tab1, tab2, tab3 = st.tabs(["LLM조회", "SQL조회", "통계"])
-        with tab1:
-            try:
-                sqlagent1.main()
-            except Exception as e:
-                st.error(f"sqlagent1 모듈 실행 중 오류 발생: {e}")
-        with tab2:
-            try:
-                sqlquery1.main()
-            except Exception as e:
-                st.error(f"sqlquery1 모듈 실행 중 오류 발생: {e}")
-        with tab3:
-            try:
-                barchart1.main()
-            except Exception as e:
-                st.error(f"barchart1 모듈 실행 중 오류 발생: {e}")
+    # st.tabs는 모든 탭의 내용을 매번 실행하므로, 선택된 탭 하나만 실행하도록 radio로 전환
+    pages = PAGE_REGISTRY[option]
+    labels = [label for label, _ in pages]
+    nav_key = f"page_tab_{option}"
+    for other in PAGE_REGISTRY:
+        other_key = f"page_tab_{other}"
+        if other_key != nav_key and other_key in st.session_state:
+            st.session_state[other_key] = st.session_state[other_key]  # 다른 메뉴의 탭 선택 유지
+    selected_label = st.radio("탭 선택", labels, horizontal=True, key=nav_key, label_visibility="collapsed")
+    module_name = dict(pages)[selected_label]
 
-    elif option == "파일관리":
-        tab11, tab12, tab13, tab14, tab15 = st.tabs(["Read Files", "Upload Files", "PDF분할", "PDF병합", "URL추출"])
-        with tab11:
-            try:
-                fileupload1.main()
-            except Exception as e:
-                st.error(f"fileupload1 모듈 실행 중 오류 발생: {e}")
-        with tab12:
-            try:
-                fileupload2.main()
-            except Exception as e:
-                st.error(f"fileupload2 모듈 실행 중 오류 발생: {e}")
-        with tab13:
-            try:
-                pdfsplit1.main()
-            except Exception as e:
-                st.error(f"fileupload2 모듈 실행 중 오류 발생: {e}")
-        with tab14:
-            try:
-                pdfmerge1.main()
-            except Exception as e:
-                st.error(f"fileupload2 모듈 실행 중 오류 발생: {e}")
-        with tab15:
-            try:
-                extracturl1.main()
-            except Exception as e:
-                st.error(f"fileupload2 모듈 실행 중 오류 발생: {e}")      
+    preserve_inactive_page_state(module_name)
+    run_page(module_name)
 
-    elif option == "요구사항분석":
-        tab5, tab6 = st.tabs(["RFP분석", "탭 6"])
-        with tab5:
-            scapp.main()
-        with tab6:
-            st.header("탭 6 내용")
-            st.write("옵션 3의 탭 6 내용입니다.")
+    # 모듈 import 소요 시간 표시 (콜드 스타트 확인용)
+    timings = get_import_timings()
+    if timings:
+        with st.sidebar.expander("모듈 로딩 시간"):
+            for module_name, elapsed in sorted(timings.items(), key=lambda x: -x[1]):
+                st.write(f"{module_name}: {elapsed * 1000:.0f} ms")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,137 @@
+import hashlib
+import time
+import pandas as pd
+from db_scbank import (CHK1_COLUMNS, bulk_insert_chunks, replace_table_chunks,
+                       iter_rows_with_hash, store_row_hashes, apply_row_changes)
+
+# --- CSV 대량 적재 (청크 스트리밍) ---
+# CSV 전체를 DataFrame으로 읽어 iterrows()로 튜플을 만드는 대신,
+# 필요한 컬럼만 청크 단위로 읽어 벡터 연산으로 튜플을 만들고 바로 executemany로 넘깁니다.
+CSV_CHUNK_SIZE = 50000
+
+def read_csv_header(file):
+    """CSV의 컬럼 이름만 읽어 소문자로 반환합니다. (파일 위치는 처음으로 되돌림)"""
+    file.seek(0)
+    columns = pd.read_csv(file, nrows=0).columns.str.strip().str.lower().tolist()
+    file.seek(0)
+    return columns
+
+def validate_csv_columns(file, required_cols=CHK1_COLUMNS):
+    """필수 컬럼 중 CSV에 없는 컬럼 목록을 반환합니다. (없으면 빈 리스트)"""
+    csv_cols = read_csv_header(file)
+    return [col for col in required_cols if col not in csv_cols]
+
+def preview_csv(file, nrows=5):
+    """미리보기용으로 앞부분 몇 행만 읽습니다."""
+    file.seek(0)
+    df = pd.read_csv(file, nrows=nrows, dtype=str, keep_default_na=False)
+    file.seek(0)
+    return df
+
+def iter_csv_chunks(file, required_cols=CHK1_COLUMNS, chunksize=CSV_CHUNK_SIZE):
+    """필수 컬럼만 읽어(projection) 청크별 DataFrame을 yield합니다.
+    모든 값을 문자열로 읽고 빈 칸은 ''로 두어 fillna('')와 같은 결과를 냅니다."""
+    wanted = set(required_cols)
+    file.seek(0)
+    reader = pd.read_csv(file, usecols=lambda c: c.strip().lower() in wanted,
+                         dtype=str, keep_default_na=False, chunksize=chunksize)
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        yield chunk[required_cols]
+
+def iter_insert_tuples(file, required_cols=CHK1_COLUMNS, chunksize=CSV_CHUNK_SIZE):
+    """청크마다 INSERT용 튜플 목록을 만들어 yield합니다."""
+    for chunk in iter_csv_chunks(file, required_cols, chunksize):
+        yield list(chunk.itertuples(index=False, name=None))
+
+def ingest_csv(file, table_name="chk1_table", db_path=None, chunksize=CSV_CHUNK_SIZE, progress_callback=None):
+    """CSV를 청크 단위로 읽어 한 트랜잭션으로 적재합니다.
+    성공 시 삽입한 행 수, 실패 시 None을 반환합니다. (progress_callback(행 수, 경과 초))"""
+    return bulk_insert_chunks(iter_insert_tuples(file, chunksize=chunksize), table_name,
+                              db_path=db_path, progress_callback=progress_callback)
+
+def replace_with_csv(file, table_name="chk1_table", db_path=None, chunksize=CSV_CHUNK_SIZE, progress_callback=None):
+    """CSV 데이터로 테이블 전체를 원자적으로 교체합니다. (shadow 테이블 적재 후 RENAME)
+    성공 시 삽입한 행 수, 실패 시 None을 반환하며 실패해도 기존 데이터는 그대로 남습니다."""
+    return replace_table_chunks(iter_insert_tuples(file, chunksize=chunksize), table_name,
+                                db_path=db_path, progress_callback=progress_callback)
+
+# --- Upsert (변경분만 반영) ---
+# 자연키(기본: cat1~cat5 + desc)로 CSV 행과 기존 행을 짝지은 뒤, 행 내용 해시를 비교하여
+# 추가/변경/삭제된 행만 한 트랜잭션으로 반영합니다. 기존 행의 해시는 chk1_row_hash에 저장해 두고 재사용합니다.
+UPSERT_DEFAULT_KEY = ['cat1', 'cat2', 'cat3', 'cat4', 'cat5', 'desc']
+DIFF_PREVIEW_ROWS = 20
+
+def row_hash(values):
+    """문자열 값 목록의 해시를 반환합니다. (구분자 \\x1f로 연결)"""
+    return hashlib.blake2b("\x1f".join(values).encode("utf-8"), digest_size=16).hexdigest()
+
+def _normalize(values):
+    """DB 값과 CSV 값을 같은 형태로 비교하기 위해 None은 '', 나머지는 문자열로 변환합니다."""
+    return tuple('' if v is None else str(v) for v in values)
+
+def upsert_csv(file, key_cols=UPSERT_DEFAULT_KEY, delete_missing=True, db_path=None,
+               chunksize=CSV_CHUNK_SIZE, progress_callback=None):
+    """CSV와 chk1_table을 자연키로 비교하여 변경분만 반영합니다.
+
+    delete_missing=True이면 CSV에 없는 기존 행(및 같은 키의 중복 행)을 삭제합니다.
+    성공 시 diff 요약 딕셔너리, 실패 시 None을 반환합니다.
+    """
+    start = time.perf_counter()
+    key_idx = [CHK1_COLUMNS.index(col) for col in key_cols]
+
+    # 1) 기존 행: 자연키 해시 -> (id, 내용 해시)
+    existing = {}
+    duplicate_ids = []       # DB 안에서 같은 자연키를 가진 두 번째 이후 행
+    missing_hashes = []      # 아직 해시가 저장되지 않은 행 (다른 경로로 추가/수정된 행)
+    for batch in iter_rows_with_hash(db_path=db_path):
+        for row, content_hash in batch:
+            values = _normalize(row[1:])
+            if content_hash is None:
+                content_hash = row_hash(values)
+                missing_hashes.append((row[0], content_hash))
+            key = row_hash([values[i] for i in key_idx])
+            if key in existing: duplicate_ids.append(row[0])
+            else: existing[key] = (row[0], content_hash)
+    if missing_hashes:
+        store_row_hashes(missing_hashes, db_path=db_path)
+
+    # 2) CSV 행을 청크 단위로 비교
+    inserts, updates = [], []
+    seen_keys = set()
+    unchanged = csv_duplicates = processed = 0
+    for chunk in iter_insert_tuples(file, chunksize=chunksize):
+        for values in chunk:
+            values = _normalize(values)
+            key = row_hash([values[i] for i in key_idx])
+            if key in seen_keys: # CSV 안의 중복 키는 첫 행만 사용
+                csv_duplicates += 1
+                continue
+            seen_keys.add(key)
+            content_hash = row_hash(values)
+            match = existing.get(key)
+            if match is None: inserts.append((content_hash, values))
+            elif match[1] != content_hash: updates.append((match[0], content_hash, values))
+            else: unchanged += 1
+        processed += len(chunk)
+        if progress_callback: progress_callback(processed, time.perf_counter() - start)
+
+    delete_ids = []
+    if delete_missing:
+        delete_ids = [item_id for key, (item_id, _) in existing.items() if key not in seen_keys] + duplicate_ids
+
+    # 3) 변경분만 한 트랜잭션으로 반영
+    if (inserts or updates or delete_ids) and not apply_row_changes(inserts, updates, delete_ids, db_path=db_path):
+        return None
+    return {
+        "added": len(inserts),
+        "changed": len(updates),
+        "removed": len(delete_ids),
+        "unchanged": unchanged,
+        "csv_rows": processed,
+        "csv_duplicates": csv_duplicates,
+        "elapsed": time.perf_counter() - start,
+        "added_preview": [values for _, values in inserts[:DIFF_PREVIEW_ROWS]],
+        "changed_preview": [(item_id, *values) for item_id, _, values in updates[:DIFF_PREVIEW_ROWS]],
+        "removed_preview": delete_ids[:DIFF_PREVIEW_ROWS],
+    }
@@ -1,14 +1,336 @@
 import sqlite3
+import os
+import threading
+import queue
+import time
+from concurrent.futures import Future
 
-# 데이터베이스 연결 및 커서 생성
-# check_same_thread=False는 Streamlit과 함께 사용할 때 필요합니다.
-conn = sqlite3.connect(r"D:\lhhkms\streamlit_test\todo_app\data.db", check_same_thread=False)
-c = conn.cursor()
+# --- 데이터베이스 연결 관리 ---
+# 기본 DB 경로는 환경 변수 SCBANK_DB_PATH로 바꿀 수 있으며, scapp에서는 사이드바에 입력한 경로를 넘깁니다.
+DEFAULT_DB_PATH = os.environ.get("SCBANK_DB_PATH", r"D:\lhhkms\streamlit_test\todo_app\data.db")
+
+# 연결마다 적용할 PRAGMA 설정
+# - WAL: 읽기와 쓰기가 서로 막지 않도록 함 (여러 세션이 동시에 조회 가능)
+# - mmap_size / cache_size: 조회 성능 향상 (cache_size 음수는 KiB 단위)
+# - busy_timeout: 다른 연결이 쓰는 중이면 바로 실패하지 않고 대기 (ms)
+SQLITE_PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 268435456),   # 256MB
+    ("cache_size", -65536),     # 64MB
+    ("busy_timeout", 5000),
+    ("temp_store", "MEMORY"),
+]
+
+_local = threading.local()        # 스레드별 {db_path: connection}
+_all_connections = set()           # 종료 시 닫기 위한 열린 연결 (스레드가 끝나 닫힌 연결은 빠짐)
+_connections_lock = threading.Lock()
+
+def _close_connection(conn):
+    with _connections_lock:
+        _all_connections.discard(conn)
+    try: conn.close()
+    except Exception as e: print(f"연결 종료 중 오류 발생: {e}")
+
+class _ThreadConnections(dict):
+    """스레드 하나의 {db_path: connection}.
+    Streamlit은 재실행마다 새 스레드에서 스크립트를 실행하므로, 스레드가 끝나
+    thread-local 값이 정리될 때 그 스레드의 연결도 닫습니다. (열린 연결 수가 재실행마다 늘지 않도록)"""
+
+    def __del__(self):
+        for conn in self.values():
+            _close_connection(conn)
+
+def _resolve_db_path(db_path=None):
+    """db_path가 없으면 기본 경로를 사용합니다."""
+    return db_path or DEFAULT_DB_PATH
+
+def _open_connection(db_path):
+    """새 SQLite 연결을 열고 PRAGMA를 적용합니다."""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    for name, value in SQLITE_PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    with _connections_lock:
+        _all_connections.add(conn)
+    return conn
+
+def get_connection(db_path=None):
+    """현재 스레드 전용 연결을 DB 경로별로 반환합니다. (없으면 새로 생성)
+    Streamlit 세션마다 스레드가 다르므로 세션끼리 커서를 공유하지 않습니다."""
+    db_path = _resolve_db_path(db_path)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = _ThreadConnections()
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = _open_connection(db_path)
+    return conn
+
+def close_all_connections():
+    """열려 있는 모든 연결을 닫습니다. (애플리케이션 종료 시 호출)"""
+    stop_write_queues()
+    with _connections_lock:
+        connections = list(_all_connections)
+    for conn in connections:
+        _close_connection(conn)
+    _local.conns = _ThreadConnections()
+
+# --- 쓰기 큐 (Group Commit) ---
+# 행 하나마다 commit(fsync)하지 않고, 단일 writer 스레드가 대기 중인 INSERT/UPDATE를 모아
+# WRITE_BATCH_MAX_WAIT 초 또는 WRITE_BATCH_MAX_ROWS 행마다 한 트랜잭션으로 commit합니다.
+WRITE_BATCH_MAX_ROWS = 200
+WRITE_BATCH_MAX_WAIT = 0.005   # 5ms
+WRITE_ACK_TIMEOUT = 30         # add_data 등이 commit 완료를 기다리는 최대 시간(초)
+
+CHK1_COLUMNS = ['cat1', 'cat2', 'cat3', 'cat4', 'cat5', 'desc', 'owner', 'action', 'status', 'result', 'memo']
+
+class WriteQueue:
+    """DB 경로 하나에 대한 단일 writer 스레드와 요청 큐.
+
+    submit()은 Future를 반환하며, 요청이 포함된 배치가 commit되면
+    INSERT는 lastrowid, UPDATE/DELETE는 rowcount를 결과로 설정합니다.
+    """
+
+    def __init__(self, db_path, max_rows=WRITE_BATCH_MAX_ROWS, max_wait=WRITE_BATCH_MAX_WAIT):
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "rows": 0, "errors": 0,
+                       "last_commit_ms": 0.0, "max_commit_ms": 0.0, "total_commit_ms": 0.0}
+        self._thread = threading.Thread(target=self._run, name=f"db_writer:{db_path}", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params=()):
+        """쓰기 요청을 큐에 넣고 Future를 반환합니다."""
+        future = Future()
+        self._queue.put((sql, params, future))
+        return future
+
+    def stop(self, timeout=5):
+        """남은 요청을 처리한 뒤 writer 스레드를 종료합니다."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """큐 길이와 commit 지연 통계를 반환합니다."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_commit_ms"] = stats["total_commit_ms"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop_after = False
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop_after = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+            if stop_after:
+                return
+
+    def _commit_batch(self, batch):
+        conn = get_connection(self.db_path)  # writer 스레드 전용 연결
+        start = time.perf_counter()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sql, params, future in batch:
+                # 요청별 SAVEPOINT: 한 행이 실패해도 나머지 배치는 commit
+                conn.execute("SAVEPOINT write_item")
+                try:
+                    cur = conn.execute(sql, params)
+                    conn.execute("RELEASE write_item")
+                    result = cur.lastrowid if sql.lstrip().upper().startswith("INSERT") else cur.rowcount
+                    results.append((future, result, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_item")
+                    conn.execute("RELEASE write_item")
+                    results.append((future, None, e))
+            conn.commit()
+        except Exception as e:
+            print(f"쓰기 배치 commit 중 오류 발생: {e}")
+            try: conn.rollback()
+            except Exception as rb_err: print(f"롤백 실패: {rb_err}")
+            results = [(future, None, e) for _, _, future in batch]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["rows"] += len(batch)
+            self._stats["errors"] += sum(1 for _, _, err in results if err is not None)
+            self._stats["last_commit_ms"] = elapsed_ms
+            self._stats["max_commit_ms"] = max(self._stats["max_commit_ms"], elapsed_ms)
+            self._stats["total_commit_ms"] += elapsed_ms
+        for future, result, err in results:
+            if err is not None: future.set_exception(err)
+            else: future.set_result(result)
+
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+def get_write_queue(db_path=None):
+    """DB 경로별 WriteQueue를 반환합니다. (없으면 writer 스레드 시작)"""
+    db_path = _resolve_db_path(db_path)
+    with _write_queues_lock:
+        wq = _write_queues.get(db_path)
+        if wq is None:
+            wq = _write_queues[db_path] = WriteQueue(db_path)
+        return wq
+
+def get_write_stats(db_path=None):
+    """쓰기 큐의 queue_depth, batches, rows, commit 지연(ms) 통계를 반환합니다."""
+    return get_write_queue(db_path).stats()
+
+def stop_write_queues():
+    """모든 writer 스레드를 종료합니다."""
+    with _write_queues_lock:
+        queues = list(_write_queues.values())
+        _write_queues.clear()
+    for wq in queues:
+        wq.stop()
 
 # --- 테이블 관리 ---
-def create_table():
-    """taskstable 테이블이 없으면 생성합니다."""
-    c.execute('''CREATE TABLE IF NOT EXISTS chk1_table(
+# --- 집계 테이블 (대시보드용) ---
+# 대시보드가 매번 전체 행을 읽어 value_counts() 하지 않도록, 트리거로 컬럼 값별 행 수를 유지합니다.
+# chk1_summary(dim, value, cnt): dim은 컬럼 이름, '*'은 전체 행 수 (value='*'). NULL 값은 집계하지 않음.
+SUMMARY_DIMS = ['status', 'result', 'owner', 'cat1', 'cat2', 'cat3', 'cat4', 'cat5']
+
+def _summary_rebuild_sql():
+    """chk1_table 전체를 다시 집계하는 SQL 목록"""
+    statements = ["DELETE FROM chk1_summary",
+                  "INSERT INTO chk1_summary(dim, value, cnt) SELECT '*', '*', COUNT(*) FROM chk1_table"]
+    for dim in SUMMARY_DIMS:
+        statements.append(f"""INSERT INTO chk1_summary(dim, value, cnt)
+                              SELECT '{dim}', {dim}, COUNT(*) FROM chk1_table WHERE {dim} IS NOT NULL GROUP BY {dim}""")
+    return statements
+
+def _summary_migration():
+    """집계 테이블과 INSERT/DELETE/UPDATE 트리거를 만드는 SQL 목록"""
+    def incr(dim, ref, delta):
+        # 행이 없으면 새로 만들고, 있으면 cnt에 delta를 더함 (WHERE는 UPSERT 구문 구분을 위해 필요)
+        return (f"INSERT INTO chk1_summary(dim, value, cnt) SELECT '{dim}', {ref}, {delta} WHERE {ref} IS NOT NULL "
+                f"ON CONFLICT(dim, value) DO UPDATE SET cnt = cnt + ({delta});")
+    on_insert = [incr('*', "'*'", 1)] + [incr(dim, f"new.{dim}", 1) for dim in SUMMARY_DIMS]
+    on_delete = [incr('*', "'*'", -1)] + [incr(dim, f"old.{dim}", -1) for dim in SUMMARY_DIMS]
+    statements = [
+        "CREATE TABLE IF NOT EXISTS chk1_summary(dim TEXT NOT NULL, value TEXT NOT NULL, cnt INTEGER NOT NULL, PRIMARY KEY(dim, value)) WITHOUT ROWID",
+        "CREATE TRIGGER IF NOT EXISTS chk1_summary_ai AFTER INSERT ON chk1_table BEGIN " + " ".join(on_insert) + " END",
+        "CREATE TRIGGER IF NOT EXISTS chk1_summary_ad AFTER DELETE ON chk1_table BEGIN " + " ".join(on_delete)
+        + " DELETE FROM chk1_summary WHERE cnt <= 0 AND dim != '*'; END",
+    ]
+    for dim in SUMMARY_DIMS: # 값이 실제로 바뀐 컬럼만 갱신
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS chk1_summary_au_{dim} AFTER UPDATE OF {dim} ON chk1_table "
+            f"WHEN old.{dim} IS NOT new.{dim} BEGIN {incr(dim, f'old.{dim}', -1)} {incr(dim, f'new.{dim}', 1)} "
+            f"DELETE FROM chk1_summary WHERE dim = '{dim}' AND cnt <= 0; END")
+    return statements + _summary_rebuild_sql()
+
+# 스키마 마이그레이션: (버전, [SQL 목록]) 순서대로 적용하고 PRAGMA user_version에 현재 버전을 기록합니다.
+# 기존 DB도 create_table() 호출 시 필요한 버전까지 자동으로 업그레이드됩니다.
+# 새 변경은 기존 항목을 고치지 말고 다음 버전 번호로 추가하세요.
+MIGRATIONS = [
+    (1, [
+        # 대시보드/기본 쿼리(WHERE status = ...) 및 Gemini 생성 쿼리의 필터/그룹 컬럼 인덱스
+        # status 단독 조회는 (status, owner) 복합 인덱스의 선두 컬럼으로 처리됩니다.
+        "CREATE INDEX IF NOT EXISTS idx_chk1_status_owner ON chk1_table(status, owner)",
+        "CREATE INDEX IF NOT EXISTS idx_chk1_owner ON chk1_table(owner)",
+        "CREATE INDEX IF NOT EXISTS idx_chk1_result ON chk1_table(result)",
+        "CREATE INDEX IF NOT EXISTS idx_chk1_cat1 ON chk1_table(cat1)",
+        "CREATE INDEX IF NOT EXISTS idx_chk1_cat2 ON chk1_table(cat2)",
+        "CREATE INDEX IF NOT EXISTS idx_chk1_cat3 ON chk1_table(cat3)",
+        "CREATE INDEX IF NOT EXISTS idx_chk1_cat4 ON chk1_table(cat4)",
+        "CREATE INDEX IF NOT EXISTS idx_chk1_cat5 ON chk1_table(cat5)",
+    ]),
+    (2, [
+        # desc/action/memo 전문 검색용 FTS5 테이블 (chk1_table을 content로 사용하여 텍스트를 중복 저장하지 않음)
+        # unicode61 토크나이저 + 접두어 검색으로 한글 조사가 붙은 단어도 찾을 수 있게 함
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS chk1_fts USING fts5(
+               "desc", action, memo, content='chk1_table', content_rowid='id', tokenize='unicode61')''',
+        # chk1_table 변경 시 FTS 인덱스를 동기화하는 트리거
+        '''CREATE TRIGGER IF NOT EXISTS chk1_fts_ai AFTER INSERT ON chk1_table BEGIN
+               INSERT INTO chk1_fts(rowid, "desc", action, memo) VALUES (new.id, new."desc", new.action, new.memo);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS chk1_fts_ad AFTER DELETE ON chk1_table BEGIN
+               INSERT INTO chk1_fts(chk1_fts, rowid, "desc", action, memo) VALUES ('delete', old.id, old."desc", old.action, old.memo);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS chk1_fts_au AFTER UPDATE OF "desc", action, memo ON chk1_table BEGIN
+               INSERT INTO chk1_fts(chk1_fts, rowid, "desc", action, memo) VALUES ('delete', old.id, old."desc", old.action, old.memo);
+               INSERT INTO chk1_fts(rowid, "desc", action, memo) VALUES (new.id, new."desc", new.action, new.memo);
+           END''',
+        # 기존 데이터로 FTS 인덱스 생성
+        "INSERT INTO chk1_fts(chk1_fts) VALUES ('rebuild')",
+    ]),
+    (3, [
+        # CSV Upsert용 행 내용 해시 (chk1_table 스키마는 그대로 두고 별도 테이블에 보관)
+        # 다른 경로로 행이 수정/삭제되면 트리거가 해시를 지워, 다음 Upsert 때 다시 계산되도록 함
+        "CREATE TABLE IF NOT EXISTS chk1_row_hash(id INTEGER PRIMARY KEY, content_hash TEXT NOT NULL)",
+        '''CREATE TRIGGER IF NOT EXISTS chk1_row_hash_au AFTER UPDATE ON chk1_table BEGIN
+               DELETE FROM chk1_row_hash WHERE id = old.id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS chk1_row_hash_ad AFTER DELETE ON chk1_table BEGIN
+               DELETE FROM chk1_row_hash WHERE id = old.id;
+           END''',
+    ]),
+    (4, _summary_migration()),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(db_path=None):
+    """DB에 기록된 스키마 버전(PRAGMA user_version)을 반환합니다."""
+    return get_connection(db_path).execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(db_path=None):
+    """아직 적용되지 않은 마이그레이션을 한 트랜잭션씩 적용하고, 적용된 경우 ANALYZE를 실행합니다.
+    적용한 마이그레이션 버전 목록을 반환합니다."""
+    conn = get_connection(db_path)
+    current = get_schema_version(db_path)
+    applied = []
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # 다른 세션이 먼저 적용했을 수 있으므로 잠금을 잡은 뒤 버전을 다시 확인
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                conn.rollback()
+                continue
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            applied.append(version)
+            print(f"스키마 마이그레이션 v{version} 적용 완료.")
+        except sqlite3.Error as e:
+            print(f"스키마 마이그레이션 v{version} 적용 중 오류 발생: {e}")
+            try: conn.rollback()
+            except Exception as rb_err: print(f"롤백 실패: {rb_err}")
+            raise
+    if applied:
+        conn.execute("ANALYZE") # 새 인덱스에 대한 통계 수집 (쿼리 플래너가 인덱스를 선택하도록)
+        conn.commit()
+    return applied
+
+def create_table(db_path=None):
+    """chk1_table 테이블이 없으면 생성하고, 인덱스 등 스키마 마이그레이션을 적용합니다."""
+    conn = get_connection(db_path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS chk1_table(
                     id INTEGER PRIMARY KEY,
                     cat1 TEXT,
                     cat2 TEXT,
@@ -22,48 +344,152 @@ def create_table():
                     result TEXT,
                     memo TEXT
                 )''')
+    conn.commit()
+    if get_schema_version(db_path) < SCHEMA_VERSION:
+        migrate(db_path)
 
 # --- 데이터 추가 (Create) ---
-def add_data(cat1, cat2, cat3, cat4, cat5, desc, owner, action, status, result, memo):
-    """새로운 항목을 데이터베이스 chk1_table 추가합니다. (SQL 인젝션 안전)"""
-    try:
-        # 파라미터화된 쿼리 (?) 를 사용하여 SQL 인젝션 방지
-        # INSERT 문에 새로운 컬럼들과 해당 값 플레이스홀더 추가 (총 11개)
-        c.execute('''INSERT INTO chk1_table(
+def add_data_async(cat1, cat2, cat3, cat4, cat5, desc, owner, action, status, result, memo, db_path=None):
+    """새 항목 INSERT를 쓰기 큐에 넣고 Future(결과: 새 id)를 반환합니다."""
+    # 파라미터화된 쿼리 (?) 를 사용하여 SQL 인젝션 방지
+    return get_write_queue(db_path).submit('''INSERT INTO chk1_table(
                         cat1, cat2, cat3, cat4, cat5,
                         desc, owner, action, status, result, memo
                      ) VALUES (?,?,?,?,?,?,?,?,?,?,?)''',
                   (cat1, cat2, cat3, cat4, cat5, desc, owner, action, status, result, memo))
-        conn.commit() # 변경 사항 저장
+
+def add_data(cat1, cat2, cat3, cat4, cat5, desc, owner, action, status, result, memo, db_path=None):
+    """새로운 항목을 데이터베이스 chk1_table 추가합니다. (SQL 인젝션 안전)
+    쓰기 큐를 통해 다른 요청과 함께 commit되며, commit 완료 후 새 id를 반환합니다."""
+    try:
+        future = add_data_async(cat1, cat2, cat3, cat4, cat5, desc, owner, action, status, result, memo, db_path=db_path)
+        new_id = future.result(timeout=WRITE_ACK_TIMEOUT) # commit 완료까지 대기
         print("데이터 추가 완료") # 콘솔 확인용 로그 (선택 사항)
+        return new_id
     except Exception as e:
         print(f"데이터 추가 중 오류 발생: {e}") # 오류 발생 시 로그 출력
+        return None
+
+# --- 데이터 수정 (Update) ---
+def update_data_async(item_id, db_path=None, **fields):
+    """ID에 해당하는 행의 일부 컬럼을 수정하는 UPDATE를 쓰기 큐에 넣고 Future(결과: rowcount)를 반환합니다."""
+    unknown = [col for col in fields if col not in CHK1_COLUMNS]
+    if unknown or not fields:
+        raise ValueError(f"수정할 수 없는 컬럼입니다: {unknown or '(없음)'}")
+    set_clause = ", ".join(f"{col}=?" for col in fields)
+    return get_write_queue(db_path).submit(f"UPDATE chk1_table SET {set_clause} WHERE id=?",
+                                           (*fields.values(), item_id))
+
+def update_data(item_id, db_path=None, **fields):
+    """ID에 해당하는 행을 수정합니다. 성공 시 True, 해당 ID가 없거나 오류 시 False를 반환합니다."""
+    try:
+        rowcount = update_data_async(item_id, db_path=db_path, **fields).result(timeout=WRITE_ACK_TIMEOUT)
+        return rowcount > 0
+    except Exception as e:
+        print(f"ID {item_id} 수정 중 오류 발생: {e}")
+        return False
 
 # --- 데이터 조회 (Read) - 오류 처리 추가 버전 ---
-def view_all_data():
+def view_all_data(db_path=None):
     """모든 항목 데이터를 데이터베이스에서 조회합니다."""
     try:
-        c.execute('SELECT * FROM chk1_table')
-        data = c.fetchall() # 모든 결과 가져오기
+        data = get_connection(db_path).execute('SELECT * FROM chk1_table').fetchall() # 모든 결과 가져오기
         return data
     except Exception as e:
         print(f"데이터 조회 중 오류 발생: {e}")
         return [] # 오류 발생 시 빈 리스트 반환 또는 다른 처리
 
-def view_all_task_names():
+# --- 페이지 단위 조회 (Keyset Pagination) ---
+# OFFSET 대신 "WHERE id > 마지막 id ORDER BY id LIMIT n" 방식으로 조회하므로
+# 뒤쪽 페이지도 기본키 인덱스로 바로 찾아가며, 메모리에는 한 페이지만 올라갑니다.
+DEFAULT_PAGE_SIZE = 100
+
+def view_data_page(after_id=0, limit=DEFAULT_PAGE_SIZE, db_path=None):
+    """id가 after_id보다 큰 행을 id 순서로 최대 limit개 조회합니다.
+    다음 페이지는 반환된 마지막 행의 id를 after_id로 넘겨 조회합니다."""
+    try:
+        return get_connection(db_path).execute(
+            'SELECT * FROM chk1_table WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit)).fetchall()
+    except Exception as e:
+        print(f"페이지 조회 중 오류 발생 (after_id={after_id}): {e}")
+        return []
+
+def iter_data_batches(batch_size=1000, db_path=None):
+    """전체 데이터를 batch_size 행씩 나누어 yield하는 제너레이터입니다."""
+    after_id = 0
+    while True:
+        batch = view_data_page(after_id, batch_size, db_path=db_path)
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1][0]
+
+def count_data(db_path=None):
+    """chk1_table 전체 행 수를 반환합니다. (집계 테이블에서 조회)"""
+    try:
+        row = get_connection(db_path).execute("SELECT cnt FROM chk1_summary WHERE dim = '*'").fetchone()
+        return row[0] if row else 0
+    except Exception as e:
+        print(f"행 수 조회 중 오류 발생: {e}")
+        return 0
+
+def get_summary_counts(dim, db_path=None):
+    """집계 테이블에서 컬럼(dim) 값별 행 수를 [(value, count), ...] 형태로 많은 순으로 반환합니다.
+    (전체 행을 읽지 않으므로 비용은 값의 종류 수에 비례)"""
+    if dim not in SUMMARY_DIMS:
+        raise ValueError(f"집계하지 않는 컬럼입니다: {dim}")
+    try:
+        return get_connection(db_path).execute(
+            "SELECT value, cnt FROM chk1_summary WHERE dim = ? ORDER BY cnt DESC, value", (dim,)).fetchall()
+    except Exception as e:
+        print(f"'{dim}'별 집계 조회 중 오류 발생: {e}")
+        return []
+
+def get_status_counts(db_path=None):
+    """status별 행 수를 [(status, count), ...] 형태로 반환합니다."""
+    return get_summary_counts('status', db_path=db_path)
+
+# --- 전문 검색 (FTS5) ---
+SEARCH_COLUMNS = ['id', 'cat1', 'owner', 'status', 'snippet', 'rank']
+
+def _build_fts_query(text):
+    """사용자 입력을 FTS5 MATCH 식으로 변환합니다.
+    단어마다 큰따옴표로 감싸 특수문자를 그대로 검색하고, 접두어(*) 검색으로 AND 결합합니다."""
+    terms = [t.replace('"', '""') for t in text.split() if t.strip()]
+    return " ".join(f'"{t}"*' for t in terms)
+
+def search_data(text, limit=50, mark=("**", "**"), db_path=None):
+    """desc/action/memo에서 text를 전문 검색하여 관련도(bm25) 순으로 반환합니다.
+    각 행은 SEARCH_COLUMNS 순서이며, snippet에는 일치한 부분이 mark로 감싸져 있습니다."""
+    fts_query = _build_fts_query(text or "")
+    if not fts_query:
+        return []
+    try:
+        return get_connection(db_path).execute(
+            '''SELECT c.id, c.cat1, c.owner, c.status,
+                      snippet(chk1_fts, -1, ?, ?, '…', 16) AS snippet,
+                      bm25(chk1_fts) AS rank
+               FROM chk1_fts JOIN chk1_table c ON c.id = chk1_fts.rowid
+               WHERE chk1_fts MATCH ?
+               ORDER BY rank LIMIT ?''', (mark[0], mark[1], fts_query, limit)).fetchall()
+    except sqlite3.Error as e:
+        print(f"전문 검색 중 오류 발생 ('{text}'): {e}")
+        return []
+
+def view_all_task_names(db_path=None):
     """모든 고유한 할 일 이름(task)을 조회합니다."""
-    c.execute('SELECT DISTINCT task FROM chk1_table')
-    data = c.fetchall()
+    data = get_connection(db_path).execute('SELECT DISTINCT task FROM chk1_table').fetchall()
     return data
 
 # --- 데이터 조회 (Read) --- 부분 또는 파일의 적절한 위치에 추가하세요 ---
 
-def get_data_by_id(item_id):
+def get_data_by_id(item_id, db_path=None):
     """
     chk1_table에서 고유 ID를 기준으로 특정 행(row) 데이터를 조회합니다.
 
     Args:
         item_id (int): 조회할 항목의 ID.
+        db_path (str, optional): DB 파일 경로. 없으면 기본 경로 사용.
 
     Returns:
         tuple: 해당 ID의 데이터 행을 담은 튜플. 데이터가 없으면 None을 반환합니다.
@@ -71,9 +497,9 @@ def get_data_by_id(item_id):
     """
     try:
         # 파라미터화된 쿼리 (?) 를 사용하여 SQL 인젝션 방지
-        c.execute("SELECT * FROM chk1_table WHERE id=?", (item_id,))
+        cur = get_connection(db_path).execute("SELECT * FROM chk1_table WHERE id=?", (item_id,))
         # fetchone()을 사용하여 ID에 해당하는 하나의 행만 가져옵니다.
-        data = c.fetchone()
+        data = cur.fetchone()
         return data # 데이터가 있으면 튜플, 없으면 None 반환
     except sqlite3.Error as e:
         # 데이터베이스 관련 오류 발생 시 로그 출력 및 None 반환
@@ -87,13 +513,13 @@ def get_data_by_id(item_id):
 # --------------------------------------------------------------------
 # 아래 함수들을 db_scbank.py 파일에 추가하세요.
 
-def delete_all_data(table_name="chk1_table"):
+def delete_all_data(table_name="chk1_table", db_path=None):
     """지정된 테이블의 모든 데이터를 삭제합니다."""
-    global conn, c # 전역 conn, c를 사용한다고 명시 (필요시)
+    conn = get_connection(db_path)
     try:
         # 테이블 이름 직접 사용 시 주의 (여기서는 고정값이므로 괜찮음)
         # 동적 테이블 이름 사용 시 SQL 인젝션 주의 필요
-        c.execute(f"DELETE FROM {table_name}")
+        conn.execute(f"DELETE FROM {table_name}")
         conn.commit()
         print(f"테이블 '{table_name}'의 모든 데이터 삭제 완료.")
         return True # 성공 시 True 반환
@@ -106,9 +532,9 @@ def delete_all_data(table_name="chk1_table"):
         print(f"'{table_name}' 데이터 삭제 중 예상치 못한 오류: {e}")
         return False
 
-def bulk_insert_data(data_to_insert, table_name="chk1_table"):
+def bulk_insert_data(data_to_insert, table_name="chk1_table", db_path=None):
     """지정된 테이블에 여러 행의 데이터를 한 번에 삽입합니다."""
-    global conn, c # 전역 conn, c를 사용한다고 명시 (필요시)
+    conn = get_connection(db_path)
     if not data_to_insert:
         print("삽입할 데이터가 없습니다.")
         return False
@@ -119,7 +545,7 @@ def bulk_insert_data(data_to_insert, table_name="chk1_table"):
                          desc, owner, action, status, result, memo
                      ) VALUES (?,?,?,?,?,?,?,?,?,?,?)''' # 11개 컬럼
     try:
-        c.executemany(insert_sql, data_to_insert)
+        conn.executemany(insert_sql, data_to_insert)
         conn.commit()
         print(f"'{table_name}' 테이블에 {len(data_to_insert)}개 행 삽입 완료.")
         return True # 성공 시 True 반환
@@ -131,7 +557,168 @@ def bulk_insert_data(data_to_insert, table_name="chk1_table"):
     except Exception as e:
         print(f"'{table_name}' 대량 삽입 중 예상치 못한 오류: {e}")
         return False
-    
+
+# 대량 적재 중에만 적용하는 PRAGMA (적재 후 SQLITE_PRAGMAS 값으로 복원)
+# - cache_size 확대: 인덱스 갱신 시 페이지 재읽기 감소
+# - wal_autocheckpoint=0: 적재 도중 체크포인트로 멈추지 않도록 하고, 끝난 뒤 한 번에 체크포인트
+BULK_LOAD_PRAGMAS = [
+    ("cache_size", -262144),    # 256MB
+    ("wal_autocheckpoint", 0),
+]
+
+def _begin_bulk_load(conn):
+    """대량 적재용 PRAGMA를 적용합니다."""
+    for name, value in BULK_LOAD_PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+
+def _end_bulk_load(conn):
+    """대량 적재용 PRAGMA를 원래 값으로 되돌리고 WAL 체크포인트를 시도합니다."""
+    for name, value in SQLITE_PRAGMAS:
+        if name in dict(BULK_LOAD_PRAGMAS): conn.execute(f"PRAGMA {name}={value}")
+    conn.execute("PRAGMA wal_autocheckpoint=1000")
+    try: conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    except sqlite3.Error as ck_err: print(f"체크포인트 실패: {ck_err}")
+
+def bulk_insert_chunks(chunks, table_name="chk1_table", db_path=None, progress_callback=None):
+    """튜플 목록(chunk)을 차례로 받아 하나의 트랜잭션에서 executemany로 삽입합니다.
+
+    전체 데이터를 한 번에 메모리에 올리지 않고 CSV 등을 청크 단위로 흘려보낼 때 사용합니다.
+    progress_callback(누적 행 수, 경과 초)는 청크마다 호출됩니다.
+    성공 시 삽입한 행 수, 실패 시(전체 롤백) None을 반환합니다.
+    """
+    conn = get_connection(db_path)
+    insert_sql = f'''INSERT INTO {table_name}(
+                         cat1, cat2, cat3, cat4, cat5,
+                         desc, owner, action, status, result, memo
+                     ) VALUES (?,?,?,?,?,?,?,?,?,?,?)''' # 11개 컬럼
+    total = 0
+    start = time.perf_counter()
+    try:
+        _begin_bulk_load(conn)
+        conn.execute("BEGIN IMMEDIATE") # 쓰기 잠금을 먼저 확보
+        for chunk in chunks:
+            conn.executemany(insert_sql, chunk)
+            total += len(chunk)
+            if progress_callback: progress_callback(total, time.perf_counter() - start)
+        conn.commit()
+        print(f"'{table_name}' 테이블에 {total}개 행 삽입 완료 ({time.perf_counter() - start:.1f}s).")
+        return total
+    except Exception as e:
+        print(f"'{table_name}' 청크 삽입 중 오류 발생 ({total}행 처리 후): {e}")
+        try: conn.rollback() # 오류 발생 시 전체 롤백
+        except Exception as rb_err: print(f"롤백 실패: {rb_err}")
+        return None
+    finally:
+        _end_bulk_load(conn)
+
+# --- Replace 적재 (Shadow 테이블 교체) ---
+# chk1_table을 DELETE 후 다시 INSERT하면 그 사이 조회하는 세션이 빈 테이블을 보게 되고,
+# 삽입이 실패하면 테이블이 빈 채로 남습니다. 대신 인덱스/트리거가 없는 shadow 테이블에 적재한 뒤
+# 하나의 트랜잭션 안에서 기존 테이블을 DROP하고 shadow를 RENAME한 다음 인덱스/트리거를 한 번에 다시 만듭니다.
+# WAL 모드에서 다른 세션은 commit 전까지 기존 데이터를 그대로 봅니다.
+
+# 테이블 교체 후 다시 계산해야 하는 파생 데이터 (FTS 인덱스 등)
+REBUILD_AFTER_REPLACE = [
+    "INSERT INTO chk1_fts(chk1_fts) VALUES ('rebuild')",
+    "DELETE FROM chk1_row_hash", # id가 새로 부여되므로 이전 해시는 무효
+] + _summary_rebuild_sql()
+
+def replace_table_chunks(chunks, table_name="chk1_table", db_path=None, progress_callback=None):
+    """chunks의 데이터로 테이블 전체를 원자적으로 교체합니다.
+    성공 시 삽입한 행 수, 실패 시(기존 데이터 유지) None을 반환합니다."""
+    conn = get_connection(db_path)
+    shadow_name = f"{table_name}_shadow"
+    insert_sql = f'''INSERT INTO {shadow_name}(
+                         cat1, cat2, cat3, cat4, cat5,
+                         desc, owner, action, status, result, memo
+                     ) VALUES (?,?,?,?,?,?,?,?,?,?,?)''' # 11개 컬럼
+    total = 0
+    start = time.perf_counter()
+    try:
+        _begin_bulk_load(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        # 기존 테이블 정의와 인덱스/트리거 정의를 그대로 가져와 교체 후 다시 생성
+        table_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone()[0]
+        dependent_sql = [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name=? AND type IN ('index', 'trigger') AND sql IS NOT NULL ORDER BY type, name",
+            (table_name,))]
+        conn.execute(f"DROP TABLE IF EXISTS {shadow_name}")
+        conn.execute(table_sql.replace(table_name, shadow_name, 1))
+        for chunk in chunks:
+            conn.executemany(insert_sql, chunk)
+            total += len(chunk)
+            if progress_callback: progress_callback(total, time.perf_counter() - start)
+        conn.execute(f"DROP TABLE {table_name}")
+        conn.execute(f"ALTER TABLE {shadow_name} RENAME TO {table_name}")
+        for sql in dependent_sql: # 인덱스는 적재가 끝난 뒤 한 번에 생성
+            conn.execute(sql)
+        if table_name == "chk1_table":
+            for sql in REBUILD_AFTER_REPLACE:
+                conn.execute(sql)
+        conn.execute(f"ANALYZE {table_name}") # 새 데이터 기준 통계로 쿼리 계획 갱신 (교체와 같은 트랜잭션)
+        conn.commit()
+        print(f"'{table_name}' 테이블을 {total}개 행으로 교체 완료 ({time.perf_counter() - start:.1f}s).")
+        return total
+    except Exception as e:
+        print(f"'{table_name}' 테이블 교체 중 오류 발생 ({total}행 처리 후, 기존 데이터 유지): {e}")
+        try: conn.rollback()
+        except Exception as rb_err: print(f"롤백 실패: {rb_err}")
+        return None
+    finally:
+        _end_bulk_load(conn)
+
+# --- Upsert (행 해시 비교 후 변경분만 반영) ---
+def iter_rows_with_hash(batch_size=5000, db_path=None):
+    """(id, cat1, ..., memo) 행과 저장된 content_hash(없으면 None)를 batch_size개씩 yield합니다."""
+    cur = get_connection(db_path).execute(
+        '''SELECT c.*, h.content_hash FROM chk1_table c
+           LEFT JOIN chk1_row_hash h ON h.id = c.id ORDER BY c.id''')
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield [(row[:-1], row[-1]) for row in rows]
+
+def store_row_hashes(id_hash_pairs, db_path=None):
+    """(id, content_hash) 목록을 chk1_row_hash에 저장합니다."""
+    conn = get_connection(db_path)
+    try:
+        conn.executemany("INSERT OR REPLACE INTO chk1_row_hash(id, content_hash) VALUES (?, ?)", id_hash_pairs)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"행 해시 저장 중 오류 발생: {e}")
+        try: conn.rollback()
+        except Exception as rb_err: print(f"롤백 실패: {rb_err}")
+
+def apply_row_changes(inserts, updates, delete_ids, db_path=None):
+    """Upsert 결과를 한 트랜잭션으로 반영합니다.
+    inserts: [(content_hash, (cat1, ..., memo)), ...]
+    updates: [(id, content_hash, (cat1, ..., memo)), ...]
+    delete_ids: [id, ...]
+    성공 시 True, 실패 시(전체 롤백) False를 반환합니다."""
+    conn = get_connection(db_path)
+    set_clause = ", ".join(f"{col}=?" for col in CHK1_COLUMNS)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for content_hash, values in inserts:
+            cur = conn.execute('''INSERT INTO chk1_table(
+                        cat1, cat2, cat3, cat4, cat5,
+                        desc, owner, action, status, result, memo
+                     ) VALUES (?,?,?,?,?,?,?,?,?,?,?)''', values)
+            conn.execute("INSERT OR REPLACE INTO chk1_row_hash(id, content_hash) VALUES (?, ?)", (cur.lastrowid, content_hash))
+        # UPDATE 트리거가 기존 해시를 지우므로 UPDATE 후에 새 해시를 저장
+        conn.executemany(f"UPDATE chk1_table SET {set_clause} WHERE id=?", [(*values, item_id) for item_id, _, values in updates])
+        conn.executemany("INSERT OR REPLACE INTO chk1_row_hash(id, content_hash) VALUES (?, ?)", [(item_id, h) for item_id, h, _ in updates])
+        conn.executemany("DELETE FROM chk1_table WHERE id=?", [(item_id,) for item_id in delete_ids])
+        conn.commit()
+        print(f"Upsert 반영 완료: 추가 {len(inserts)}, 변경 {len(updates)}, 삭제 {len(delete_ids)}")
+        return True
+    except Exception as e:
+        print(f"Upsert 반영 중 오류 발생: {e}")
+        try: conn.rollback()
+        except Exception as rb_err: print(f"롤백 실패: {rb_err}")
+        return False
+
 # def get_task(task):
 #     """특정 할 일 이름(task)에 해당하는 데이터를 조회합니다. (SQL 인젝션 안전)"""
 #     # 파라미터화된 쿼리 (?) 를 사용하여 SQL 인젝션 방지
@@ -165,4 +752,4 @@ def bulk_insert_data(data_to_insert, table_name="chk1_table"):
 
 # # 참고: 데이터베이스 연결을 닫는 함수도 추가할 수 있습니다. (애플리케이션 종료 시 호출)
 # # def close_db():
-# #    conn.close()
\ No newline at end of file
+# #    conn.close()
@@ -1,45 +1,74 @@
 import streamlit as st
 import pandas as pd
+import sys
+import os
+# sqlagent/chart 폴더의 공용 모듈(query_cache, chart_prep 등)을 사용하기 위해 경로 추가 (layout1.py 없이 단독 실행할 때)
+for _shared_dir in ("sqlagent", "chart"):
+    _shared_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), _shared_dir)
+    if _shared_dir not in sys.path: sys.path.append(_shared_dir)
 # db_scbank 모듈 import 시 주의사항 명시
-from db_scbank import * # 주의: 이 모듈의 함수들은 수정 필요 (테이블/컬럼 이름 일치, 보안, DB 경로 처리 등)
+from db_scbank import * # CRUD 함수들은 db_path 인자로 사이드바에서 입력한 DB 경로를 사용
+from csv_ingest import preview_csv, validate_csv_columns, ingest_csv, replace_with_csv, upsert_csv, UPSERT_DEFAULT_KEY # CSV 청크 단위 적재
 import streamlit.components.v1 as stc
 import datetime # 날짜 처리를 위해 추가
+import time
 
 # Data Viz Pkgs
 import plotly.express as px
+from chart_prep import result_chart_specs, CHART_TOP_N # 상위 N개/구간 집계, Figure 크기 제한
+from figure_cache import get_figure_cache, dataframe_fingerprint # 결과가 같으면 Figure 재사용
 
 # --- Gemini SQL Agent 관련 라이브러리 추가 ---
-import google.generativeai as genai
+from llm_provider import get_llm_provider, LLMError, DEFAULT_PROVIDER # LLM 백엔드 (Gemini 또는 로컬 스텁)
 import re
 import sqlite3 # 명시적으로 import
+from query_guard import run_guarded_query, QueryRejected, QueryTimeout # 실행 계획 검사 + 제한 시간/행 수
+from nl_sql_cache import get_nl_sql_cache, schema_fingerprint, is_valid_select # 자연어->SQL 캐시
+from schema_cache import get_db_schema, schema_digest # DB별 스키마 캐시 (프롬프트용 요약)
+from result_store import get_session_result_store # 세션별/페이지별 결과 저장소
+from llm_async import generate_with_deadline, generate_batch, LLM_CALL_TIMEOUT # 시간 제한/재시도/동시 호출
+from concurrent.futures import ThreadPoolExecutor
 
 # --- 데이터베이스 경로 및 테이블 이름 정의 ---
 # 하드코딩된 DB 경로 제거됨. 경로는 사이드바 입력을 통해 st.session_state.db_path 에 저장됨
 TABLE_NAME = "chk1_table" # 작업 대상 테이블
+BATCH_MAX_QUESTIONS = 50 # 배치 질문 모드에서 한 번에 처리할 최대 질문 수
+RESULT_HIST_BINS = 15 # 쿼리 결과 수치형 컬럼 히스토그램 구간 수
+# 배치 SELECT 병렬 실행용 풀 (스레드를 재사용하므로 get_connection의 스레드별 연결도 재사용됨)
+_batch_query_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="batch_query")
 
 # --- Gemini SQL Agent 및 차트 생성 함수들 ---
-MODEL_NAME = 'gemini-1.5-flash' # 사용할 모델 이름
+def build_sql_prompt(natural_language_query, table_name=None, schema_text=None):
+    """자연어 질문을 SQL 생성용 프롬프트로 변환 (schema_text: 스키마 캐시의 테이블/컬럼/인덱스 요약)"""
+    prompt = f"Generate **only** the SQL query (without any explanation, comments, or markdown like ```sql ... ```) for the table named '{table_name}' based on the following request: {natural_language_query}"
+    return f"SQLite schema:\n{schema_text}\n\n{prompt}" if schema_text else prompt
 
-def generate_sql_query(natural_language_query, table_name=None):
-    """자연어 쿼리를 SQL 쿼리로 변환 (Gemini API 사용)"""
-    if 'api_configured' not in st.session_state or not st.session_state.api_configured:
+def generate_sql_query(natural_language_query, table_name=None, conn=None):
+    """자연어 쿼리를 SQL 쿼리로 변환 (LLM 백엔드 사용, 같은 질문/스키마/모델이면 캐시된 SQL 사용)"""
+    provider = st.session_state.get('llm_provider')
+    if not st.session_state.get('api_configured') or provider is None:
          st.error("Gemini API 키가 설정되지 않았거나 유효하지 않습니다. 사이드바에서 확인해주세요.")
          return None
-    prompt = f"Generate **only** the SQL query (without any explanation, comments, or markdown like ```sql ... ```) for the table named '{table_name}' based on the following request: {natural_language_query}"
-    model = genai.GenerativeModel(MODEL_NAME)
+    nl_cache = get_nl_sql_cache()
+    schema_fp = schema_fingerprint(conn, table_name)
+    cached_sql = nl_cache.get(natural_language_query, table_name, schema_fp, provider.model_name)
+    if cached_sql:
+        st.caption("이전에 생성된 SQL을 재사용합니다. (Gemini 호출 생략)")
+        return cached_sql
     try:
-        response = model.generate_content(prompt)
-        if response.parts:
-            generated_text = response.text.strip()
-            if generated_text.upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
-                 return generated_text
-            else:
-                st.warning(f"Gemini가 유효한 SQL 쿼리를 생성하지 못했습니다. 응답: \"{generated_text}\"")
-                return None
+        schema_text = schema_digest(get_db_schema(conn=conn), table_name) if conn is not None else None
+        # 호출마다 시간 제한(LLM_CALL_TIMEOUT)과 일시적 오류 재시도 적용
+        generated_text = generate_with_deadline(provider, build_sql_prompt(natural_language_query, table_name, schema_text)).strip()
+        if generated_text.upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+             if is_valid_select(conn, generated_text): # 캐시에는 실행 가능한 SELECT만 저장 (배치 모드에서 재사용되므로)
+                 nl_cache.put(natural_language_query, table_name, schema_fp, provider.model_name, generated_text)
+             return generated_text
         else:
-            feedback = response.prompt_feedback if hasattr(response, 'prompt_feedback') else 'N/A'
-            st.error(f"Gemini API로부터 비어있는 응답을 받았습니다. (차단 사유 등: {feedback})")
+            st.warning(f"Gemini가 유효한 SQL 쿼리를 생성하지 못했습니다. 응답: \"{generated_text}\"")
             return None
+    except LLMError as e:
+        st.error(f"Gemini API 호출 중 오류 발생: {e}")
+        return None
     except Exception as e:
         st.error(f"Gemini API 호출 중 오류 발생: {e}")
         return None
@@ -51,6 +80,47 @@ def extract_sql_query(text):
     text = re.sub(r'\s*```$', '', text)
     return text.strip()
 
+# --- 배치 질문 처리 함수 ---
+def generate_sql_batch(questions, table_name, conn):
+    """여러 질문을 SQL로 동시에 변환. 질문별 {'question', 'sql', 'error', 'cached'} 목록을 반환"""
+    provider = st.session_state.get('llm_provider')
+    nl_cache = get_nl_sql_cache()
+    schema_fp = schema_fingerprint(conn, table_name)
+    results = [{'question': q, 'sql': nl_cache.get(q, table_name, schema_fp, provider.model_name), 'error': None, 'cached': False}
+               for q in questions]
+    for r in results: # 캐시 적중이어도 SELECT가 아니면 다시 생성
+        if r['sql'] and not r['sql'].strip().upper().startswith("SELECT"): r['sql'] = None
+    pending = [r for r in results if not r['sql']]
+    for r in results: r['cached'] = bool(r['sql'])
+    if pending: # 캐시에 없는 질문만 동시에 호출
+        schema_text = schema_digest(get_db_schema(conn=conn), table_name)
+        responses = generate_batch(provider, [build_sql_prompt(r['question'], table_name, schema_text) for r in pending])
+        for r, response in zip(pending, responses):
+            if isinstance(response, Exception):
+                r['error'] = f"Gemini API 호출 오류: {response}"; continue
+            sql = extract_sql_query(response)
+            if sql and sql.upper().startswith("SELECT"):
+                r['sql'] = sql
+                if is_valid_select(conn, sql): nl_cache.put(r['question'], table_name, schema_fp, provider.model_name, sql)
+            else: r['error'] = f"SELECT 쿼리가 생성되지 않았습니다. 응답: \"{response}\""
+    return results
+
+def _run_batch_select(db_path, sql_query):
+    """(작업 스레드에서 실행) 스레드 전용 연결로 SELECT 실행. (DataFrame, 캐시 적중, 소요 시간) 반환"""
+    result = run_guarded_query(get_connection(db_path), sql_query, db_path, source="scapp")
+    return result['df'], result['cache_hit'], result['elapsed']
+
+def run_select_batch(db_path, results):
+    """generate_sql_batch() 결과의 SELECT들을 병렬 실행하고 각 항목에 df/cache_hit/elapsed/error를 채움"""
+    futures = {id(r): _batch_query_pool.submit(_run_batch_select, db_path, r['sql']) for r in results if r['sql']}
+    for r in results:
+        future = futures.get(id(r))
+        if future is None: continue
+        try: r['df'], r['cache_hit'], r['elapsed'] = future.result()
+        except (QueryRejected, QueryTimeout) as e: r['error'] = f"쿼리가 실행되지 않았습니다: {e}"
+        except (sqlite3.Error, pd.errors.DatabaseError) as e: r['error'] = f"데이터베이스 오류: {e}"
+    return results
+
 # --- 차트 생성 헬퍼 함수 ---
 def generate_and_display_charts(df):
     """Analyzes the DataFrame and displays relevant charts inside an expander."""
@@ -62,78 +132,50 @@ def generate_and_display_charts(df):
             return
 
         chart_cols = st.columns(2) ; col_idx = 0
-
-        # Status 분포
-        if 'status' in df.columns:
-            valid_status_data = df['status'].dropna()
-            if not valid_status_data.empty:
-                with chart_cols[col_idx % 2]:
-                    st.markdown("##### Status Distribution")
-                    status_counts = valid_status_data.value_counts().reset_index()
-                    status_counts.columns = ['Status', 'Count']
-                    try:
-                        fig_bar = px.bar(status_counts, x='Status', y='Count', title="Count by Status", color='Status', text_auto=True)
-                        fig_bar.update_layout(showlegend=False) ; st.plotly_chart(fig_bar, use_container_width=True)
-                        if 1 < len(status_counts) < 8:
-                             fig_pie = px.pie(status_counts, names='Status', values='Count', title="Proportion by Status")
-                             st.plotly_chart(fig_pie, use_container_width=True)
-                        col_idx += 1
-                    except Exception as e: st.warning(f"Status 차트 생성 오류: {e}")
-
-        # Result 분포
-        if 'result' in df.columns:
-            valid_result_data = df['result'].dropna()
-            if not valid_result_data.empty:
-                with chart_cols[col_idx % 2]:
-                    st.markdown("##### Result Distribution")
-                    result_counts = valid_result_data.value_counts().reset_index()
-                    result_counts.columns = ['Result', 'Count']
-                    try:
-                        fig_bar = px.bar(result_counts, x='Result', y='Count', title="Count by Result", color='Result', text_auto=True)
-                        fig_bar.update_layout(showlegend=False) ; st.plotly_chart(fig_bar, use_container_width=True)
-                        col_idx += 1
-                    except Exception as e: st.warning(f"Result 차트 생성 오류: {e}")
-
-        # Owner 분포
-        if 'owner' in df.columns:
-            valid_owner_data = df['owner'].dropna()
-            if not valid_owner_data.empty:
-                owner_counts = valid_owner_data.value_counts()
-                if 1 < len(owner_counts) < 30:
-                    with chart_cols[col_idx % 2]:
-                        st.markdown("##### Count by Owner")
-                        owner_counts_df = owner_counts.reset_index()
-                        owner_counts_df.columns = ['Owner', 'Count']
-                        try:
-                            fig_bar = px.bar(owner_counts_df, x='Owner', y='Count', title="Count by Owner", text_auto=True)
-                            st.plotly_chart(fig_bar, use_container_width=True)
-                            col_idx += 1
-                        except Exception as e: st.warning(f"Owner 차트 생성 오류: {e}")
-
-        # 수치형 데이터 히스토그램
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns.tolist()
-        if 'id' in numeric_cols and len(numeric_cols) > 1:
-            try: numeric_cols.remove('id')
-            except ValueError: pass
-        for num_col in numeric_cols:
-            valid_num_data = df[num_col].dropna()
-            if valid_num_data.nunique() > 1:
-                with chart_cols[col_idx % 2]:
-                    st.markdown(f"##### Distribution of {num_col}")
-                    try:
-                        fig_hist = px.histogram(df, x=num_col, title=f"Histogram of {num_col}", nbins=15)
-                        st.plotly_chart(fig_hist, use_container_width=True)
-                        col_idx += 1
-                    except Exception as e: st.warning(f"{num_col} 히스토그램 생성 오류: {e}")
+        figure_cache = get_figure_cache()
+        fingerprint = dataframe_fingerprint(df) # 결과가 바뀌지 않았으면 이전에 만든 Figure 재사용
+        build_times = [] # (차트 이름, 생성 시간 ms, 캐시 적중)
+
+        def cached_figure(name, builder, *spec):
+            try:
+                fig, hit, elapsed_ms = figure_cache.get_or_build(fingerprint, name, builder, *spec)
+            except Exception as e:
+                st.warning(f"{name} 차트 생성 오류: {e}"); return None
+            build_times.append((name, elapsed_ms, hit))
+            return fig
+
+        # Status/Result/Owner 분포 + 수치형 히스토그램 (차트 설정(spec)을 캐시 키에 포함)
+        sections = {} # 섹션 제목 -> Figure 목록 (순서 유지)
+        for section, name, builder, spec in result_chart_specs(df, top_n=CHART_TOP_N, hist_bins=RESULT_HIST_BINS):
+            fig = cached_figure(name, builder, *spec)
+            if fig is not None: sections.setdefault(section, []).append(fig)
+        for section, figs in sections.items():
+            with chart_cols[col_idx % 2]:
+                st.markdown(f"##### {section}")
+                for fig in figs: st.plotly_chart(fig, use_container_width=True)
+            col_idx += 1
 
         if col_idx == 0: # 생성된 차트가 없을 경우
              st.info("현재 쿼리 결과에 대해 자동으로 생성할 수 있는 표준 차트가 없습니다.")
+        if build_times: # 어떤 차트가 오래 걸리는지 확인용
+            st.caption("차트 생성 시간: " + ", ".join(f"{name} {'캐시' if hit else f'{ms:.0f} ms'}" for name, ms, hit in build_times))
+            cache_stats = figure_cache.stats()
+            st.caption(f"Figure 캐시: 적중 {cache_stats['hits']} / 미적중 {cache_stats['misses']}, "
+                       f"{cache_stats['entries']}개 ({cache_stats['bytes'] / 1024 / 1024:.1f} MB)")
 
 
 # --- SQL 실행 및 결과/차트 표시 함수 ---
-def execute_sql_and_display(conn, sql_query):
-    """SQL 쿼리 실행 및 결과 표시 (SELECT 전용 + 결과 저장 + 차트 생성)"""
-    st.session_state.query_result_df = pd.DataFrame() # 새 쿼리 전 이전 결과 초기화
+def display_query_plan(result):
+    """run_guarded_query() 결과의 소요 시간, 전체 스캔 경고, 실행 계획 표시"""
+    st.caption(f"소요 시간 {result['elapsed'] * 1000:.0f} ms" + (f" · 예상 스캔 {result['est_rows']:,}행" if result['est_rows'] else ""))
+    for warning in result['warnings']: st.warning(f"인덱스를 사용하지 않는 조회: {warning}")
+    with st.expander("실행 계획 (EXPLAIN QUERY PLAN)"):
+        st.code("\n".join(result['plan']) or "(없음)")
+
+def execute_sql_and_display(conn, sql_query, llm_ms=None):
+    """SQL 쿼리 실행 및 결과 표시 (SELECT 전용 + 결과 저장). llm_ms: SQL 생성 시간 (쿼리 기록용)
+    차트는 main()에서 결과 저장소의 결과로 매 실행마다 그립니다. (Figure 캐시 사용)"""
+    get_session_result_store(st.session_state).drop("scapp") # 새 쿼리 전 이전 결과 초기화
     if not sql_query:
         st.warning("실행할 SQL 쿼리가 없습니다."); return
     st.write("---") ; st.write(f"실행될 SQL 쿼리:")
@@ -141,21 +183,37 @@ def execute_sql_and_display(conn, sql_query):
     try:
         if not sql_query.strip().upper().startswith("SELECT"):
              st.error("보안상의 이유로 이 에이전트에서는 **SELECT** 쿼리만 실행할 수 있습니다."); return
-        df = pd.read_sql_query(sql_query, conn)
-        st.session_state.query_result_df = df # 결과를 Session State에 저장
+        result = run_guarded_query(conn, sql_query, source="scapp", llm_ms=llm_ms) # 쿼리 기록 + 실행 계획 검사 + 제한 시간/행 수 (DB가 바뀌지 않았으면 캐시 사용)
+        df = result['df']
+        get_session_result_store(st.session_state).put("scapp", df) # 세션 결과 저장소에 저장 (한도 초과 시 Parquet로 내려보냄)
         with st.expander("쿼리 결과 보기", expanded=True):
             st.dataframe(df)
-            st.success(f"쿼리 성공! 총 {len(df)}개의 행이 반환되었습니다.")
-        # 차트 생성 및 표시 함수 호출
-        if not df.empty:
-             generate_and_display_charts(df) # 헬퍼 함수 호출
+            st.success(f"쿼리 성공! 총 {len(df)}개의 행이 반환되었습니다." + (" (캐시된 결과)" if result['cache_hit'] else ""))
+            if result['truncated']: st.warning(f"결과가 많아 처음 {len(df):,}행까지만 가져왔습니다.")
+        display_query_plan(result)
+    except (QueryRejected, QueryTimeout) as guard_err:
+        st.error(f"쿼리가 실행되지 않았습니다: {guard_err}")
     except sqlite3.Error as db_err:
         st.error(f"데이터베이스 오류 발생: {db_err}"); st.error(f"실행 시도된 쿼리: {sql_query}")
-        st.session_state.query_result_df = pd.DataFrame() # 오류 시 초기화
+        get_session_result_store(st.session_state).drop("scapp") # 오류 시 초기화
     except Exception as e:
         st.error(f"쿼리 실행 중 예외 발생: {e}"); st.error(f"실행 시도된 쿼리: {sql_query}")
-        st.session_state.query_result_df = pd.DataFrame() # 오류 시 초기화
-
+        get_session_result_store(st.session_state).drop("scapp") # 오류 시 초기화
+
+
+# --- CSV Upsert 결과 표시 함수 ---
+def display_upsert_diff(diff, file_name):
+    """upsert_csv()가 반환한 diff 요약(추가/변경/삭제/동일 건수와 일부 행)을 표시"""
+    st.success(f"'{file_name}' Upsert 완료 ({diff['elapsed']:.1f}s)")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("추가", diff['added']); m2.metric("변경", diff['changed'])
+    m3.metric("삭제", diff['removed']); m4.metric("동일", diff['unchanged'])
+    if diff['csv_duplicates']: st.warning(f"CSV 안에서 자연키가 중복된 {diff['csv_duplicates']}개 행은 첫 행만 반영했습니다.")
+    if diff['added_preview']:
+        st.write("추가된 행 (일부)"); st.dataframe(pd.DataFrame(diff['added_preview'], columns=CHK1_COLUMNS))
+    if diff['changed_preview']:
+        st.write("변경된 행 (일부)"); st.dataframe(pd.DataFrame(diff['changed_preview'], columns=['id'] + CHK1_COLUMNS))
+    if diff['removed_preview']: st.write(f"삭제된 ID (일부): {diff['removed_preview']}")
 
 # --- HTML 배너 ---
 HTML_BANNER = """
@@ -170,23 +228,27 @@ def main():
     stc.html(HTML_BANNER)
     # --- 세션 상태 초기화 ---
     if 'api_configured' not in st.session_state: st.session_state.api_configured = False
-    if 'query_result_df' not in st.session_state: st.session_state.query_result_df = pd.DataFrame()
     if 'db_path' not in st.session_state: st.session_state.db_path = None
 
-    # --- Gemini API 키 입력 (사이드바) ---
-    st.sidebar.subheader("Gemini API 설정")
-    api_key = st.sidebar.text_input("Gemini API 키", type="password", key="gemini_api_key_input", help="Gemini API 사용을 위해 키를 입력하세요.")
-    if api_key:
-        try:
-            genai.configure(api_key=api_key)
-            if not st.session_state.api_configured: st.sidebar.success("API 키가 입력/변경되었습니다.")
-            st.session_state.api_configured = True
-        except Exception as config_err:
-             if st.session_state.api_configured: st.sidebar.error(f"API 키 설정 중 오류 발생 가능성: {config_err}")
-             st.session_state.api_configured = False
+    # --- LLM 설정 (사이드바) ---
+    if DEFAULT_PROVIDER == "stub": # LLM_PROVIDER=stub: API 키 없이 로컬 스텁 사용 (부하 테스트용)
+        st.session_state.llm_provider = get_llm_provider(provider_name="stub")
+        st.session_state.api_configured = True
+        st.sidebar.caption(f"LLM 백엔드: stub ({st.session_state.llm_provider.model_name})")
     else:
-        if st.session_state.api_configured: st.sidebar.warning("API 키가 제거되었습니다.")
-        st.session_state.api_configured = False
+        st.sidebar.subheader("Gemini API 설정")
+        api_key = st.sidebar.text_input("Gemini API 키", type="password", key="gemini_api_key_input", help="Gemini API 사용을 위해 키를 입력하세요.")
+        if api_key:
+            try:
+                st.session_state.llm_provider = get_llm_provider(api_key=api_key)
+                if not st.session_state.api_configured: st.sidebar.success("API 키가 입력/변경되었습니다.")
+                st.session_state.api_configured = True
+            except Exception as config_err:
+                 if st.session_state.api_configured: st.sidebar.error(f"API 키 설정 중 오류 발생 가능성: {config_err}")
+                 st.session_state.api_configured = False
+        else:
+            if st.session_state.api_configured: st.sidebar.warning("API 키가 제거되었습니다.")
+            st.session_state.api_configured = False
 
     # --- Database Path Input (Sidebar) ---
     st.sidebar.divider()
@@ -199,7 +261,8 @@ def main():
     current_db_path = st.session_state.get('db_path')
     if db_path_input != current_db_path:
         st.session_state.db_path = db_path_input if db_path_input else None
-        st.session_state.query_result_df = pd.DataFrame() # 경로 변경 시 결과 초기화
+        get_session_result_store(st.session_state).drop("scapp") # 경로 변경 시 결과 초기화
+        st.session_state.view_all_cursors = [0] # 페이지 위치 초기화
         st.rerun() # 경로 변경 즉시 반영
     if st.session_state.get('db_path'): st.sidebar.caption(f"현재 DB 경로: {st.session_state.db_path}")
     else: st.sidebar.warning("데이터베이스 경로를 입력해주세요.")
@@ -209,9 +272,8 @@ def main():
     choice = st.sidebar.selectbox("Menu", menu, key="main_menu_selector")
 
     # --- DB 테이블 생성 확인 ---
-    # !!! 중요: db_scbank.py 수정 필요 !!!
     if st.session_state.get('db_path'):
-        try: create_table() # 이상적으로는 create_table(st.session_state.db_path)
+        try: create_table(st.session_state.db_path)
         except NameError: st.error("`db_scbank.py`에서 `create_table` 함수를 찾을 수 없거나 import되지 않았습니다.")
         except Exception as tbl_err: st.error(f"테이블 생성/확인 중 오류 발생: {tbl_err}. DB 경로 및 `db_scbank.py` 확인 필요.")
     # else: # 경로 미설정 시 메시지 표시 (선택적)
@@ -220,7 +282,6 @@ def main():
 
     # --- 메뉴별 화면 처리 ---
     if choice == "Create":
-        st.warning("Create 기능은 `db_scbank.py`가 사용자가 입력한 DB 경로를 사용하도록 수정되어야 정상 작동합니다.")
         if not st.session_state.get('db_path'):
             st.error("항목을 추가하려면 먼저 사이드바에서 데이터베이스 경로를 설정해주세요.")
         else:
@@ -242,12 +303,16 @@ def main():
 
             if st.button("Add Item", key="create_add_button"):
                  if desc_input:
-                     try: # 이상적으로는 add_data(st.session_state.db_path, ...)
-                         add_data(cat1=cat1_input, cat2=cat2_input, cat3=cat3_input, cat4=cat4_input, cat5=cat5_input, desc=desc_input, owner=owner_input, action=action_input, status=status_input, result=result_input, memo=memo_input)
-                         st.success(f"항목 '{desc_input[:30]}...' 추가 완료.")
+                     try:
+                         new_id = add_data(cat1=cat1_input, cat2=cat2_input, cat3=cat3_input, cat4=cat4_input, cat5=cat5_input, desc=desc_input, owner=owner_input, action=action_input, status=status_input, result=result_input, memo=memo_input, db_path=st.session_state.db_path)
+                         if new_id is not None: st.success(f"항목 '{desc_input[:30]}...' 추가 완료. (ID: {new_id})")
+                         else: st.error("데이터 추가 중 오류가 발생했습니다. 콘솔 로그를 확인하세요.")
                      except NameError: st.error("`db_scbank.py`에 `add_data` 함수가 없거나 import되지 않았습니다.")
                      except Exception as add_err: st.error(f"데이터 추가 중 오류 발생: {add_err}. `db_scbank.py` 확인 필요.")
                  else: st.warning("Description (desc) 필드는 비워둘 수 없습니다.")
+            with st.expander("쓰기 큐 상태 (Group Commit)"):
+                try: st.json(get_write_stats(st.session_state.db_path))
+                except Exception as stats_err: st.warning(f"쓰기 큐 통계 조회 오류: {stats_err}")
             st.divider()
             # --- CSV 파일 업로드 섹션 ---
             st.subheader("Bulk Upload from CSV")
@@ -257,44 +322,43 @@ def main():
                  else:
                      uploaded_file = st.file_uploader("Choose a CSV file", type=['csv'], key="create_csv_uploader")
                      if uploaded_file is not None:
-                         upload_option = st.radio("Select Upload Mode:", ('Append', 'Replace'), index=0, horizontal=True, key='upload_mode')
-                         if upload_option == 'Replace': st.warning("**경고:** 'Replace' 모드는 테이블의 **모든 기존 데이터를 삭제**하고 CSV 데이터로 대체합니다.")
+                         upload_option = st.radio("Select Upload Mode:", ('Append', 'Replace', 'Upsert'), index=0, horizontal=True, key='upload_mode')
+                         if upload_option == 'Upsert':
+                             st.caption("자연키가 같은 행끼리 비교하여 추가/변경/삭제된 행만 반영합니다.")
+                             upsert_key_cols = st.multiselect("자연키 컬럼", CHK1_COLUMNS, default=UPSERT_DEFAULT_KEY, key='upsert_key_cols')
+                             upsert_delete_missing = st.checkbox("CSV에 없는 기존 행 삭제", value=True, key='upsert_delete_missing')
+                         if upload_option == 'Replace': st.warning("**경고:** 'Replace' 모드는 테이블의 **모든 기존 데이터를** CSV 데이터로 대체합니다. (적재가 끝난 뒤 한 번에 교체되며, 실패 시 기존 데이터 유지)")
                          st.info(f"파일 '{uploaded_file.name}' 선택됨. 모드: '{upload_option}'. 버튼을 눌러 진행하세요.")
                          if st.button("Upload Data from CSV", key="create_csv_upload_button"):
-                             st.info("CSV 업로드 시 `db_scbank.py`에 정의된 `delete_all_data` 및 `bulk_insert_data` 함수를 사용합니다.")
                              try:
-                                 df = pd.read_csv(uploaded_file) ; st.dataframe(df.head())
-                                 required_db_cols = ['cat1', 'cat2', 'cat3', 'cat4', 'cat5', 'desc', 'owner', 'action', 'status', 'result', 'memo']
-                                 df.columns = df.columns.str.lower() ; csv_cols = df.columns.tolist()
-                                 missing_cols = [col for col in required_db_cols if col not in csv_cols]
+                                 st.dataframe(preview_csv(uploaded_file))
+                                 missing_cols = validate_csv_columns(uploaded_file)
                                  if missing_cols: st.error(f"CSV 파일에 필요한 컬럼이 없습니다: {', '.join(missing_cols)}")
                                  else:
-                                     st.success("CSV 컬럼 검증 완료.") ; data_to_insert = []
-                                     for index, row in df.fillna('').iterrows():
-                                         try: data_to_insert.append(tuple(row[col] for col in required_db_cols))
-                                         except KeyError as e: st.error(f"행 {index+2} 처리 오류: 컬럼 '{e}' 없음."); data_to_insert = [] ; break
-                                         except Exception as e: st.error(f"행 {index+2} 처리 오류: {e}"); data_to_insert = [] ; break
-                                     if data_to_insert:
-                                         st.info(f"{len(data_to_insert)}개 행 삽입 준비 완료.")
-                                         try: # --- db_scbank 함수 호출 ---
-                                             delete_success = True
+                                     st.success("CSV 컬럼 검증 완료.")
+                                     try: # --- csv_ingest 함수 호출 ---
+                                         progress_text = st.empty()
+                                         def show_progress(rows, elapsed):
+                                             progress_text.write(f"{rows:,}개 행 삽입 중... ({rows / max(elapsed, 1e-6):,.0f} rows/s)")
+                                         if upload_option == 'Upsert':
+                                             if not upsert_key_cols: st.error("자연키 컬럼을 하나 이상 선택하세요.")
+                                             else:
+                                                 diff = upsert_csv(uploaded_file, upsert_key_cols, upsert_delete_missing, db_path=st.session_state.db_path, progress_callback=show_progress)
+                                                 if diff is not None: display_upsert_diff(diff, uploaded_file.name)
+                                                 else: st.error("Upsert 작업 중 오류가 발생하여 완료되지 않았습니다. (전체 롤백, 기존 데이터 유지)")
+                                         else:
                                              if upload_option == 'Replace':
-                                                 st.write(f"모드: Replace. '{TABLE_NAME}' 테이블 데이터 삭제 중...")
-                                                 delete_success = delete_all_data(TABLE_NAME) # 이상적: delete_all_data(st.session_state.db_path, TABLE_NAME)
-                                                 if delete_success: st.write("기존 데이터 삭제 완료.")
-                                                 else: st.error("기존 데이터 삭제 중 오류 발생.")
-                                             insert_success = False
-                                             if delete_success:
-                                                 st.write(f"{len(data_to_insert)}개 새 레코드 삽입 중...")
-                                                 insert_success = bulk_insert_data(data_to_insert, TABLE_NAME) # 이상적: bulk_insert_data(st.session_state.db_path, ...)
-                                                 if insert_success: st.write("새 데이터 삽입 완료.")
-                                                 else: st.error("새 데이터 삽입 중 오류 발생.")
-                                             if delete_success and insert_success:
+                                                 # shadow 테이블에 적재 후 한 트랜잭션에서 교체 (조회 중인 사용자는 빈 테이블을 보지 않음)
+                                                 st.write(f"모드: Replace. 새 데이터를 적재한 뒤 '{TABLE_NAME}' 테이블을 한 번에 교체합니다...")
+                                                 inserted_rows = replace_with_csv(uploaded_file, TABLE_NAME, db_path=st.session_state.db_path, progress_callback=show_progress)
+                                             else:
+                                                 inserted_rows = ingest_csv(uploaded_file, TABLE_NAME, db_path=st.session_state.db_path, progress_callback=show_progress)
+                                             if inserted_rows is not None:
                                                  op_str = "교체" if upload_option == 'Replace' else "추가"
-                                                 st.success(f"'{uploaded_file.name}' 파일로부터 {len(data_to_insert)}개 레코드를 성공적으로 **{op_str}**했습니다!")
-                                             else: st.error("CSV 업로드 작업 중 오류가 발생하여 완료되지 않았습니다.")
-                                         except NameError as ne: st.error(f"`db_scbank.py`에 필요한 함수(delete_all_data 또는 bulk_insert_data)가 정의되지 않았거나 import되지 않았습니다: {ne}")
-                                         except Exception as db_op_err: st.error(f"데이터베이스 작업 호출 중 오류 발생: {db_op_err}. `db_scbank.py` 확인 필요.")
+                                                 st.success(f"'{uploaded_file.name}' 파일로부터 {inserted_rows}개 레코드를 성공적으로 **{op_str}**했습니다!")
+                                             else: st.error("CSV 업로드 작업 중 오류가 발생하여 완료되지 않았습니다. (전체 롤백, 기존 데이터 유지)")
+                                     except NameError as ne: st.error(f"필요한 함수(ingest_csv, replace_with_csv 또는 upsert_csv)가 정의되지 않았거나 import되지 않았습니다: {ne}")
+                                     except Exception as db_op_err: st.error(f"데이터베이스 작업 호출 중 오류 발생: {db_op_err}. `db_scbank.py` 확인 필요.")
                              except pd.errors.EmptyDataError: st.error("업로드된 CSV 파일이 비어있습니다.")
                              except Exception as e: st.error(f"파일 처리 중 오류 발생: {e}")
 
@@ -304,27 +368,59 @@ def main():
             st.error("데이터를 조회하려면 먼저 사이드바에서 데이터베이스 경로를 설정해주세요.")
         else:
             st.subheader("View Items")
-            # --- 전체 데이터 조회 및 대시보드 ---
-            # !!! 중요: db_scbank.py 수정 필요 !!!
-            result_data = []
-            try: result_data = view_all_data() # 이상적: view_all_data(st.session_state.db_path)
-            except NameError: st.error("`db_scbank.py`에 `view_all_data` 함수가 없거나 import되지 않았습니다.")
+            # --- 전체 데이터 조회 (페이지 단위) 및 대시보드 ---
+            db_columns = ['id', 'cat1', 'cat2', 'cat3', 'cat4', 'cat5', 'desc', 'owner', 'action', 'status', 'result', 'memo']
+            total_rows = 0
+            try: total_rows = count_data(st.session_state.db_path)
+            except NameError: st.error("`db_scbank.py`에 `count_data` 함수가 없거나 import되지 않았습니다.")
             except Exception as view_err: st.error(f"데이터 조회 중 오류 발생: {view_err}. `db_scbank.py` 확인 필요.")
-            if result_data:
-                db_columns = ['id', 'cat1', 'cat2', 'cat3', 'cat4', 'cat5', 'desc', 'owner', 'action', 'status', 'result', 'memo']
+            if total_rows:
                 try:
-                    clean_df = pd.DataFrame(result_data, columns=db_columns)
-                    with st.expander("View All Items (전체 데이터)", expanded=False): st.dataframe(clean_df)
+                    with st.expander(f"View All Items (전체 {total_rows}건, 페이지 단위)", expanded=False):
+                        # 각 페이지의 시작 커서(직전 페이지 마지막 id)를 스택으로 보관
+                        if 'view_all_cursors' not in st.session_state: st.session_state.view_all_cursors = [0]
+                        page_size = st.selectbox("페이지 크기", [50, 100, 500, 1000], index=1, key="view_all_page_size",
+                                                 on_change=lambda: st.session_state.update(view_all_cursors=[0])) # 크기 변경 시 첫 페이지로
+                        cursors = st.session_state.view_all_cursors
+                        page_rows = view_data_page(cursors[-1], page_size, db_path=st.session_state.db_path)
+                        st.dataframe(pd.DataFrame(page_rows, columns=db_columns))
+                        nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+                        with nav_info: st.caption(f"페이지 {len(cursors)} / {-(-total_rows // page_size)} (페이지당 {page_size}건)")
+                        with nav_prev:
+                            if st.button("◀ 이전", key="view_all_prev_button", disabled=len(cursors) <= 1):
+                                cursors.pop(); st.rerun()
+                        with nav_next:
+                            if st.button("다음 ▶", key="view_all_next_button", disabled=len(page_rows) < page_size):
+                                cursors.append(page_rows[-1][0]); st.rerun()
                     with st.expander("Overall Status Dashboard (전체 데이터 기준)"):
-                        if 'status' in clean_df.columns:
-                            task_df = clean_df['status'].value_counts().to_frame().reset_index(); task_df.columns = ['Status Type', 'Count']
+                        task_df = pd.DataFrame(get_status_counts(st.session_state.db_path), columns=['Status Type', 'Count'])
+                        if not task_df.empty:
                             st.dataframe(task_df)
                             p1 = px.pie(task_df, names='Status Type', values='Count', title="Overall Status Distribution"); st.plotly_chart(p1, use_container_width=True)
-                        else: st.warning("'status' 컬럼을 찾을 수 없습니다.")
+                        else: st.warning("'status' 집계 결과가 없습니다.")
+                        # result/owner/카테고리별 건수도 집계 테이블에서 조회 (전체 행을 읽지 않음)
+                        summary_dim = st.selectbox("다른 항목별 건수", [dim for dim in SUMMARY_DIMS if dim != 'status'], key="summary_dim_selector")
+                        dim_df = pd.DataFrame(get_summary_counts(summary_dim, st.session_state.db_path), columns=[summary_dim, 'Count'])
+                        if not dim_df.empty:
+                            fig_dim = px.bar(dim_df.head(30), x=summary_dim, y='Count', title=f"Count by {summary_dim} (상위 30개)", text_auto=True)
+                            st.plotly_chart(fig_dim, use_container_width=True)
+                        else: st.info(f"'{summary_dim}' 집계 결과가 없습니다.")
                 except Exception as df_err: st.error(f"전체 데이터 표시 중 오류: {df_err}")
             else: st.info("표시할 전체 데이터가 없거나 조회에 실패했습니다.")
             st.divider()
 
+            # --- 요구사항 전문 검색 (desc/action/memo, FTS5 인덱스 사용) ---
+            st.subheader("Search Requirements")
+            search_text = st.text_input("검색어 입력 (desc/action/memo):", placeholder="예: 암호화 로그", key="fts_search_input")
+            if search_text:
+                search_rows = search_data(search_text, limit=50, db_path=st.session_state.db_path)
+                if search_rows:
+                    st.caption(f"관련도 순 상위 {len(search_rows)}건")
+                    for item_id, cat1, owner, status, snippet_text, _rank in search_rows:
+                        st.markdown(f"**[{item_id}]** `{cat1 or '-'}` · {owner or '-'} · {status or '-'}  \n{snippet_text}")
+                else: st.info(f"'{search_text}'에 대한 검색 결과가 없습니다.")
+            st.divider()
+
             # --- 쿼리 섹션 (선택 방식 + 결과/차트 표시) ---
             # 이 섹션은 사용자가 입력한 DB 경로를 사용
             st.subheader("Query Database")
@@ -336,22 +432,59 @@ def main():
                 st.markdown("Ask questions about the data in natural language.")
                 if not st.session_state.api_configured: st.warning("Gemini SQL Agent를 사용하려면 사이드바에서 유효한 Gemini API 키를 입력해야 합니다.")
                 else:
-                    natural_language_query = st.text_input("데이터 관련 질문 입력:", placeholder="예: status가 Done인 항목 개수 세어줘", key="nl_query_input")
-                    if st.button("질문 실행하기 (Gemini)", key="run_nl_query_button"):
-                        if natural_language_query:
-                            if db_path_to_use: # 경로 확인
+                    nl_mode = st.radio("질문 방식:", ("단일 질문", "배치 질문"), key="nl_mode_radio", horizontal=True)
+                    nl_stats = get_nl_sql_cache().stats()
+                    st.caption(f"SQL 캐시: 적중 {nl_stats['memory_hits'] + nl_stats['disk_hits']} / 미적중 {nl_stats['misses']} (적중률 {nl_stats['hit_rate']:.0%})"
+                               f" · 호출당 제한 시간 {LLM_CALL_TIMEOUT:g}초")
+                    if nl_mode == "배치 질문":
+                        batch_text = st.text_area("질문 목록 (한 줄에 하나씩):", height=200, key="nl_batch_input",
+                                                  placeholder="status별 개수 보여줘\nowner별 항목 수\nresult가 No인 항목 보여줘")
+                        if st.button("배치 실행하기 (Gemini)", key="run_nl_batch_button"):
+                            questions = list(dict.fromkeys(q.strip() for q in batch_text.splitlines() if q.strip())) # 빈 줄/중복 제거
+                            if not questions: st.warning("질문 내용을 입력해주세요.")
+                            elif not db_path_to_use: st.error("데이터베이스 경로가 설정되지 않았습니다.")
+                            else:
+                                if len(questions) > BATCH_MAX_QUESTIONS:
+                                    st.warning(f"한 번에 최대 {BATCH_MAX_QUESTIONS}개까지 처리합니다. 나머지 {len(questions) - BATCH_MAX_QUESTIONS}개는 제외됩니다.")
+                                    questions = questions[:BATCH_MAX_QUESTIONS]
                                 try:
-                                    conn = sqlite3.connect(db_path_to_use, check_same_thread=False)
-                                    st.info(f"'{TABLE_NAME}' 테이블 질문 처리 중...")
-                                    sql_query_raw = generate_sql_query(natural_language_query, TABLE_NAME)
-                                    sql_query_extracted = extract_sql_query(sql_query_raw)
-                                    if sql_query_extracted: execute_sql_and_display(conn, sql_query_extracted) # 차트 생성 포함
+                                    batch_start = time.perf_counter()
+                                    with st.spinner(f"{len(questions)}개 질문을 SQL로 변환 중..."):
+                                        batch_results = generate_sql_batch(questions, TABLE_NAME, get_connection(db_path_to_use))
+                                    generated_at = time.perf_counter()
+                                    with st.spinner("생성된 SELECT 쿼리 병렬 실행 중..."):
+                                        run_select_batch(db_path_to_use, batch_results)
+                                    failed = sum(1 for r in batch_results if r['error'])
+                                    st.success(f"{len(batch_results)}개 질문 처리 완료 (성공 {len(batch_results) - failed} / 실패 {failed}) · "
+                                               f"SQL 생성 {generated_at - batch_start:.1f}초, 실행 {time.perf_counter() - generated_at:.1f}초")
+                                    for i, r in enumerate(batch_results, start=1):
+                                        label = f"{i}. {r['question']}" + (" ⚠️" if r['error'] else f" ({len(r['df'])}행)")
+                                        with st.expander(label, expanded=False):
+                                            if r['sql']: st.code(r['sql'], language="sql")
+                                            if r['error']: st.error(r['error'])
+                                            else:
+                                                st.dataframe(r['df'])
+                                                st.caption(f"{r['elapsed'] * 1000:.0f} ms" + (" · 캐시된 결과" if r['cache_hit'] else "")
+                                                           + (" · 캐시된 SQL" if r['cached'] else ""))
                                 except sqlite3.Error as db_con_err: st.error(f"DB 연결 실패: {db_con_err}")
-                                except Exception as agent_err: st.error(f"NL 쿼리 처리 중 오류: {agent_err}")
-                                finally:
-                                    if conn: conn.close()
-                            else: st.error("데이터베이스 경로가 설정되지 않았습니다.")
-                        else: st.warning("질문 내용을 입력해주세요.")
+                                except Exception as agent_err: st.error(f"배치 질문 처리 중 오류: {agent_err}")
+                    else:
+                        natural_language_query = st.text_input("데이터 관련 질문 입력:", placeholder="예: status가 Done인 항목 개수 세어줘", key="nl_query_input")
+                        if st.button("질문 실행하기 (Gemini)", key="run_nl_query_button"):
+                            if natural_language_query:
+                                if db_path_to_use: # 경로 확인
+                                    try:
+                                        conn = get_connection(db_path_to_use) # 스레드별 공유 연결 (닫지 않음)
+                                        st.info(f"'{TABLE_NAME}' 테이블 질문 처리 중...")
+                                        llm_start = time.perf_counter()
+                                        sql_query_raw = generate_sql_query(natural_language_query, TABLE_NAME, conn)
+                                        llm_ms = (time.perf_counter() - llm_start) * 1000
+                                        sql_query_extracted = extract_sql_query(sql_query_raw)
+                                        if sql_query_extracted: execute_sql_and_display(conn, sql_query_extracted, llm_ms)
+                                    except sqlite3.Error as db_con_err: st.error(f"DB 연결 실패: {db_con_err}")
+                                    except Exception as agent_err: st.error(f"NL 쿼리 처리 중 오류: {agent_err}")
+                                else: st.error("데이터베이스 경로가 설정되지 않았습니다.")
+                            else: st.warning("질문 내용을 입력해주세요.")
 
             elif query_method == "Direct SQL Input":
                 st.markdown("Enter your SQL query directly. **(Only `SELECT` statements are allowed for security)**")
@@ -361,21 +494,25 @@ def main():
                     if sql_query_direct:
                         if db_path_to_use: # 경로 확인
                             try:
-                                conn = sqlite3.connect(db_path_to_use, check_same_thread=False)
+                                conn = get_connection(db_path_to_use) # 스레드별 공유 연결 (닫지 않음)
                                 st.info("직접 입력된 SQL 실행 중...")
-                                execute_sql_and_display(conn, sql_query_direct) # 차트 생성 포함
+                                execute_sql_and_display(conn, sql_query_direct)
                             except sqlite3.Error as db_con_err: st.error(f"DB 연결 실패: {db_con_err}")
                             except Exception as direct_sql_err: st.error(f"직접 SQL 실행 중 오류: {direct_sql_err}")
-                            finally:
-                                if conn: conn.close()
                         else: st.error("데이터베이스 경로가 설정되지 않았습니다.")
                     else: st.warning("실행할 SQL 쿼리를 입력해주세요.")
 
+            # --- 쿼리 결과 차트 ---
+            # 실행 버튼을 누른 때만이 아니라 ID 조회 등 다른 위젯으로 다시 실행될 때도 저장된 결과로 그립니다.
+            # (결과가 같으면 Figure 캐시에서 가져오므로 다시 만들지 않음)
+            result_df = get_session_result_store(st.session_state).get("scapp")
+            if result_df is not None and not result_df.empty:
+                generate_and_display_charts(result_df)
+
             # --- View Details from Query Results by ID (쿼리 결과 기반 상세 보기) ---
             st.divider()
             st.subheader("View Details from Query Results by ID")
-            if 'query_result_df' in st.session_state and not st.session_state.query_result_df.empty:
-                result_df = st.session_state.query_result_df
+            if result_df is not None and not result_df.empty:
                 if 'id' in result_df.columns and pd.api.types.is_numeric_dtype(result_df['id']):
                     min_id_val = int(result_df['id'].min()) if pd.notna(result_df['id'].min()) else 1
                     max_id_val = int(result_df['id'].max()) if pd.notna(result_df['id'].max()) else None
@@ -424,4 +561,4 @@ def main():
 
 # --- 앱 실행 ---
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,21 @@
 import streamlit as st
-import pandas as pd
 import sqlite3
-import plotly.express as px  # Plotly Express 라이브러리 추가
+from upload_store import session_upload, open_readonly
+from result_store import get_session_result_store
+from schema_cache import get_db_schema
+from query_guard import run_guarded_query, QueryRejected, QueryTimeout
+from sql_aggregate import build_aggregate_sql, query_columns, infer_column_kind, numeric_bin_expr, base_query, DATE_BIN_FORMATS, quote_ident
+import os
+import sys
+# chart 폴더의 공용 차트 준비 모듈 경로 추가 (layout1.py 없이 단독 실행할 때)
+_chart_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chart")
+if _chart_dir not in sys.path: sys.path.append(_chart_dir)
+from chart_prep import xy_chart  # 상위 N개 + 기타, WebGL, Figure 크기 제한
 
 # SQLite 연결 설정 함수
 def connect_to_sqlite(db_file):
     try:
-        conn = sqlite3.connect(db_file)
+        conn = open_readonly(db_file)  # 업로드 저장소 파일은 바뀌지 않으므로 읽기 전용(immutable)으로 연결
         return conn
     except Exception as e:
         st.error(f"SQLite 연결 실패: {e}")
@@ -16,11 +25,20 @@ def connect_to_sqlite(db_file):
 def execute_sql_and_display(conn, sql_query):
     try:
         sql_query = sql_query.strip()
-        df = pd.read_sql_query(sql_query, conn)
+        result = run_guarded_query(conn, sql_query, source="barchart1") # 쿼리 기록 + 실행 계획 검사 + 제한 시간/행 수 (DB가 바뀌지 않았으면 캐시 사용)
+        df = result['df']
         with st.expander("결과 보기"):
-            st.write(f"총 행 수: {len(df)}")
+            st.write(f"총 행 수: {len(df)}" + (" (캐시된 결과)" if result['cache_hit'] else "")
+                     + (" - 최대 행 수에 도달하여 일부만 가져옴" if result['truncated'] else ""))
             st.write(df)
-        st.session_state['df'] = df  # 데이터프레임 저장
+        st.caption(f"소요 시간: {result['elapsed'] * 1000:.0f} ms")
+        for warning in result['warnings']:
+            st.warning(f"인덱스를 사용하지 않는 조회: {warning}")
+        with st.expander("실행 계획 (EXPLAIN QUERY PLAN)"):
+            st.code("\n".join(result['plan']) or "(없음)")
+        get_session_result_store(st.session_state).put("barchart1", df)  # 페이지별 결과 저장 (세션 메모리 한도 초과 시 Parquet로 내려보냄)
+    except (QueryRejected, QueryTimeout) as guard_err:
+        st.error(f"쿼리가 실행되지 않았습니다: {guard_err}")
     except sqlite3.Error as db_err:
         st.error(f"데이터베이스 오류: {db_err}")
         raise db_err
@@ -28,13 +46,30 @@ def execute_sql_and_display(conn, sql_query):
         st.error(f"알 수 없는 오류: {e}")
         raise e
 
-# SQLite 테이블 목록을 가져오는 함수
-def get_table_names(conn):
+PREVIEW_ROWS = 100  # 실행 시 미리 보기로 가져오는 행 수 (차트는 SQLite에서 집계)
+
+# 차트 집계 쿼리를 실행하는 함수 (집계된 행만 가져옴)
+def fetch_chart_data(conn, sql_query, x_axis, kind, agg, y_column=None, bin_option="없음", bins=20):
+    x_expr = None
+    if bin_option != "없음":
+        if kind == "numeric":
+            x_expr = numeric_bin_expr(conn, sql_query, x_axis, bins)
+        elif kind == "date":
+            x_expr = DATE_BIN_FORMATS[bin_option].format(col=quote_ident(x_axis))
+    result = run_guarded_query(conn, build_aggregate_sql(sql_query, x_axis, agg, y_column, x_expr), source="barchart1")
+    return result['df'], result['elapsed']
+
+# 크기 제한을 넘어 만들지 못한 차트는 안내만 표시
+def display_chart(fig):
+    if fig is None:
+        st.info("차트 데이터가 너무 커서 표시하지 않습니다. X축 구간을 사용하거나 쿼리 조건을 좁혀주세요.")
+    else:
+        st.plotly_chart(fig)
+
+# SQLite 테이블 목록을 가져오는 함수 (스키마 캐시 사용: 같은 DB면 카탈로그를 다시 조회하지 않음)
+def get_table_names(db_file):
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [row[0] for row in cursor.fetchall()]
-        return tables
+        return list(get_db_schema(db_file)['tables'])
     except sqlite3.Error as e:
         st.error(f"테이블 목록을 가져오는 중 오류 발생: {e}")
         return []
@@ -44,8 +79,6 @@ def main():
     st.title("SQL 쿼리 조회 및 Bar Chart 생성")
 
     # 세션 상태 초기화
-    if 'df' not in st.session_state:
-        st.session_state['df'] = pd.DataFrame()
     if 'selected_row' not in st.session_state:
         st.session_state['selected_row'] = None
     if 'selected_row_index' not in st.session_state:
@@ -54,66 +87,82 @@ def main():
     # SQLite 파일 선택 (파일 업로드)
     uploaded_file = st.file_uploader("SQLite 파일 업로드", type=["db", "sqlite", "sqlite3"], key="sqlite_uploader3")
 
-    if uploaded_file is not None:
-        db_file = "temp.db"  # 임시 파일 이름
-        with open(db_file, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        st.session_state['db_file'] = db_file
-        st.session_state['table_names'] = []
-
-    if 'db_file' in st.session_state:
-        db_file = st.session_state['db_file']
-        st.write(f"선택된 파일: {uploaded_file.name if uploaded_file else '임시파일'}")
-
-        conn = connect_to_sqlite(db_file)
-        if conn:
-            table_names = get_table_names(conn)
-            if table_names:
-                st.session_state['table_names'] = table_names
-            else:
-                st.write('테이블이 없습니다.')
-            conn.close()
-
-        if st.session_state['table_names']:
-            selected_table = st.selectbox("테이블 선택:", st.session_state['table_names'], key="table_selector1")
+    previous_db_file = st.session_state.get('barchart1_db_file')
+    db_file, db_name = session_upload(st.session_state, "barchart1", uploaded_file)  # 내용 해시 경로에 한 번만 저장, 경로는 페이지 전용 키에 유지
+    if db_file != previous_db_file:  # 다른 파일로 바뀐 경우에만 초기화
+        st.session_state['barchart1_table_names'] = []
+        st.session_state.pop('barchart1_chart_sql', None)
+
+    if db_file:
+        st.write(f"선택된 파일: {db_name}")
+
+        table_names = get_table_names(db_file)
+        if table_names:
+            st.session_state['barchart1_table_names'] = table_names
+        else:
+            st.write('테이블이 없습니다.')
+
+        if st.session_state['barchart1_table_names']:
+            selected_table = st.selectbox("테이블 선택:", st.session_state['barchart1_table_names'], key="table_selector1")
             default_query = f"SELECT * FROM {selected_table} LIMIT 10;"  # 선택한 테이블에 대한 기본 쿼리 생성
             sql_query = st.text_area("SQL 쿼리 입력:", value=default_query, key="barchart1_sqlquery1")  # 기본 쿼리를 text_area에 표시
 
             if st.button("실행", key="barchart1_execute_button1"):
                 conn = connect_to_sqlite(db_file)
                 if conn:
-                    execute_sql_and_display(conn, sql_query)
+                    # 전체 결과 대신 미리 보기만 가져오고, 차트는 아래에서 SQLite 집계로 그림
+                    execute_sql_and_display(conn, f"SELECT * FROM ({base_query(sql_query)}) LIMIT {PREVIEW_ROWS}")
+                    st.caption(f"미리 보기로 처음 {PREVIEW_ROWS}행만 가져왔습니다. 차트는 전체 결과를 SQLite에서 집계합니다.")
+                    st.session_state['barchart1_chart_sql'] = sql_query
                     conn.close()
 
             # Bar Chart 생성 및 표시
-            if not st.session_state['df'].empty:
+            chart_sql = st.session_state.get('barchart1_chart_sql')
+            preview_df = get_session_result_store(st.session_state).get("barchart1")
+            if chart_sql and preview_df is not None and not preview_df.empty:
+                conn = connect_to_sqlite(db_file)
                 try:
-                    if len(st.session_state['df'].columns) >= 2:  # count 또는 sum을 위한 최소 열 수
-                        x_axis = st.selectbox("X축 선택:", st.session_state['df'].columns, key="x_axis_selector1")
+                    columns = query_columns(conn, chart_sql)
+                    if len(columns) >= 2:  # count 또는 sum을 위한 최소 열 수
+                        x_axis = st.selectbox("X축 선택:", columns, key="x_axis_selector1")
+                        x_kind = infer_column_kind(conn, chart_sql, x_axis)
+                        bin_option, bins = "없음", 20
+                        if x_kind == "numeric":
+                            bin_option = st.selectbox("X축 구간:", ["없음", "자동 구간"], key="x_axis_bin_selector1")
+                            if bin_option != "없음":
+                                bins = st.number_input("구간 수:", min_value=2, max_value=200, value=20, key="x_axis_bins1")
+                        elif x_kind == "date":
+                            bin_option = st.selectbox("X축 구간:", ["없음"] + list(DATE_BIN_FORMATS), key="x_axis_bin_selector1")
                         y_axis_type = st.selectbox("Y축 계산 방식 선택:", ["count", "sum"], key="y_axis_type_selector1")
 
                         if y_axis_type == "count":
-                            counts = st.session_state['df'][x_axis].value_counts()
-                            total_count = counts.sum()  # 총 합계 계산
-                            fig = px.bar(x=counts.index, y=counts.values, labels={'x': x_axis, 'y': 'count'}, text=counts.values)
-                            fig.update_layout(title=f"총 합계: {total_count}")  # 타이틀에 총 합계 추가
-                            st.plotly_chart(fig)
+                            counts, elapsed = fetch_chart_data(conn, chart_sql, x_axis, x_kind, "count", bin_option=bin_option, bins=bins)
+                            total_count = counts['value'].sum()  # 총 합계 계산
+                            fig = xy_chart(counts, 'x', 'value', ordered=x_kind != "category",
+                                           title=f"총 합계: {total_count}", labels={'x': x_axis, 'value': 'count'})  # 타이틀에 총 합계 추가
+                            display_chart(fig)
+                            st.caption(f"SQLite 집계: {len(counts)}행, {elapsed * 1000:.0f} ms")
                         elif y_axis_type == "sum":
-                            numeric_columns = st.session_state['df'].select_dtypes(include=['number']).columns.tolist()
+                            numeric_columns = [c for c in columns if c != x_axis and infer_column_kind(conn, chart_sql, c) == "numeric"]
                             if numeric_columns:
                                 y_axis_sum = st.selectbox("합계를 구할 열 선택:", numeric_columns, key="y_axis_sum_selector2")
-                                sums = st.session_state['df'].groupby(x_axis)[y_axis_sum].sum()
-                                total_sum = sums.sum()  # 총 합계 계산
-                                fig = px.bar(x=sums.index, y=sums.values, labels={'x': x_axis, 'y': 'sum'}, text=sums.values)
-                                fig.update_layout(title=f"총 합계: {total_sum}")  # 타이틀에 총 합계 추가
-                                st.plotly_chart(fig)
+                                sums, elapsed = fetch_chart_data(conn, chart_sql, x_axis, x_kind, "sum", y_axis_sum, bin_option, bins)
+                                total_sum = sums['value'].sum()  # 총 합계 계산
+                                fig = xy_chart(sums, 'x', 'value', ordered=x_kind != "category",
+                                               title=f"총 합계: {total_sum}", labels={'x': x_axis, 'value': 'sum'})  # 타이틀에 총 합계 추가
+                                display_chart(fig)
+                                st.caption(f"SQLite 집계: {len(sums)}행, {elapsed * 1000:.0f} ms")
                             else:
                                 st.error("숫자형 열이 없어 합계를 계산할 수 없습니다.")
 
                     else:
                         st.write("차트 생성에 필요한 최소 2개 이상의 열이 없습니다.")
+                except (QueryRejected, QueryTimeout) as e:
+                    st.error(f"차트 집계 쿼리가 실행되지 않았습니다: {e}")
                 except Exception as e:
                     st.error(f"차트 생성 오류: {e}")
+                finally:
+                    if conn: conn.close()
 
         else:
             selected_table = None
@@ -123,4 +172,4 @@ def main():
         st.write('SQLite 파일을 먼저 업로드해주세요.')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
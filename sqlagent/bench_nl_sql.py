@@ -0,0 +1,158 @@
+"""자연어 -> SQL -> DataFrame -> 차트 경로의 지연 시간/처리량 벤치마크.
+
+Gemini 대신 StubProvider(설정 가능한 지연 시간/오류 비율)를 사용하므로 API 키 없이 실행됩니다.
+LLM 백엔드만 바꾸고 나머지는 앱과 같은 함수를 그대로 호출합니다.
+  - SQL 생성: sqlagent1.generate_sql_query (NL->SQL 캐시, 스키마 요약, 시간 제한/재시도)
+  - 실행: query_guard.run_guarded_query (실행 계획 검사, 제한 시간/행 수, 결과 캐시)
+  - 차트: chart_prep.result_chart_specs + figure_cache (scapp과 같은 차트/Figure 캐시)
+
+사용 예:
+    python bench_nl_sql.py --sessions 8 --questions 20 --rows 200000 --latency-ms 800 --error-rate 0.02
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chart"))
+from llm_provider import StubProvider
+from nl_sql_cache import NLSQLCache
+from upload_store import open_readonly
+from query_guard import run_guarded_query, QueryRejected, QueryTimeout
+from chart_prep import result_chart_specs
+from figure_cache import get_figure_cache, dataframe_fingerprint
+from sqlagent1 import generate_sql_query
+
+TABLE_NAME = "chk1_table"
+QUESTIONS = [
+    "status별 개수 보여줘",
+    "owner별 항목 수",
+    "count by result",
+    "status가 ToDo인 항목 개수 세어줘",
+    "owner = kim 인 항목 보여줘",
+    "cat1별 요구사항 수",
+    "show all rows where result is Yes",
+    "전체 항목 개수",
+]
+STAGES = ["generate", "execute", "chart", "total"]
+
+def create_synthetic_db(path, rows, seed=0):
+    """chk1_table 구조의 합성 데이터 DB를 만듭니다."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {TABLE_NAME}(
+                        id INTEGER PRIMARY KEY, cat1 TEXT, cat2 TEXT, cat3 TEXT, cat4 TEXT, cat5 TEXT,
+                        desc TEXT, owner TEXT, action TEXT, status TEXT, result TEXT, memo TEXT)''')
+    owners = ["kim", "lee", "park", "choi", "jung"]
+    statuses = ["ToDo", "Doing", "Done", "Green", "Yellow", "Red"]
+    results = ["Yes", "No", "NA"]
+    conn.executemany(f"INSERT INTO {TABLE_NAME}(cat1, cat2, cat3, cat4, cat5, desc, owner, action, status, result, memo) "
+                     "VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                     ((f"C{rng.randint(1, 20)}", f"S{rng.randint(1, 50)}", "", "", "",
+                       f"요구사항 설명 {i}", rng.choice(owners), "검토", rng.choice(statuses), rng.choice(results), "")
+                      for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+def build_charts(df):
+    """scapp과 같은 표준 차트를 Figure 캐시를 거쳐 만듭니다. (만든 Figure 수, 캐시 적중 수)"""
+    if df.empty:
+        return 0, 0
+    figure_cache = get_figure_cache()
+    fingerprint = dataframe_fingerprint(df)
+    built = hits = 0
+    for _, name, builder, spec in result_chart_specs(df):
+        fig, hit, _ = figure_cache.get_or_build(fingerprint, name, builder, *spec)
+        built += fig is not None
+        hits += hit
+    return built, hits
+
+def run_session(session_id, db_path, provider, questions, nl_cache):
+    """한 사용자 세션: 질문을 차례로 처리하며 단계별 소요 시간을 기록합니다."""
+    conn = open_readonly(db_path) # 앱 페이지와 같은 읽기 전용 연결
+    records = []
+    for question in questions:
+        record = {"session": session_id, "question": question, "error": None, "cache_hit": False,
+                  "result_cache_hit": False, "rows": 0}
+        start = time.perf_counter()
+        try:
+            lookups = nl_cache.stats()
+            sql = generate_sql_query(question, TABLE_NAME, conn, provider, nl_cache)
+            t_generated = time.perf_counter()
+            after = nl_cache.stats()
+            record["cache_hit"] = after["memory_hits"] + after["disk_hits"] > lookups["memory_hits"] + lookups["disk_hits"]
+            if not sql:
+                raise RuntimeError("SQL 생성 실패 (LLM 오류, 제한 시간 초과 또는 실행할 수 없는 응답)")
+            result = run_guarded_query(conn, sql.strip(), db_path)
+            df = result['df']
+            t_executed = time.perf_counter()
+            build_charts(df)
+            t_charted = time.perf_counter()
+            record.update(rows=len(df), result_cache_hit=result['cache_hit'], generate=t_generated - start,
+                          execute=t_executed - t_generated, chart=t_charted - t_executed, total=t_charted - start)
+        except (RuntimeError, QueryRejected, QueryTimeout, sqlite3.Error) as e:
+            record["error"] = str(e)
+            record["total"] = time.perf_counter() - start
+        records.append(record)
+    conn.close()
+    return records
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def summarize(records, wall_time):
+    """단계별 p50/p95/p99/평균(ms)과 처리량을 출력합니다."""
+    ok = [r for r in records if r["error"] is None]
+    print(f"\n요청 {len(records)}건 / 성공 {len(ok)}건 / 오류 {len(records) - len(ok)}건 / "
+          f"NL 캐시 적중 {sum(r['cache_hit'] for r in records)}건 / 결과 캐시 적중 {sum(r['result_cache_hit'] for r in records)}건")
+    print(f"경과 {wall_time:.2f}s, 처리량 {len(ok) / wall_time:.2f} req/s")
+    print(f"{'stage':<10}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}  (ms)")
+    for stage in STAGES:
+        values = [r[stage] * 1000 for r in ok if stage in r]
+        if values:
+            print(f"{stage:<10}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+                  f"{percentile(values, 99):>10.1f}{statistics.mean(values):>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="NL->SQL->DataFrame->chart 벤치마크 (StubProvider 사용)")
+    parser.add_argument("--sessions", type=int, default=4, help="동시 세션 수")
+    parser.add_argument("--questions", type=int, default=10, help="세션당 질문 수")
+    parser.add_argument("--rows", type=int, default=100000, help="합성 DB 행 수 (--db 미지정 시)")
+    parser.add_argument("--db", help="기존 DB 경로 (chk1_table 필요)")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="스텁 LLM 평균 지연 시간")
+    parser.add_argument("--jitter", type=float, default=0.3, help="스텁 지연 시간 로그정규 sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="스텁 일시적 오류 비율 (0~1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--use-cache", action="store_true", help="NL->SQL 캐시 사용 (임시 캐시 DB, 미지정 시 TTL 0으로 재사용 안 함)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp_dir, "bench.db")
+            start = time.perf_counter()
+            create_synthetic_db(db_path, args.rows, args.seed)
+            print(f"합성 DB 생성: {args.rows}행 ({time.perf_counter() - start:.1f}s)")
+        provider = StubProvider(args.latency_ms, args.jitter, args.error_rate, args.seed)
+        nl_cache = NLSQLCache(os.path.join(tmp_dir, "nl_cache.db"), **({} if args.use_cache else {"ttl": 0}))
+        rng = random.Random(args.seed)
+        workloads = [[rng.choice(QUESTIONS) for _ in range(args.questions)] for _ in range(args.sessions)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [pool.submit(run_session, i, db_path, provider, workload, nl_cache)
+                       for i, workload in enumerate(workloads)]
+            records = [record for future in futures for record in future.result()]
+        summarize(records, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
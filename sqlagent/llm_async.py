@@ -0,0 +1,64 @@
+import os
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from llm_provider import LLMError, LLMTransientError
+
+# --- 비동기 LLM 호출 (시간 제한 + 재시도 + 동시 실행 제한) ---
+# provider.generate()는 동기 함수이므로 전용 스레드 풀에서 실행하고 asyncio로 기다립니다.
+# 시간 제한을 넘긴 호출은 기다리지 않고 넘어가지만, 이미 시작된 HTTP 요청 자체를 취소하지는 못합니다.
+LLM_CALL_TIMEOUT = float(os.environ.get("LLM_CALL_TIMEOUT", "20"))       # 호출 1회당 제한 시간(초)
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))            # 일시적 오류/시간 초과 시 재시도 횟수
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))     # 배치 질문 동시 호출 수
+
+# asyncio.run()이 끝날 때 기본 executor의 스레드 종료를 기다리지 않도록 별도 풀 사용
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm_call")
+
+class LLMTimeoutError(LLMError):
+    """재시도까지 모두 시간 제한을 넘긴 경우"""
+
+class AsyncLLMClient:
+    """provider 호출에 시간 제한, 지터(jitter)가 있는 지수 백오프 재시도, 동시 실행 제한을 적용합니다."""
+
+    def __init__(self, provider, timeout=LLM_CALL_TIMEOUT, max_retries=LLM_MAX_RETRIES,
+                 base_delay=LLM_RETRY_BASE_DELAY, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.provider = provider
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_concurrency = max_concurrency
+        self._semaphore = None  # 실행 중인 이벤트 루프에서 생성
+
+    async def generate(self, prompt):
+        """응답 텍스트를 반환합니다. 재시도 후에도 실패하면 LLMError(LLMTimeoutError)를 발생시킵니다."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        last_error = None
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(_executor, self.provider.generate, prompt), self.timeout)
+                except asyncio.TimeoutError:
+                    last_error = LLMTimeoutError(f"{self.timeout:g}초 안에 응답이 없습니다.")
+                except LLMTransientError as e:
+                    last_error = e
+                if attempt < self.max_retries: # full jitter: 0 ~ base * 2^attempt 초 대기
+                    await asyncio.sleep(random.uniform(0, self.base_delay * (2 ** attempt)))
+        if isinstance(last_error, LLMTimeoutError):
+            raise LLMTimeoutError(f"{self.max_retries + 1}회 시도 모두 시간 초과: {last_error}")
+        raise LLMError(f"{self.max_retries + 1}회 시도 모두 실패: {last_error}")
+
+    async def generate_many(self, prompts):
+        """여러 프롬프트를 동시에 처리합니다. 결과 목록에는 응답 텍스트 또는 예외 객체가 순서대로 들어갑니다."""
+        return await asyncio.gather(*(self.generate(prompt) for prompt in prompts), return_exceptions=True)
+
+def generate_with_deadline(provider, prompt, **client_options):
+    """동기 코드(Streamlit 스크립트 등)에서 시간 제한/재시도를 적용하여 한 번 호출합니다."""
+    return asyncio.run(AsyncLLMClient(provider, **client_options).generate(prompt))
+
+def generate_batch(provider, prompts, **client_options):
+    """동기 코드에서 여러 프롬프트를 동시에 호출합니다. (결과: 텍스트 또는 예외 객체 목록)"""
+    return asyncio.run(AsyncLLMClient(provider, **client_options).generate_many(prompts))
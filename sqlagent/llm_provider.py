@@ -0,0 +1,147 @@
+import os
+import re
+import time
+import random
+import hashlib
+import threading
+
+# --- LLM 백엔드 (자연어 -> SQL) ---
+# generate_sql_query는 provider.generate(prompt)만 호출하므로, Gemini 대신 로컬 스텁으로 바꿔
+# API 키 없이 부하 테스트/벤치마크를 할 수 있습니다.
+#   LLM_PROVIDER=gemini (기본) | stub
+#   LLM_MODEL_NAME=gemini-1.5-flash
+#   STUB_LLM_LATENCY_MS=800, STUB_LLM_JITTER=0.3, STUB_LLM_ERROR_RATE=0.0, STUB_LLM_SEED=0
+DEFAULT_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+DEFAULT_MODEL_NAME = os.environ.get("LLM_MODEL_NAME", "gemini-1.5-flash")
+
+class LLMError(Exception):
+    """LLM 호출 실패 (빈 응답, 차단, API 오류 등)"""
+
+class LLMTransientError(LLMError):
+    """잠시 후 다시 시도하면 성공할 수 있는 오류 (시간 초과, 과부하 등)"""
+
+class LLMProvider:
+    """모든 백엔드가 구현하는 인터페이스"""
+    name = "base"
+    model_name = ""
+
+    def generate(self, prompt):
+        """프롬프트에 대한 응답 텍스트를 반환합니다. 실패 시 LLMError를 발생시킵니다."""
+        raise NotImplementedError
+
+_genai_configure_lock = threading.Lock()
+
+class GeminiProvider(LLMProvider):
+    """google.generativeai 기반 백엔드 (패키지는 처음 사용할 때 import)
+
+    genai.configure(api_key=...)는 프로세스 전역 설정이라, 동시에 여러 세션이 호출하면 다른 세션의 키로
+    요청이 나갈 수 있습니다. 그래서 이 백엔드의 API 키로 만든 GenerativeServiceClient를 모델에 직접 연결합니다.
+    (모델에 클라이언트를 연결할 수 없는 버전이면 configure와 호출을 전역 잠금으로 묶어 실행)"""
+    name = "gemini"
+
+    def __init__(self, api_key, model_name=DEFAULT_MODEL_NAME):
+        import google.generativeai as genai
+        from google.ai import generativelanguage as glm
+        self._genai = genai
+        self._api_key = api_key
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+        if hasattr(self._model, "_client"):
+            self._model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+        else:
+            self._model = None
+
+    def _generate_content(self, prompt):
+        if self._model is not None:
+            return self._model.generate_content(prompt)
+        with _genai_configure_lock:
+            self._genai.configure(api_key=self._api_key)
+            return self._genai.GenerativeModel(self.model_name).generate_content(prompt)
+
+    def generate(self, prompt):
+        try:
+            response = self._generate_content(prompt)
+        except Exception as e:
+            # 429/503/시간 초과 등은 재시도 대상으로 구분
+            message = str(e)
+            if re.search(r"\b(429|500|503|504)\b|timeout|timed out|deadline|unavailable|exhausted", message, re.IGNORECASE):
+                raise LLMTransientError(message) from e
+            raise LLMError(message) from e
+        if not response.parts:
+            feedback = response.prompt_feedback if hasattr(response, 'prompt_feedback') else 'N/A'
+            raise LLMError(f"비어있는 응답 (차단 사유 등: {feedback})")
+        return response.text
+
+class StubProvider(LLMProvider):
+    """네트워크 없이 동작하는 결정적(deterministic) 스텁 백엔드.
+
+    질문 문장에서 간단한 규칙으로 SQL을 만들고, 설정한 지연 시간 분포와 오류 비율을 흉내냅니다.
+    같은 seed와 같은 호출 순서이면 지연 시간과 오류 발생이 항상 같습니다.
+    """
+    name = "stub"
+
+    def __init__(self, latency_ms=800.0, jitter=0.3, error_rate=0.0, seed=0, model_name="stub-sql-v1"):
+        self.latency_ms = latency_ms
+        self.jitter = jitter            # 로그정규분포 sigma (0이면 항상 latency_ms)
+        self.error_rate = error_rate
+        self.model_name = model_name
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            delay = self.latency_ms * (self._rng.lognormvariate(0, self.jitter) if self.jitter else 1.0)
+            fail = self._rng.random() < self.error_rate
+        time.sleep(delay / 1000.0)
+        if fail:
+            raise LLMTransientError("stub: 임의로 발생시킨 일시적 오류")
+        return self.sql_for_prompt(prompt)
+
+    @staticmethod
+    def sql_for_prompt(prompt):
+        """프롬프트의 테이블 이름과 질문에서 SQL을 만듭니다."""
+        table_match = re.search(r"table(?: named)? '([^']+)'", prompt)
+        table = table_match.group(1) if table_match else "chk1_table"
+        question = prompt.rsplit(":", 1)[-1].strip()
+        lowered = question.lower()
+        where = ""
+        cond = re.search(r"(status|owner|result|cat[1-5])\s*(?:가|이|=|is)?\s*'?([A-Za-z0-9_-]+)'?", question, re.IGNORECASE)
+        if cond:
+            where = f" WHERE {cond.group(1).lower()} = '{cond.group(2)}'"
+        group = re.search(r"(status|owner|result|cat[1-5])\s*(?:별|by)", question, re.IGNORECASE) or \
+                re.search(r"by\s+(status|owner|result|cat[1-5])", question, re.IGNORECASE)
+        if group:
+            col = group.group(1).lower()
+            return f"SELECT {col}, COUNT(*) AS cnt FROM {table}{where} GROUP BY {col} ORDER BY cnt DESC;"
+        if any(word in lowered for word in ("count", "개수", "몇 개", "몇개", "how many")):
+            return f"SELECT COUNT(*) AS cnt FROM {table}{where};"
+        return f"SELECT * FROM {table}{where} LIMIT 100;"
+
+def stub_provider_from_env():
+    """환경 변수 설정으로 StubProvider를 만듭니다."""
+    return StubProvider(latency_ms=float(os.environ.get("STUB_LLM_LATENCY_MS", "800")),
+                        jitter=float(os.environ.get("STUB_LLM_JITTER", "0.3")),
+                        error_rate=float(os.environ.get("STUB_LLM_ERROR_RATE", "0.0")),
+                        seed=int(os.environ.get("STUB_LLM_SEED", "0")))
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_llm_provider(api_key=None, provider_name=None):
+    """설정에 맞는 LLM 백엔드를 반환합니다. (API 키/백엔드별로 재사용)
+    Gemini는 api_key가 필요하며, 없으면 None을 반환합니다."""
+    provider_name = provider_name or DEFAULT_PROVIDER
+    if provider_name == "stub":
+        key = ("stub",)
+    elif api_key:
+        key = (provider_name, hashlib.sha1(api_key.encode("utf-8")).hexdigest())
+    else:
+        return None
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            if provider_name == "stub": provider = stub_provider_from_env()
+            elif provider_name == "gemini": provider = GeminiProvider(api_key)
+            else: raise ValueError(f"알 수 없는 LLM_PROVIDER입니다: {provider_name}")
+            _providers[key] = provider
+        return provider
@@ -0,0 +1,143 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from query_cache import is_cacheable
+
+# --- 자연어 -> SQL 변환 결과 캐시 ---
+# 같은 질문을 다시 하면 Gemini를 호출하지 않고 이전에 생성된 SQL을 사용합니다.
+# 캐시 키: (정규화된 질문, 테이블 이름, 스키마 지문, 모델 이름)
+#   - 스키마가 바뀌면 지문이 달라지므로 이전 SQL은 사용되지 않습니다.
+# 메모리 LRU + 로컬 SQLite 파일(프로세스 재시작 후에도 유지), TTL 경과 항목은 무시합니다.
+# 조회 쿼리(SELECT/WITH)만 저장/반환합니다. (캐시된 UPDATE/DELETE가 배치 실행 등으로 재사용되지 않도록)
+NL_CACHE_DB_PATH = os.environ.get("NL_SQL_CACHE_DB", os.path.join(tempfile.gettempdir(), "sqlagent_nl_sql_cache.db"))
+NL_CACHE_TTL = int(os.environ.get("NL_SQL_CACHE_TTL", str(7 * 24 * 3600)))  # 초 (기본 7일)
+NL_CACHE_MEMORY_ITEMS = 1000
+
+def normalize_question(question):
+    """대소문자, 앞뒤/연속 공백, 끝의 문장부호 차이를 무시하도록 질문을 정규화합니다."""
+    text = re.sub(r"\s+", " ", (question or "").strip().lower())
+    return text.rstrip(" ?.!")
+
+def schema_fingerprint(conn, table_name=None):
+    """테이블(없으면 전체 스키마)의 CREATE 문으로 만든 지문을 반환합니다."""
+    if conn is None:
+        return ""
+    if table_name:
+        rows = conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL ORDER BY name", (table_name,)).fetchall()
+    else:
+        rows = conn.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY name").fetchall()
+    return hashlib.sha1("\n".join(row[0] for row in rows).encode("utf-8")).hexdigest()[:16]
+
+def is_valid_select(conn, sql):
+    """캐시에 저장해도 되는 SQL인지 확인합니다. (조회 쿼리이고, conn이 있으면 SQLite가 컴파일할 수 있는 문 하나)"""
+    if not sql or not is_cacheable(sql):
+        return False
+    if conn is None:
+        return True
+    try:
+        conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+        return True
+    except sqlite3.Error:
+        return False
+
+class NLSQLCache:
+    """메모리 LRU + SQLite 저장소로 구성된 2단계 캐시"""
+
+    def __init__(self, db_path=NL_CACHE_DB_PATH, ttl=NL_CACHE_TTL, memory_items=NL_CACHE_MEMORY_ITEMS):
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self._memory = OrderedDict()    # key -> (created_at, sql)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "puts": 0}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS nl_sql_cache(
+                                  cache_key TEXT PRIMARY KEY,
+                                  question TEXT, table_name TEXT, schema_fp TEXT, model_name TEXT,
+                                  sql TEXT NOT NULL, created_at REAL NOT NULL, hits INTEGER DEFAULT 0)''')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question, table_name, schema_fp, model_name):
+        raw = "\x1f".join([normalize_question(question), table_name or "", schema_fp or "", model_name or ""])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question, table_name, schema_fp, model_name):
+        """캐시된 SQL을 반환합니다. 없거나 TTL이 지났으면 None."""
+        key = self.make_key(question, table_name, schema_fp, model_name)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl and is_cacheable(entry[1]):
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1 # 메모리 적중은 디스크에 기록하지 않음
+                return entry[1]
+            row = self._conn.execute("SELECT sql, created_at FROM nl_sql_cache WHERE cache_key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] <= self.ttl and is_cacheable(row[0]):
+                self._remember(key, row[1], row[0])
+                self._stats["disk_hits"] += 1
+                self._conn.execute("UPDATE nl_sql_cache SET hits = hits + 1 WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                return row[0]
+            if row is not None or entry is not None: # TTL 경과 (또는 예전에 저장된 조회 이외의 쿼리)
+                self._memory.pop(key, None)
+                self._conn.execute("DELETE FROM nl_sql_cache WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, question, table_name, schema_fp, model_name, sql):
+        """생성된 SQL을 저장합니다. 조회 쿼리가 아니면 저장하지 않고 False를 반환합니다."""
+        if not is_cacheable(sql):
+            return False
+        key = self.make_key(question, table_name, schema_fp, model_name)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, sql)
+            self._conn.execute('''INSERT OR REPLACE INTO nl_sql_cache(
+                                      cache_key, question, table_name, schema_fp, model_name, sql, created_at)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                               (key, normalize_question(question), table_name, schema_fp, model_name, sql, now))
+            self._conn.commit()
+            self._stats["puts"] += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM nl_sql_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            stats["disk_items"] = self._conn.execute("SELECT COUNT(*) FROM nl_sql_cache").fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, created_at, sql):
+        """(잠금 보유 상태에서 호출) 메모리 LRU에 저장"""
+        self._memory[key] = (created_at, sql)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_nl_sql_cache():
+    """프로세스 전체에서 공유하는 자연어->SQL 캐시를 반환합니다. (처음 호출 시 생성)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = NLSQLCache()
+        return _cache
@@ -0,0 +1,232 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import pandas as pd
+from upload_store import UPLOAD_STORE_DIR
+
+# --- 쿼리 결과 캐시 ---
+# 같은 SELECT를 여러 사용자가 반복 실행해도 DB가 바뀌지 않았다면 SQLite를 다시 조회하지 않습니다.
+# 캐시 키: (DB 파일 식별자, 정규화된 SQL)
+# 유효성 확인: 캐시에 저장할 때의 데이터 버전 스탬프와 현재 스탬프가 같을 때만 적중으로 처리
+#   - PRAGMA data_version: 값 자체는 연결별이므로, 경로마다 쓰기를 하지 않는 감시용 연결을 하나 두고
+#     그 연결에서 읽습니다. (다른 연결/프로세스가 commit하면 값이 증가)
+#   - DB/WAL 파일의 mtime, 크기: 파일을 통째로 덮어쓰는 경우(업로드 임시 파일 등)까지 감지
+CACHE_MAX_BYTES = int(os.environ.get("QUERY_CACHE_MAX_MB", "256")) * 1024 * 1024
+CACHE_SPILL_DIR = os.environ.get("QUERY_CACHE_SPILL_DIR") # 설정 시 메모리에서 밀려난 결과를 Parquet로 보관
+CACHE_SPILL_MAX_BYTES = int(os.environ.get("QUERY_CACHE_SPILL_MAX_MB", "2048")) * 1024 * 1024
+
+_LITERAL_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+def normalize_sql(sql):
+    """주석 제거, 공백 정리, 끝의 세미콜론 제거로 SQL 텍스트를 정규화합니다. (문자열 리터럴은 그대로 유지)"""
+    parts = _LITERAL_RE.split(sql or "")
+    for i in range(0, len(parts), 2): # 짝수 인덱스: 리터럴 밖
+        text = re.sub(r"--[^\n]*", " ", parts[i])
+        text = re.sub(r"/\*.*?\*/", " ", text, flags=re.DOTALL)
+        parts[i] = re.sub(r"\s+", " ", text)
+    return "".join(parts).strip().rstrip(";").strip()
+
+def is_cacheable(sql):
+    """읽기 전용 쿼리(SELECT/WITH)만 캐시합니다."""
+    return normalize_sql(sql).upper().startswith(("SELECT", "WITH"))
+
+def get_db_path(conn):
+    """연결의 main DB 파일 경로를 반환합니다. (메모리 DB면 None)"""
+    for _, name, path in conn.execute("PRAGMA database_list").fetchall():
+        if name == "main":
+            return path or None
+    return None
+
+def _file_stat(path):
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+MONITOR_MAX_CONNECTIONS = 32   # 감시용 연결 최대 개수 (오래 사용하지 않은 연결부터 닫음)
+
+_monitors = OrderedDict()   # (실제 경로, inode) -> 감시용 연결
+_monitors_lock = threading.Lock()
+
+def data_stamp(db_path):
+    """DB 내용이 바뀌면 달라지는 스탬프를 반환합니다.
+    업로드 저장소 파일은 내용 해시 이름으로 한 번만 쓰이고 바뀌지 않으므로 감시용 연결을 열지 않습니다.
+    (열린 핸들이 남아 있으면 저장소 정리 시 Windows에서 파일을 삭제할 수 없음)"""
+    real_path = os.path.realpath(db_path)
+    main_stat = _file_stat(real_path)
+    if os.path.dirname(real_path) == os.path.realpath(UPLOAD_STORE_DIR):
+        return ("immutable", main_stat)
+    key = (real_path, main_stat[0] if main_stat else None)
+    closing = []
+    with _monitors_lock:
+        monitor = _monitors.get(key)
+        if monitor is None:
+            for old_key in [k for k in _monitors if k[0] == real_path]: # 같은 경로의 이전 파일(inode) 연결
+                closing.append(_monitors.pop(old_key))
+            monitor = _monitors[key] = sqlite3.connect(f"file:{real_path}?mode=ro", uri=True, check_same_thread=False)
+            while len(_monitors) > MONITOR_MAX_CONNECTIONS:
+                closing.append(_monitors.popitem(last=False)[1])
+        else:
+            _monitors.move_to_end(key)
+        version = monitor.execute("PRAGMA data_version").fetchone()[0]
+    for old in closing:
+        old.close()
+    return (version, main_stat, _file_stat(real_path + "-wal"))
+
+def close_monitors(db_path=None):
+    """감시용 연결을 닫습니다. (db_path를 주면 그 파일의 연결만)"""
+    real_path = os.path.realpath(db_path) if db_path else None
+    with _monitors_lock:
+        keys = [k for k in _monitors if real_path is None or k[0] == real_path]
+        closing = [_monitors.pop(k) for k in keys]
+    for monitor in closing:
+        monitor.close()
+
+class QueryResultCache:
+    """메모리 사용량 기준 LRU 캐시. 한도를 넘으면 오래된 결과부터 제거하거나 Parquet로 내려보냅니다."""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, spill_dir=CACHE_SPILL_DIR, spill_max_bytes=CACHE_SPILL_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._entries = OrderedDict()   # key -> (stamp, df, nbytes)
+        self._spilled = OrderedDict()   # key -> (stamp, parquet 경로, 파일 크기)
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "spill_hits": 0, "misses": 0, "stale": 0, "evictions": 0, "spills": 0}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def get(self, key, stamp):
+        """스탬프가 같은 결과가 있으면 DataFrame을, 없으면 None을 반환합니다."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == stamp:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1].copy(deep=False)
+                self._drop(key)
+                self._stats["stale"] += 1
+            spilled = self._spilled.pop(key, None)
+            if spilled is not None:
+                self._spill_bytes -= spilled[2]
+        if spilled is not None:
+            df = self._load_spilled(spilled, stamp)
+            if df is not None:
+                with self._lock: self._stats["spill_hits"] += 1
+                self.put(key, stamp, df) # 다시 메모리로 올림
+                return df.copy(deep=False)
+        with self._lock: self._stats["misses"] += 1
+        return None
+
+    def put(self, key, stamp, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes: # 한도보다 큰 결과는 캐시하지 않음
+            return
+        evicted = []
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (stamp, df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, (old_stamp, old_df, old_bytes) = self._entries.popitem(last=False)
+                self._bytes -= old_bytes
+                self._stats["evictions"] += 1
+                evicted.append((old_key, old_stamp, old_df))
+        if self.spill_dir:
+            for old_key, old_stamp, old_df in evicted:
+                self._spill(old_key, old_stamp, old_df)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            spilled = list(self._spilled.values())
+            self._spilled.clear()
+            self._spill_bytes = 0
+        for _, path, _ in spilled:
+            self._remove_file(path)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries), bytes=self._bytes,
+                         spilled_entries=len(self._spilled), spilled_bytes=self._spill_bytes)
+        return stats
+
+    def _drop(self, key):
+        """(잠금 보유 상태에서 호출) 메모리 항목 제거"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _spill(self, key, stamp, df):
+        path = os.path.join(self.spill_dir, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".parquet")
+        try:
+            df.to_parquet(path, index=False)
+        except Exception as e: # pyarrow 미설치, 지원하지 않는 컬럼 타입 등
+            print(f"쿼리 캐시 Parquet 저장 실패 (건너뜀): {e}")
+            return
+        size = os.path.getsize(path)
+        stale_paths = []
+        with self._lock:
+            old = self._spilled.pop(key, None)
+            if old is not None:
+                self._spill_bytes -= old[2]
+            self._spilled[key] = (stamp, path, size)
+            self._spill_bytes += size
+            self._stats["spills"] += 1
+            while self._spill_bytes > self.spill_max_bytes and len(self._spilled) > 1:
+                _, (_, old_path, old_size) = self._spilled.popitem(last=False)
+                self._spill_bytes -= old_size
+                stale_paths.append(old_path)
+        for old_path in stale_paths:
+            self._remove_file(old_path)
+
+    def _load_spilled(self, spilled, stamp):
+        spilled_stamp, path, _ = spilled
+        if spilled_stamp != stamp:
+            self._remove_file(path)
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            print(f"쿼리 캐시 Parquet 읽기 실패: {e}")
+            return None
+        finally:
+            self._remove_file(path)
+        return df
+
+    @staticmethod
+    def _remove_file(path):
+        try: os.remove(path)
+        except OSError: pass
+
+_cache = QueryResultCache()
+
+def get_query_cache():
+    """프로세스 전체에서 공유하는 쿼리 결과 캐시를 반환합니다."""
+    return _cache
+
+def read_sql_cached(sql_query, conn, db_path=None, loader=None, key_extra=None):
+    """pd.read_sql_query와 같지만, DB가 바뀌지 않았으면 캐시된 결과를 반환합니다.
+    (DataFrame, 캐시 적중 여부) 튜플을 반환합니다. 결과 DataFrame은 수정하지 말고 복사해서 사용하세요.
+    loader(sql, conn)를 주면 pd.read_sql_query 대신 사용하며, 결과가 달라지는 옵션은 key_extra로 구분합니다."""
+    loader = loader or (lambda sql, c: pd.read_sql_query(sql, c))
+    db_path = db_path or get_db_path(conn)
+    if not db_path or not is_cacheable(sql_query):
+        return loader(sql_query, conn), False
+    key = (os.path.realpath(db_path), normalize_sql(sql_query)) + ((key_extra,) if key_extra is not None else ())
+    stamp = data_stamp(db_path)
+    df = _cache.get(key, stamp)
+    if df is not None:
+        return df, True
+    df = loader(sql_query, conn)
+    _cache.put(key, stamp, df)
+    return df, False
@@ -0,0 +1,201 @@
+import os
+import re
+import time
+import sqlite3
+import pandas as pd
+from query_cache import read_sql_cached, is_cacheable, normalize_sql
+from query_history import record_query
+
+# --- 쿼리 실행 보호 장치 ---
+# Gemini가 만든 쿼리나 직접 입력한 쿼리가 인덱스 없는 교차 조인 등으로 작업 스레드를 붙잡지 않도록
+#   1) 실행 전 EXPLAIN QUERY PLAN으로 전체 스캔(SCAN) 대상 테이블과 예상 행 수를 확인하고
+#      - 큰 테이블 전체 스캔은 경고, 여러 테이블 전체 스캔의 곱이 한도를 넘으면 실행 거부
+#   2) 실행 중에는 progress handler로 제한 시간을 넘기면 중단 (sqlite3.OperationalError: interrupted)
+#   3) 반환 행 수를 QUERY_MAX_ROWS로 제한
+#   4) 조회 쿼리(SELECT/WITH)만 실행하고, 실행 중에는 authorizer로 쓰기 작업을 거부
+#      (scapp의 get_connection 연결은 쓰기 가능하므로 커밋되지 않은 쓰기가 쓰기 잠금을 잡지 않도록)
+QUERY_TIME_BUDGET = float(os.environ.get("QUERY_TIME_BUDGET", "15"))          # 실행 제한 시간(초)
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", "200000"))              # 최대 반환 행 수
+QUERY_SCAN_WARN_ROWS = int(os.environ.get("QUERY_SCAN_WARN_ROWS", "100000"))  # 이보다 큰 테이블 전체 스캔은 경고
+QUERY_SCAN_REJECT_ROWS = int(os.environ.get("QUERY_SCAN_REJECT_ROWS", "10000000")) # 중첩 전체 스캔 예상 행 수 한도
+PROGRESS_HANDLER_STEPS = 10000 # VM 명령 N개마다 제한 시간 확인
+
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\S+)")
+# FROM/JOIN/쉼표 뒤의 "테이블 [AS] 별칭" (EXPLAIN QUERY PLAN은 테이블 대신 별칭으로 표시함)
+_TABLE_REF_RE = re.compile(r'(?:\bFROM\b|\bJOIN\b|,)\s*((?:"[^"]+"|\w+)(?:\.(?:"[^"]+"|\w+))?)(?:\s+(?:AS\s+)?("[^"]+"|\w+))?',
+                           re.IGNORECASE)
+_ALIAS_STOP_WORDS = {"WHERE", "GROUP", "ORDER", "LIMIT", "HAVING", "ON", "USING", "JOIN", "LEFT", "RIGHT", "FULL",
+                     "INNER", "OUTER", "CROSS", "NATURAL", "UNION", "EXCEPT", "INTERSECT", "WINDOW", "FROM",
+                     "INDEXED", "NOT", "AS", "SELECT", "WITH", "VALUES"}
+
+class QueryRejected(Exception):
+    """실행 계획 검사에서 거부된 쿼리"""
+
+class QueryTimeout(Exception):
+    """제한 시간을 넘겨 중단된 쿼리"""
+
+_WRITE_ACTIONS = {getattr(sqlite3, name) for name in (
+    "SQLITE_INSERT", "SQLITE_UPDATE", "SQLITE_DELETE", "SQLITE_CREATE_TABLE", "SQLITE_CREATE_INDEX",
+    "SQLITE_CREATE_VIEW", "SQLITE_CREATE_TRIGGER", "SQLITE_CREATE_TEMP_TABLE", "SQLITE_CREATE_TEMP_INDEX",
+    "SQLITE_CREATE_TEMP_VIEW", "SQLITE_CREATE_TEMP_TRIGGER", "SQLITE_CREATE_VTABLE", "SQLITE_DROP_TABLE",
+    "SQLITE_DROP_INDEX", "SQLITE_DROP_VIEW", "SQLITE_DROP_TRIGGER", "SQLITE_DROP_TEMP_TABLE",
+    "SQLITE_DROP_TEMP_INDEX", "SQLITE_DROP_TEMP_VIEW", "SQLITE_DROP_TEMP_TRIGGER", "SQLITE_DROP_VTABLE",
+    "SQLITE_ALTER_TABLE", "SQLITE_ATTACH", "SQLITE_DETACH", "SQLITE_REINDEX", "SQLITE_ANALYZE",
+    "SQLITE_TRANSACTION", "SQLITE_SAVEPOINT") if hasattr(sqlite3, name)}
+
+def _read_only_authorizer(action, arg1, arg2, db_name, trigger):
+    # 스키마를 읽을 때 SQLite 내부에서 sqlite_master 등에 대한 UPDATE 확인이 오므로 sqlite_ 테이블은 허용
+    if action in _WRITE_ACTIONS and not (arg1 or "").startswith("sqlite_"):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+def _clear_authorizer(conn):
+    try:
+        conn.set_authorizer(None)
+    except TypeError: # Python 3.11 미만은 None 미지원
+        conn.set_authorizer(lambda *args: sqlite3.SQLITE_OK)
+
+def require_select(sql_query):
+    """조회 쿼리(SELECT/WITH)가 아니면 QueryRejected를 발생시킵니다."""
+    if not is_cacheable(sql_query):
+        raise QueryRejected("조회 쿼리(SELECT)만 실행할 수 있습니다.")
+
+def explain_plan(conn, sql_query):
+    """EXPLAIN QUERY PLAN 결과의 detail 문자열 목록을 반환합니다."""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql_query).fetchall()]
+
+def estimate_table_rows(conn, table_name):
+    """테이블의 대략적인 행 수 (sqlite_stat1 우선, 없으면 MAX(rowid)). 테이블이 아니면 None"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone() is None:
+        return None # 서브쿼리/CTE 별칭 등
+    try:
+        row = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,)).fetchone()
+        if row and row[0]:
+            return int(row[0].split()[0])
+    except sqlite3.Error:
+        pass # sqlite_stat1 없음 (ANALYZE 미실행)
+    try:
+        return conn.execute(f'SELECT MAX(rowid) FROM "{table_name}"').fetchone()[0] or 0
+    except sqlite3.Error:
+        return None # WITHOUT ROWID 테이블 등
+
+def table_aliases(conn, sql_query):
+    """SQL의 FROM/JOIN 절에서 {별칭(소문자): 테이블 이름}을 찾습니다. (DB에 있는 테이블만)"""
+    tables = {row[0].lower(): row[0] for row in
+              conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    aliases = {}
+    for table, alias in _TABLE_REF_RE.findall(normalize_sql(sql_query)):
+        table = table.split(".")[-1].strip('"')
+        alias = alias.strip('"')
+        if alias and alias.upper() not in _ALIAS_STOP_WORDS and table.lower() in tables:
+            aliases[alias.lower()] = tables[table.lower()]
+    return aliases
+
+def _largest_table_rows(conn):
+    """DB에서 가장 큰 테이블의 예상 행 수 (스캔 대상을 알 수 없을 때의 보수적 추정)"""
+    names = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()]
+    return max([estimate_table_rows(conn, name) or 0 for name in names] or [0])
+
+def check_plan(conn, sql_query, warn_rows=QUERY_SCAN_WARN_ROWS, reject_rows=QUERY_SCAN_REJECT_ROWS):
+    """실행 계획을 검사합니다. {'plan', 'scans', 'est_rows', 'warnings'}를 반환하고,
+    중첩 루프로 도는 전체 스캔들의 예상 행 수 곱이 reject_rows를 넘으면 QueryRejected를 발생시킵니다.
+    별칭으로 표시된 스캔은 원래 테이블로 바꾸고, 알 수 없는 스캔(서브쿼리/CTE 등)은 가장 큰 테이블 크기로 봅니다."""
+    plan_rows = conn.execute("EXPLAIN QUERY PLAN " + sql_query).fetchall()  # (id, parent, notused, detail)
+    plan = [row[3] for row in plan_rows]
+    parents = {row[0]: row[1] for row in plan_rows}
+    details = {row[0]: row[3] for row in plan_rows}
+    loops = {}   # 부모 노드 -> 그 아래 전체 스캔 목록 (같은 부모의 스캔끼리 중첩 루프)
+    aliases = largest = None
+    for node, parent, _, detail in plan_rows:
+        match = _SCAN_RE.match(detail)
+        if not match or detail.startswith("SCAN CONSTANT ROW"):
+            continue
+        name = match.group(1).strip('"')
+        rows = estimate_table_rows(conn, name)
+        if rows is None:
+            if aliases is None:
+                aliases = table_aliases(conn, sql_query)
+            table = aliases.get(name.lower())
+            rows = estimate_table_rows(conn, table) if table else None
+            if rows is not None:
+                name = f"{name}({table})"
+            else:
+                if largest is None:
+                    largest = _largest_table_rows(conn)
+                name, rows = f"{name}(추정 불가)", largest
+        loops.setdefault(parent, []).append((name, rows))
+    scans = [scan for group in loops.values() for scan in group]
+    # 루프별 스캔 조합: MATERIALIZE 등 한 번만 실행되는 서브쿼리는 따로, 상관 서브쿼리는 바깥 루프와 곱함
+    worst, est_rows = [], 0
+    for parent, group in loops.items():
+        nested = list(group)
+        node = parent
+        while node in details and details[node].startswith("CORRELATED"):
+            node = parents[node]
+            nested += loops.get(node, [])
+        product = 1
+        for _, rows in nested:
+            product *= max(rows, 1)
+        if product > est_rows:
+            worst, est_rows = nested, product
+    warnings = [f"'{table}' 전체 스캔 (약 {rows:,}행)" for table, rows in scans if rows > warn_rows]
+    if len(worst) > 1 and est_rows > reject_rows:
+        raise QueryRejected(f"인덱스 없이 여러 테이블을 전체 스캔합니다 ({' x '.join(f'{t}({r:,})' for t, r in worst)} "
+                            f"= 약 {est_rows:,}행 조합, 한도 {reject_rows:,}). 조인 조건이나 WHERE 조건을 추가하세요.")
+    return {'plan': plan, 'scans': scans, 'est_rows': est_rows, 'warnings': warnings}
+
+def fetch_limited(conn, sql_query, max_rows=QUERY_MAX_ROWS, time_budget=QUERY_TIME_BUDGET, timings=None):
+    """제한 시간과 최대 행 수를 지키며 쿼리 결과를 DataFrame으로 가져옵니다.
+    제한 시간을 넘기면 QueryTimeout을 발생시킵니다.
+    timings(dict)를 주면 실행(첫 행까지) 시간 'execute_ms'와 가져오기 시간 'fetch_ms'를 채웁니다.
+    조회 쿼리가 아니면 QueryRejected를 발생시킵니다."""
+    require_select(sql_query)
+    start = time.perf_counter()
+    deadline = start + time_budget
+    conn.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, PROGRESS_HANDLER_STEPS)
+    conn.set_authorizer(_read_only_authorizer) # WITH ... DELETE 등 텍스트 검사를 통과한 쓰기도 거부
+    try:
+        cursor = conn.execute(sql_query) # SQLite는 첫 행을 만들 때까지 여기서 실행
+        columns = [d[0] for d in cursor.description] if cursor.description else []
+        executed = time.perf_counter()
+        rows = cursor.fetchmany(max_rows)
+        cursor.close()
+        if timings is not None:
+            timings.update(execute_ms=(executed - start) * 1000, fetch_ms=(time.perf_counter() - executed) * 1000)
+    except sqlite3.DatabaseError as e:
+        if "interrupt" in str(e).lower():
+            raise QueryTimeout(f"제한 시간 {time_budget:g}초를 넘겨 쿼리를 중단했습니다.") from e
+        if "not authorized" in str(e).lower():
+            raise QueryRejected("조회 쿼리(SELECT)만 실행할 수 있습니다.") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+        _clear_authorizer(conn)
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+def run_guarded_query(conn, sql_query, db_path=None, time_budget=QUERY_TIME_BUDGET, max_rows=QUERY_MAX_ROWS,
+                      warn_rows=QUERY_SCAN_WARN_ROWS, reject_rows=QUERY_SCAN_REJECT_ROWS, source=None, llm_ms=None):
+    """실행 계획 검사 -> 제한 시간/행 수 제한 실행 (DB가 바뀌지 않았으면 캐시 사용).
+    {'df', 'plan', 'warnings', 'est_rows', 'elapsed', 'truncated', 'cache_hit', 'timings'}를 반환합니다.
+    조회 쿼리가 아니거나 거부되면 QueryRejected, 시간 초과 시 QueryTimeout을 발생시킵니다.
+    source(페이지 이름)를 주면 실행 결과를 쿼리 기록에 남깁니다. (llm_ms: SQL 생성에 걸린 시간)"""
+    start = time.perf_counter()
+    timings = {}
+    try:
+        require_select(sql_query)
+        checked = check_plan(conn, sql_query, warn_rows, reject_rows)
+        df, cache_hit = read_sql_cached(sql_query, conn, db_path,
+                                        loader=lambda sql, c: fetch_limited(c, sql, max_rows, time_budget, timings),
+                                        key_extra=("guarded", max_rows))
+    except Exception as e:
+        if source:
+            record_query(source, sql_query, llm_ms=llm_ms, total_ms=(time.perf_counter() - start) * 1000,
+                         error=f"{type(e).__name__}: {e}")
+        raise
+    checked.update(df=df, cache_hit=cache_hit, elapsed=time.perf_counter() - start,
+                   truncated=len(df) >= max_rows, timings=timings)
+    if source:
+        record_query(source, sql_query, llm_ms=llm_ms, execute_ms=timings.get('execute_ms'),
+                     fetch_ms=timings.get('fetch_ms'), total_ms=checked['elapsed'] * 1000, rows=len(df),
+                     nbytes=int(df.memory_usage(deep=True).sum()), cache_hit=cache_hit)
+    return checked
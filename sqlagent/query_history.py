@@ -0,0 +1,114 @@
+import os
+import time
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import pandas as pd
+from query_cache import normalize_sql
+
+# --- 쿼리 실행 기록 / 느린 쿼리 로그 ---
+# 모든 SQL 실행 경로(scapp, sqlagent1, sqlquery1, barchart1)의 실행 내역을 로컬 SQLite 파일에 남깁니다.
+# 어떤 쿼리가 자주/느리게 실행되는지 보고 인덱스나 캐시가 실제로 필요한지 판단하는 데 사용합니다.
+#   - 쿼리 해시: 정규화된 SQL 기준 (공백/주석 차이는 같은 쿼리로 집계)
+#   - 시간(ms): LLM 생성, 실행(첫 행까지), 가져오기(fetch), 전체
+QUERY_HISTORY_DB_PATH = os.environ.get("QUERY_HISTORY_DB", os.path.join(tempfile.gettempdir(), "sqlagent_query_history.db"))
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "1000"))
+SQL_TEXT_MAX_CHARS = 2000
+HISTORY_QUERY_LIMIT = 100000     # 통계 계산에 읽어오는 최대 기록 수
+
+def query_hash(sql_query):
+    return hashlib.sha1(normalize_sql(sql_query).encode("utf-8")).hexdigest()[:16]
+
+class QueryHistory:
+    """실행 기록 저장/조회 (연결 하나를 잠금으로 보호)"""
+
+    def __init__(self, db_path=QUERY_HISTORY_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS query_history(
+                                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                  ts REAL NOT NULL, source TEXT, query_hash TEXT, sql_text TEXT,
+                                  llm_ms REAL, execute_ms REAL, fetch_ms REAL, total_ms REAL,
+                                  rows INTEGER, bytes INTEGER, cache_hit INTEGER, error TEXT)''')
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_query_history_ts ON query_history(ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_query_history_total ON query_history(total_ms)")
+        self._conn.commit()
+
+    def record(self, source, sql_query, llm_ms=None, execute_ms=None, fetch_ms=None, total_ms=None,
+               rows=None, nbytes=None, cache_hit=None, error=None):
+        """실행 한 건을 기록합니다. 기록 실패는 쿼리 실행에 영향을 주지 않도록 출력만 합니다."""
+        try:
+            with self._lock:
+                self._conn.execute('''INSERT INTO query_history(ts, source, query_hash, sql_text, llm_ms, execute_ms,
+                                          fetch_ms, total_ms, rows, bytes, cache_hit, error)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                   (time.time(), source, query_hash(sql_query), (sql_query or "")[:SQL_TEXT_MAX_CHARS],
+                                    llm_ms, execute_ms, fetch_ms, total_ms, rows, nbytes,
+                                    None if cache_hit is None else int(bool(cache_hit)), error))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"쿼리 기록 저장 실패: {e}")
+
+    def load(self, since=None, sources=None, limit=HISTORY_QUERY_LIMIT):
+        """기록을 최신순 DataFrame으로 반환합니다. (since: epoch 초, sources: 페이지 이름 목록)"""
+        where, params = [], []
+        if since is not None:
+            where.append("ts >= ?"); params.append(since)
+        if sources:
+            where.append(f"source IN ({','.join('?' * len(sources))})"); params.extend(sources)
+        sql = ("SELECT * FROM query_history" + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY ts DESC LIMIT ?")
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params + [limit])
+
+    def sources(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT source FROM query_history ORDER BY 1").fetchall()]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM query_history")
+            self._conn.commit()
+
+def latency_percentiles(history_df, by="source", column="total_ms"):
+    """그룹별 실행 횟수, p50/p95/p99/최대 시간(ms), 캐시 적중률"""
+    ok = history_df[history_df["error"].isna() & history_df[column].notna()]
+    if ok.empty:
+        return pd.DataFrame(columns=[by, "count", "p50", "p95", "p99", "max", "cache_hit_rate"])
+    grouped = ok.groupby(by)
+    summary = grouped[column].quantile([0.5, 0.95, 0.99]).unstack()
+    summary.columns = ["p50", "p95", "p99"]
+    summary.insert(0, "count", grouped.size())
+    summary["max"] = grouped[column].max()
+    summary["cache_hit_rate"] = grouped["cache_hit"].mean()
+    return summary.reset_index().sort_values("p95", ascending=False)
+
+def slowest_queries(history_df, limit=20):
+    """쿼리 해시별 통계를 p95 시간 순으로 반환합니다. (대표 SQL 포함)"""
+    summary = latency_percentiles(history_df, by="query_hash")
+    if summary.empty:
+        return summary
+    samples = history_df.drop_duplicates("query_hash").set_index("query_hash")
+    summary["source"] = summary["query_hash"].map(samples["source"])
+    summary["avg_rows"] = summary["query_hash"].map(history_df.groupby("query_hash")["rows"].mean())
+    summary["sql_text"] = summary["query_hash"].map(samples["sql_text"])
+    return summary.head(limit)
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_query_history():
+    """프로세스 전체에서 공유하는 실행 기록 저장소를 반환합니다. (처음 호출 시 생성)"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = QueryHistory()
+        return _history
+
+def record_query(source, sql_query, **timings):
+    """get_query_history().record()의 축약형"""
+    get_query_history().record(source, sql_query, **timings)
@@ -0,0 +1,260 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from upload_store import open_readonly
+from query_cache import normalize_sql
+from query_guard import check_plan, QueryRejected, QUERY_TIME_BUDGET, QUERY_MAX_ROWS, PROGRESS_HANDLER_STEPS
+
+# --- 백그라운드 쿼리 실행 ---
+# Streamlit 스크립트 스레드에서 결과를 모두 읽을 때까지 기다리지 않고, 작업 스레드에서 실행하며
+# 행을 배치 단위로 모읍니다. 화면은 주기적으로 다시 그려 지금까지 가져온 행을 보여주고,
+# 취소 시 Connection.interrupt()로 실행 중인 SQLite 문을 즉시 중단합니다.
+QUERY_WORKERS = int(os.environ.get("QUERY_WORKERS", "4"))
+STREAM_FIRST_BATCH = 200     # 첫 화면을 빨리 보여주기 위한 작은 첫 배치
+STREAM_BATCH_SIZE = 5000
+
+_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query_job")
+
+class QueryJob:
+    """백그라운드에서 실행되는 쿼리 하나의 상태와 지금까지 가져온 행"""
+    RUNNING_STATES = ("pending", "running")
+
+    def __init__(self, db_file, sql_query, max_rows=QUERY_MAX_ROWS, time_budget=QUERY_TIME_BUDGET):
+        self.db_file = db_file
+        self.sql_query = sql_query.strip()
+        self.max_rows = max_rows
+        self.time_budget = time_budget
+        self.status = "pending"      # pending / running / done / cancelled / timeout / error
+        self.error = None
+        self.plan = []
+        self.warnings = []
+        self.columns = []
+        self.truncated = False
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.executed_at = None      # 첫 행을 만들 때까지 실행이 끝난 시각 (이후는 가져오기 시간)
+        self.finished_at = None
+        self._batches = []
+        self._rows_fetched = 0
+        self._conn = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.status in self.RUNNING_STATES
+
+    @property
+    def rows_fetched(self):
+        with self._lock:
+            return self._rows_fetched
+
+    @property
+    def elapsed(self):
+        end = self.finished_at or time.perf_counter()
+        return end - (self.started_at or self.submitted_at)
+
+    @property
+    def timings(self):
+        """끝난 작업의 실행/가져오기 시간(ms). 실행 전에 끝났으면 빈 dict"""
+        if self.started_at is None or self.executed_at is None or self.finished_at is None:
+            return {}
+        return {'execute_ms': (self.executed_at - self.started_at) * 1000,
+                'fetch_ms': (self.finished_at - self.executed_at) * 1000}
+
+    def cancel(self):
+        """실행 중이면 SQLite 문을 중단합니다. (이미 끝난 작업이면 아무 것도 하지 않음)"""
+        self._cancelled.set()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def to_dataframe(self, limit=None):
+        """지금까지 가져온 행을 DataFrame으로 반환합니다. (limit 지정 시 앞부분만)"""
+        with self._lock:
+            batches = list(self._batches)
+        rows = []
+        for batch in batches:
+            rows.extend(batch)
+            if limit is not None and len(rows) >= limit:
+                rows = rows[:limit]
+                break
+        return pd.DataFrame.from_records(rows, columns=self.columns)
+
+    def take_dataframe(self):
+        """끝난 작업의 전체 행을 DataFrame으로 반환하고, 작업이 들고 있던 행은 비웁니다."""
+        df = self.to_dataframe()
+        with self._lock:
+            self._batches = []
+        return df
+
+    def run(self):
+        """(작업 스레드에서 실행) 실행 계획 검사 후 배치 단위로 행을 가져옵니다."""
+        if self._cancelled.is_set():
+            self._finish("cancelled"); return
+        self.started_at = time.perf_counter()
+        self.status = "running"
+        try:
+            conn = open_readonly(self.db_file)
+        except sqlite3.Error as e:
+            self._finish("error", f"SQLite 연결 실패: {e}"); return
+        with self._lock:
+            self._conn = conn
+        deadline = self.started_at + self.time_budget
+        try:
+            conn.set_progress_handler(lambda: 1 if time.perf_counter() > deadline else 0, PROGRESS_HANDLER_STEPS)
+            self._execute(conn)
+            self._finish("cancelled" if self._cancelled.is_set() else "done")
+        except QueryRejected as e:
+            self._finish("error", str(e))
+        except sqlite3.OperationalError as e:
+            if "interrupt" in str(e).lower(): # 취소 또는 제한 시간 초과
+                self._finish("cancelled" if self._cancelled.is_set() else "timeout",
+                             None if self._cancelled.is_set() else f"제한 시간 {self.time_budget:g}초를 넘겨 중단했습니다.")
+            else:
+                self._finish("error", f"데이터베이스 오류: {e}")
+        except sqlite3.Error as e:
+            self._finish("error", f"데이터베이스 오류: {e}")
+        except Exception as e: # 그 밖의 오류로 작업 스레드가 끝나도 상태가 running으로 남지 않도록
+            self._finish("error", f"쿼리 실행 중 오류 발생: {e}")
+        finally:
+            with self._lock:
+                self._conn = None
+            conn.close()
+
+    def _execute(self, conn):
+        checked = check_plan(conn, self.sql_query)
+        self.plan, self.warnings = checked['plan'], checked['warnings']
+        cursor = conn.execute(self.sql_query)
+        self.executed_at = time.perf_counter()
+        self._fetch_batches(cursor)
+
+    def _fetch_batches(self, cursor):
+        """커서의 행을 배치 단위로 모읍니다. (취소되거나 max_rows에 도달하면 중단)"""
+        self.columns = [d[0] for d in cursor.description] if cursor.description else []
+        batch_size = STREAM_FIRST_BATCH
+        while not self._cancelled.is_set():
+            batch = cursor.fetchmany(min(batch_size, self.max_rows - self._rows_fetched))
+            if not batch:
+                break
+            with self._lock:
+                self._batches.append(batch)
+                self._rows_fetched += len(batch)
+            if self._rows_fetched >= self.max_rows:
+                self.truncated = True
+                break
+            batch_size = STREAM_BATCH_SIZE
+
+    def _finish(self, status, error=None):
+        self.error = error
+        self.finished_at = time.perf_counter()
+        self.status = status
+
+_TRANSACTION_RE = re.compile(r"^\s*(BEGIN|COMMIT|END|ROLLBACK)\b", re.IGNORECASE)
+_ROWS_RE = re.compile(r"^\s*(SELECT|WITH|VALUES|PRAGMA)\b", re.IGNORECASE) # 행을 반환하는 문
+
+def split_statements(script):
+    """스크립트를 SQL 문 목록으로 나눕니다. (sqlite3.complete_statement 기준이라 문자열/주석/트리거 본문 안의 ;는 나누지 않음)"""
+    statements, buffer = [], ""
+    for part in script.split(";"):
+        buffer += part + ";"
+        if sqlite3.complete_statement(buffer):
+            if normalize_sql(buffer): # 빈 문/주석만 있는 문 제외
+                statements.append(buffer.strip())
+            buffer = ""
+    rest = buffer[:-1].strip() # 마지막 문은 ; 없이 끝나도 실행
+    if normalize_sql(rest):
+        statements.append(rest)
+    return statements
+
+class ScriptJob(QueryJob):
+    """여러 SQL 문을 한 연결/트랜잭션에서 차례로 실행하는 작업.
+    문마다 소요 시간/행 수/실행 계획을 기록하고, 결과 행은 선택한 문(기본: 행을 반환한 마지막 문)만 모읍니다.
+    업로드 DB는 읽기 전용으로 열리므로 TEMP 테이블만 만들 수 있고, 작업이 끝나면 함께 사라집니다."""
+
+    def __init__(self, db_file, statements, result_index=None, **options):
+        super().__init__(db_file, ";\n".join(s.rstrip(";") for s in statements) + ";", **options)
+        self.statements = [{'sql': sql, 'status': "pending", 'elapsed': None, 'rows': None, 'plan': [], 'error': None}
+                           for sql in statements]
+        self.result_index = result_index   # None이면 행을 반환하는 마지막 문
+        self.result_statement = None       # 결과 행을 모은 문 번호
+        self.current = None                # 실행 중인 문 번호
+
+    def _execute(self, conn):
+        conn.isolation_level = None # 트랜잭션을 직접 관리 (스크립트 전체를 BEGIN ... ROLLBACK 하나로)
+        conn.execute("BEGIN")
+        try:
+            for index, info in enumerate(self.statements):
+                if self._cancelled.is_set():
+                    break
+                self.current = index
+                if _TRANSACTION_RE.match(info['sql']):
+                    info['status'] = "skipped" # 스크립트 전체가 한 트랜잭션으로 실행됨
+                    continue
+                self._run_statement(conn, index, info)
+        finally:
+            self.current = None
+            if conn.in_transaction:
+                try: conn.execute("ROLLBACK") # 읽기 전용 연결이라 남길 변경은 없음 (TEMP 테이블 포함 정리)
+                except sqlite3.Error: pass # 중단된 경우 이미 롤백됨
+
+    def _finish(self, status, error=None):
+        failed = next((i for i, info in enumerate(self.statements) if info['status'] == "error"), None)
+        if error and failed is not None:
+            error = f"{failed + 1}번째 문에서 중단: {error}"
+        super()._finish(status, error)
+
+    def _run_statement(self, conn, index, info):
+        start = time.perf_counter()
+        info['status'] = "running"
+        try:
+            checked = check_plan(conn, info['sql'])
+            info['plan'] = checked['plan']
+            self.warnings.extend(f"{index + 1}번째 문: {warning}" for warning in checked['warnings'])
+            cursor = conn.execute(info['sql'])
+            if cursor.description is None: # 행을 반환하지 않는 문 (CREATE TEMP TABLE, INSERT 등)
+                info['rows'] = cursor.rowcount if cursor.rowcount >= 0 else None
+            elif self._is_result(index):
+                self._take_result(cursor, index, info)
+            else: # 결과를 보지 않는 문은 행 수만 셈 (행을 보관하지 않음)
+                info['rows'] = 0
+                while not self._cancelled.is_set():
+                    batch = cursor.fetchmany(STREAM_BATCH_SIZE)
+                    if not batch:
+                        break
+                    info['rows'] += len(batch)
+            info['status'] = "done"
+        except Exception as e: # 실패한 문을 표시하고 run()에서 작업을 끝냄
+            info['status'], info['error'] = "error", str(e)
+            raise
+        finally:
+            info['elapsed'] = time.perf_counter() - start
+
+    def _is_result(self, index):
+        if self.result_index is not None:
+            return index == self.result_index
+        # 지정하지 않았으면 뒤에 행을 반환하는 문이 없을 때만 결과로 사용
+        return not any(_ROWS_RE.match(info['sql']) for info in self.statements[index + 1:])
+
+    def _take_result(self, cursor, index, info):
+        """이 문의 결과 행을 작업 결과로 모읍니다."""
+        self.executed_at = time.perf_counter()
+        self.plan, self.result_statement = info['plan'], index
+        self._fetch_batches(cursor)
+        info['rows'] = self._rows_fetched
+
+def submit_query(db_file, sql_query, **options):
+    """쿼리를 작업 스레드 풀에 제출하고 QueryJob을 바로 반환합니다."""
+    job = QueryJob(db_file, sql_query, **options)
+    _executor.submit(job.run)
+    return job
+
+def submit_script(db_file, statements, result_index=None, **options):
+    """split_statements()로 나눈 문 목록을 작업 스레드 풀에 제출하고 ScriptJob을 바로 반환합니다."""
+    job = ScriptJob(db_file, statements, result_index, **options)
+    _executor.submit(job.run)
+    return job
@@ -0,0 +1,144 @@
+import os
+import uuid
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+import pandas as pd
+
+# --- 세션별 쿼리 결과 저장소 ---
+# 페이지마다 st.session_state['df'] 같은 공용 키에 전체 DataFrame을 제한 없이 두지 않고,
+# 세션마다 하나의 저장소에 페이지 이름(namespace)별로 결과를 보관합니다.
+#   - 저장 시 반복 값이 많은 문자열 컬럼(status, owner 등)은 category 타입으로 변환해 메모리 절약
+#   - 세션 메모리 한도(RESULT_STORE_SESSION_MB)를 넘으면 가장 오래 사용하지 않은 결과를 Parquet로 내려보냄
+#   - 세션이 끝나 저장소가 사라지면 내려보낸 파일도 삭제
+RESULT_STORE_SESSION_BYTES = int(os.environ.get("RESULT_STORE_SESSION_MB", "128")) * 1024 * 1024
+RESULT_STORE_SPILL_DIR = os.environ.get("RESULT_STORE_SPILL_DIR", os.path.join(tempfile.gettempdir(), "sqlagent_results"))
+CATEGORY_COLUMNS = ("status", "result", "owner", "cat1", "cat2", "cat3", "cat4", "cat5")
+CATEGORY_MAX_UNIQUE = 1000      # 그 밖의 문자열 컬럼도 고유값이 적으면 category로 변환
+CATEGORY_MAX_RATIO = 0.5
+SESSION_STORE_KEY = "_result_store"
+
+def compact_dataframe(df):
+    """반복 값이 많은 문자열 컬럼을 category로 바꾼 DataFrame을 반환합니다. (원본은 수정하지 않음)"""
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if not (series.dtype == object or isinstance(series.dtype, pd.StringDtype)): # 문자열 컬럼만
+            continue
+        if col in CATEGORY_COLUMNS:
+            converted[col] = series.astype("category")
+        elif len(series) >= 100:
+            unique = series.nunique(dropna=True)
+            if unique <= CATEGORY_MAX_UNIQUE and unique <= len(series) * CATEGORY_MAX_RATIO:
+                converted[col] = series.astype("category")
+    return df.assign(**converted) if converted else df
+
+def _remove_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+class ResultStore:
+    """한 세션의 페이지별 결과 (메모리 한도 + LRU Parquet 내려보내기)"""
+
+    def __init__(self, max_bytes=RESULT_STORE_SESSION_BYTES, spill_dir=RESULT_STORE_SPILL_DIR):
+        self.max_bytes = max_bytes
+        self.spill_dir = os.path.join(spill_dir, uuid.uuid4().hex)
+        self._entries = OrderedDict()   # namespace -> {'df', 'path', 'bytes', 'meta'}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"spills": 0, "reloads": 0, "dropped": 0}
+        self._finalizer = weakref.finalize(self, _remove_dir, self.spill_dir)
+
+    def put(self, namespace, df, **meta):
+        """결과를 저장하고 (category 변환된) 저장본을 반환합니다."""
+        df = compact_dataframe(df)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._discard(namespace)
+            self._entries[namespace] = {"df": df, "path": None, "bytes": nbytes, "meta": meta}
+            self._bytes += nbytes
+            self._enforce_budget(keep=namespace)
+        return df
+
+    def get(self, namespace):
+        """저장된 결과를 반환합니다. (없으면 None, 내려보낸 결과는 다시 메모리로 읽음)"""
+        with self._lock:
+            entry = self._entries.get(namespace)
+            if entry is None:
+                return None
+            self._entries.move_to_end(namespace)
+            if entry["df"] is not None:
+                return entry["df"]
+            try:
+                df = pd.read_parquet(entry["path"])
+            except Exception as e:
+                print(f"결과 저장소 Parquet 읽기 실패 ({namespace}): {e}")
+                self._discard(namespace)
+                return None
+            self._remove_file(entry["path"])
+            entry.update(df=df, path=None, bytes=int(df.memory_usage(deep=True).sum()))
+            self._bytes += entry["bytes"]
+            self._stats["reloads"] += 1
+            self._enforce_budget(keep=namespace)
+            return df
+
+    def get_meta(self, namespace):
+        with self._lock:
+            entry = self._entries.get(namespace)
+            return dict(entry["meta"]) if entry else {}
+
+    def drop(self, namespace):
+        with self._lock:
+            self._discard(namespace)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(memory_bytes=self._bytes,
+                         in_memory=[ns for ns, e in self._entries.items() if e["df"] is not None],
+                         spilled=[ns for ns, e in self._entries.items() if e["df"] is None])
+        return stats
+
+    def _discard(self, namespace):
+        """(잠금 보유 상태에서 호출) 결과 하나 제거"""
+        entry = self._entries.pop(namespace, None)
+        if entry is None:
+            return
+        if entry["df"] is not None:
+            self._bytes -= entry["bytes"]
+        if entry["path"]:
+            self._remove_file(entry["path"])
+
+    def _enforce_budget(self, keep):
+        """(잠금 보유 상태에서 호출) 한도를 넘으면 가장 오래 사용하지 않은 결과부터 Parquet로 내려보냄"""
+        for namespace in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries[namespace]
+            if namespace == keep or entry["df"] is None:
+                continue
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.parquet")
+            try:
+                entry["df"].to_parquet(path, index=False)
+            except Exception as e: # pyarrow 미설치 등 → 결과를 버림
+                print(f"결과 저장소 Parquet 저장 실패 ({namespace}), 결과를 제거합니다: {e}")
+                self._discard(namespace)
+                self._stats["dropped"] += 1
+                continue
+            self._bytes -= entry["bytes"]
+            entry.update(df=None, path=path)
+            self._stats["spills"] += 1
+
+    @staticmethod
+    def _remove_file(path):
+        try: os.remove(path)
+        except OSError: pass
+
+def get_session_result_store(session_state):
+    """st.session_state에 세션 전용 ResultStore를 만들어 두고 반환합니다."""
+    store = session_state.get(SESSION_STORE_KEY)
+    if store is None:
+        store = session_state[SESSION_STORE_KEY] = ResultStore()
+    return store
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from query_cache import get_db_path
+from query_guard import estimate_table_rows
+from upload_store import open_readonly, UPLOAD_STORE_DIR
+
+# --- DB 스키마(카탈로그) 캐시 ---
+# 페이지마다 스크립트가 다시 실행될 때마다 sqlite_master를 조회하지 않도록
+# 테이블 목록, 컬럼 이름/타입, 대략적인 행 수, 인덱스를 DB별로 한 번만 읽어 공유합니다.
+# 캐시 키
+#   - 업로드 저장소 파일: 내용 해시(파일 이름) → 파일을 열지 않고도 적중 확인
+#   - 그 외 DB: (실제 경로, PRAGMA schema_version) → 테이블/인덱스가 바뀌면 다시 읽음
+SCHEMA_CACHE_ITEMS = 64
+DIGEST_MAX_CHARS = 2000    # Gemini 프롬프트에 넣는 스키마 요약 최대 길이
+
+_schemas = OrderedDict()
+_schemas_lock = threading.Lock()
+
+def _schema_key(db_path, conn=None):
+    real_path = os.path.realpath(db_path)
+    if os.path.dirname(real_path) == os.path.realpath(UPLOAD_STORE_DIR):
+        return ("content", os.path.splitext(os.path.basename(real_path))[0])
+    if conn is None:
+        probe = open_readonly(db_path)
+        try: version = probe.execute("PRAGMA schema_version").fetchone()[0]
+        finally: probe.close()
+    else:
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    return ("path", real_path, version)
+
+def read_schema(conn):
+    """연결된 DB의 테이블별 컬럼/행 수 추정/인덱스 정보를 읽습니다."""
+    tables = OrderedDict()
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name").fetchall()
+    virtual = [name for name, sql in rows if (sql or "").upper().startswith("CREATE VIRTUAL TABLE")]
+    # FTS 등 가상 테이블이 내부적으로 만드는 보조 테이블(chk1_fts_data 등)은 제외
+    shadow_prefixes = tuple(f"{name}_" for name in virtual)
+    names = [name for name, _ in rows if name in virtual or not name.startswith(shadow_prefixes)]
+    for name in names:
+        quoted = '"' + name.replace('"', '""') + '"'
+        try:
+            columns = [(row[1], row[2] or "", bool(row[3]), bool(row[5]))  # 이름, 타입, NOT NULL, PK
+                       for row in conn.execute(f"PRAGMA table_info({quoted})").fetchall()]
+            indexes = []
+            for row in conn.execute(f"PRAGMA index_list({quoted})").fetchall():
+                index_name = '"' + row[1].replace('"', '""') + '"'
+                index_cols = [c[2] for c in conn.execute(f"PRAGMA index_info({index_name})").fetchall()]
+                indexes.append((row[1], index_cols, bool(row[2])))  # 이름, 컬럼, UNIQUE
+        except sqlite3.Error: # FTS5 등 모듈이 없어 읽을 수 없는 가상 테이블
+            columns, indexes = [], []
+        tables[name] = {"columns": columns, "row_estimate": estimate_table_rows(conn, name), "indexes": indexes}
+    return {"tables": tables}
+
+def get_db_schema(db_path=None, conn=None):
+    """DB 스키마를 반환합니다. (같은 DB면 캐시된 결과, conn이 없으면 필요할 때만 읽기 전용으로 연결)
+    반환: {'tables': {테이블: {'columns': [(이름, 타입, notnull, pk)], 'row_estimate': int|None,
+                               'indexes': [(이름, [컬럼], unique)]}}}"""
+    db_path = db_path or get_db_path(conn)
+    key = _schema_key(db_path, conn)
+    with _schemas_lock:
+        schema = _schemas.get(key)
+        if schema is not None:
+            _schemas.move_to_end(key)
+            return schema
+    if conn is None:
+        reader = open_readonly(db_path)
+        try: schema = read_schema(reader)
+        finally: reader.close()
+    else:
+        schema = read_schema(conn)
+    with _schemas_lock:
+        _schemas[key] = schema
+        while len(_schemas) > SCHEMA_CACHE_ITEMS:
+            _schemas.popitem(last=False)
+    return schema
+
+def schema_digest(schema, table_name=None, max_chars=DIGEST_MAX_CHARS):
+    """프롬프트용 스키마 요약. 한 줄에 테이블 하나: 테이블(컬럼 타입, ...) ~행 수 [인덱스 컬럼]
+    table_name을 주면 그 테이블을 맨 앞에 두고, 길이가 max_chars를 넘으면 나머지 테이블은 생략합니다."""
+    names = list(schema["tables"])
+    if table_name in schema["tables"]:
+        names.remove(table_name)
+        names.insert(0, table_name)
+    lines, length = [], 0
+    for name in names:
+        info = schema["tables"][name]
+        columns = ", ".join(f"{col} {col_type}".strip() for col, col_type, _, _ in info["columns"])
+        line = f"{name}({columns})"
+        if info["row_estimate"] is not None:
+            line += f" ~{info['row_estimate']:,} rows"
+        indexed = sorted({"/".join(cols) for _, cols, _ in info["indexes"] if cols})
+        if indexed:
+            line += f" [indexed: {', '.join(indexed)}]"
+        if lines and length + len(line) > max_chars:
+            lines.append(f"... ({len(names) - len(lines)} more tables)")
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+def clear_schema_cache():
+    with _schemas_lock:
+        _schemas.clear()
@@ -0,0 +1,57 @@
+import streamlit as st
+import time
+from query_history import get_query_history, latency_percentiles, slowest_queries, SLOW_QUERY_MS
+
+# 조회 기간 -> 초 (None: 전체)
+PERIOD_OPTIONS = {"최근 1시간": 3600, "최근 24시간": 24 * 3600, "최근 7일": 7 * 24 * 3600, "전체": None}
+SLOW_LIST_ROWS = 100   # 느린 쿼리 목록 최대 행 수
+
+# 메인 Streamlit 앱
+def main():
+    st.title("쿼리 기록 / 느린 쿼리")
+    history = get_query_history()
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        period = st.selectbox("기간:", list(PERIOD_OPTIONS), index=1, key="slowquery1_period")
+    with col2:
+        sources = st.multiselect("페이지:", history.sources(), key="slowquery1_sources")
+    with col3:
+        slow_ms = st.number_input("느린 쿼리 기준 (ms):", min_value=0.0, value=SLOW_QUERY_MS, step=100.0, key="slowquery1_slow_ms")
+
+    seconds = PERIOD_OPTIONS[period]
+    df = history.load(since=time.time() - seconds if seconds else None, sources=sources)
+    if df.empty:
+        st.write("기록된 쿼리가 없습니다.")
+        return
+
+    errors = int(df["error"].notna().sum())
+    st.caption(f"실행 {len(df):,}건 · 오류/취소 {errors:,}건 · 캐시 적중 {df['cache_hit'].fillna(0).mean():.0%}")
+
+    # 페이지별 응답 시간 분포 (오류/취소 제외)
+    st.subheader("페이지별 소요 시간 (ms)")
+    st.dataframe(latency_percentiles(df).round(1), hide_index=True)
+    with st.expander("단계별 p95 (LLM 생성 / 실행 / 가져오기)"):
+        stages = {column: latency_percentiles(df, column=column).set_index("source")["p95"]
+                  for column in ("llm_ms", "execute_ms", "fetch_ms")}
+        st.dataframe({column: p95.round(1).to_dict() for column, p95 in stages.items()})
+
+    # 같은 쿼리(정규화된 SQL 해시)별 통계: 자주 실행되면서 느린 쿼리가 인덱스/캐시 후보
+    st.subheader("쿼리별 소요 시간 (p95 순)")
+    st.dataframe(slowest_queries(df).round(1), hide_index=True)
+
+    st.subheader(f"느린 쿼리 ({slow_ms:g} ms 이상)")
+    slow = df[df["total_ms"] >= slow_ms].sort_values("total_ms", ascending=False).head(SLOW_LIST_ROWS).copy()
+    if slow.empty:
+        st.write("기준을 넘는 쿼리가 없습니다.")
+    else:
+        slow["ts"] = slow["ts"].map(lambda ts: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)))
+        st.dataframe(slow[["ts", "source", "total_ms", "llm_ms", "execute_ms", "fetch_ms", "rows", "bytes",
+                           "cache_hit", "error", "sql_text"]].round(1), hide_index=True)
+
+    if st.button("기록 삭제", key="slowquery1_clear_button"):
+        history.clear()
+        st.rerun()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import math
+import pandas as pd
+from query_guard import run_guarded_query
+
+# --- 차트 집계를 SQLite에서 수행 ---
+# 사용자 쿼리 결과를 모두 가져와 pandas로 value_counts/groupby 하지 않고,
+# 쿼리를 서브쿼리로 감싸 GROUP BY 결과(차트에 그릴 행)만 가져옵니다.
+#   SELECT <x 또는 x 구간> AS x, COUNT(*) | SUM(y) AS value FROM (<사용자 쿼리>) GROUP BY 1
+# 컬럼 목록/타입 표본/MIN·MAX 조회도 run_guarded_query로 실행합니다.
+#   (Streamlit 재실행마다 다시 조회하지 않도록 결과 캐시 사용 + 제한 시간 적용)
+DATE_BIN_FORMATS = {
+    "일": "strftime('%Y-%m-%d', {col})",
+    "주": "date({col}, 'weekday 0', '-6 days')",   # 해당 주의 월요일
+    "월": "strftime('%Y-%m', {col})",
+    "년": "strftime('%Y', {col})",
+}
+TYPE_SAMPLE_ROWS = 200
+
+def quote_ident(name):
+    """SQL 식별자(컬럼 이름)를 큰따옴표로 감쌉니다."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+def base_query(sql_query):
+    """서브쿼리로 감쌀 수 있도록 끝의 세미콜론/공백을 제거합니다."""
+    return sql_query.strip().rstrip(";").strip()
+
+def query_columns(conn, sql_query):
+    """쿼리를 실행하지 않고(LIMIT 0) 결과 컬럼 이름 목록을 반환합니다."""
+    return list(run_guarded_query(conn, f"SELECT * FROM ({base_query(sql_query)}) LIMIT 0")['df'].columns)
+
+def infer_column_kind(conn, sql_query, column):
+    """결과 컬럼의 앞부분 표본으로 'numeric' / 'date' / 'category'를 판단합니다."""
+    col = quote_ident(column)
+    sample = run_guarded_query(conn, f"SELECT {col} FROM ({base_query(sql_query)}) WHERE {col} IS NOT NULL "
+                                     f"LIMIT {TYPE_SAMPLE_ROWS}")['df'].iloc[:, 0]
+    if sample.empty:
+        return "category"
+    if pd.to_numeric(sample, errors="coerce").notna().all():
+        return "numeric"
+    if sample.map(lambda v: isinstance(v, str)).all() and \
+            pd.to_datetime(sample, errors="coerce", format="ISO8601").notna().all(): # format="ISO8601"은 pandas 2.0 이상
+        return "date"
+    return "category"
+
+def nice_bin_width(lo, hi, bins):
+    """(hi - lo)를 약 bins개 구간으로 나누는 1/2/5 x 10^n 형태의 구간 폭"""
+    span = (hi - lo) / max(bins, 1)
+    if span <= 0:
+        return 1.0
+    magnitude = 10 ** math.floor(math.log10(span))
+    for step in (1, 2, 5, 10):
+        if span <= step * magnitude:
+            return float(step * magnitude)
+    return float(10 * magnitude)
+
+def numeric_bin_expr(conn, sql_query, column, bins=20):
+    """숫자 컬럼을 구간 시작값으로 바꾸는 SQL 식을 반환합니다. (값이 없으면 None)"""
+    col = quote_ident(column)
+    bounds = run_guarded_query(conn, f"SELECT MIN(CAST({col} AS REAL)), MAX(CAST({col} AS REAL)) "
+                                     f"FROM ({base_query(sql_query)})")['df']
+    lo, hi = bounds.iloc[0]
+    if pd.isna(lo):
+        return None
+    width = nice_bin_width(lo, hi, bins)
+    start = math.floor(lo / width) * width
+    # CAST(... AS INTEGER)는 0 방향으로 버리지만, start 기준으로 항상 0 이상이므로 내림과 같음
+    return f"({start!r} + CAST((CAST({col} AS REAL) - {start!r}) / {width!r} AS INTEGER) * {width!r})"
+
+def build_aggregate_sql(sql_query, x_column, agg="count", y_column=None, x_expr=None):
+    """사용자 쿼리를 감싸 x별 COUNT(*) 또는 SUM(y)을 계산하는 SQL을 만듭니다.
+    x_expr를 주면 x 컬럼 대신 구간 식으로 묶습니다. 결과 컬럼: x, value"""
+    x_expr = x_expr or quote_ident(x_column)
+    if agg == "sum":
+        if not y_column:
+            raise ValueError("sum 집계에는 y_column이 필요합니다.")
+        value_expr = f"SUM({quote_ident(y_column)})"
+    elif agg == "count":
+        value_expr = "COUNT(*)"
+    else:
+        raise ValueError(f"지원하지 않는 집계 방식입니다: {agg}")
+    return (f"SELECT {x_expr} AS x, {value_expr} AS value "
+            f"FROM ({base_query(sql_query)}) GROUP BY 1 ORDER BY 1")
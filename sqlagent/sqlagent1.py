@@ -1,43 +1,71 @@
 import streamlit as st
-import pandas as pd
 import sqlite3
-import google.generativeai as genai
+from upload_store import session_upload, open_readonly
+from result_store import get_session_result_store
+from schema_cache import get_db_schema, schema_digest
+from query_guard import run_guarded_query, QueryRejected, QueryTimeout
+from nl_sql_cache import get_nl_sql_cache, schema_fingerprint, is_valid_select
+from llm_provider import get_llm_provider, DEFAULT_PROVIDER
+from llm_async import generate_with_deadline
 import re
+import time
 
 # SQLite 연결 설정 함수
 def connect_to_sqlite(db_file):
     try:
-        conn = sqlite3.connect(db_file)
+        conn = open_readonly(db_file)  # 업로드 저장소 파일은 바뀌지 않으므로 읽기 전용(immutable)으로 연결
         return conn
     except Exception as e:
         st.error(f"SQLite 연결 실패: {e}")
         return None
 
-# 자연어 쿼리를 SQL 쿼리로 변환하는 함수
-def generate_sql_query(natural_language_query, table_name=None):
+# 자연어 쿼리를 SQL 쿼리로 변환하는 함수 (같은 질문/스키마/모델이면 캐시된 결과 사용)
+def generate_sql_query(natural_language_query, table_name=None, conn=None, provider=None, nl_cache=None):
+    nl_cache = nl_cache or get_nl_sql_cache() # 벤치마크 등에서는 별도 캐시를 넘겨 사용
+    schema_fp = schema_fingerprint(conn, table_name)
+    cached_sql = nl_cache.get(natural_language_query, table_name, schema_fp, provider.model_name)
+    if cached_sql:
+        st.caption("이전에 생성된 SQL을 재사용합니다. (Gemini 호출 생략)")
+        return cached_sql
+
     if table_name:
         prompt = f"Generate only SQL query for table '{table_name}': {natural_language_query}"
     else:
         prompt = f"Generate only SQL query: {natural_language_query}"
+    if conn is not None: # 테이블/컬럼/인덱스 요약을 함께 전달 (스키마 캐시 사용)
+        prompt = f"SQLite schema:\n{schema_digest(get_db_schema(conn=conn), table_name)}\n\n" + prompt
 
-    model = genai.GenerativeModel(MODEL_NAME)
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        response_text = generate_with_deadline(provider, prompt) # 시간 제한 + 일시적 오류 재시도
+        sql_query = extract_sql_query(response_text).strip()
+        if not is_valid_select(conn, sql_query): # 설명/거절 응답이나 실행할 수 없는 SQL은 실행/캐시하지 않음
+            st.warning(f"Gemini가 실행 가능한 SELECT 쿼리를 생성하지 못했습니다. 응답: \"{response_text}\"")
+            return None
+        nl_cache.put(natural_language_query, table_name, schema_fp, provider.model_name, sql_query)
+        return sql_query
     except Exception as e:
         st.error(f"Gemini API 오류: {e}")
         return None
 
 # SQL 쿼리를 실행하고 결과를 st.write로 표시하는 함수
-def execute_sql_and_display(conn, sql_query):
+def execute_sql_and_display(conn, sql_query, llm_ms=None):
     try:
         sql_query = extract_sql_query(sql_query)
         sql_query = sql_query.strip()
-        df = pd.read_sql_query(sql_query, conn)
+        result = run_guarded_query(conn, sql_query, source="sqlagent1", llm_ms=llm_ms) # 쿼리 기록 + 실행 계획 검사 + 제한 시간/행 수 (DB가 바뀌지 않았으면 캐시 사용)
+        df = result['df']
         with st.expander("결과 보기"):
-            st.write(f"총 행 수: {len(df)}")
+            st.write(f"총 행 수: {len(df)}" + (" (캐시된 결과)" if result['cache_hit'] else "")
+                     + (" - 최대 행 수에 도달하여 일부만 가져옴" if result['truncated'] else ""))
             st.write(df)
-        st.session_state['df'] = df  # 데이터프레임 저장
+        st.caption(f"소요 시간: {result['elapsed'] * 1000:.0f} ms")
+        for warning in result['warnings']:
+            st.warning(f"인덱스를 사용하지 않는 조회: {warning}")
+        with st.expander("실행 계획 (EXPLAIN QUERY PLAN)"):
+            st.code("\n".join(result['plan']) or "(없음)")
+        get_session_result_store(st.session_state).put("sqlagent1", df)  # 페이지별 결과 저장 (세션 메모리 한도 초과 시 Parquet로 내려보냄)
+    except (QueryRejected, QueryTimeout) as guard_err:
+        st.error(f"쿼리가 실행되지 않았습니다: {guard_err}")
     except sqlite3.Error as db_err:
         st.error(f"데이터베이스 오류: {db_err}")
         raise db_err
@@ -55,13 +83,10 @@ def extract_sql_query(text):
         return match.group(1).strip()
     return text
 
-# SQLite 테이블 목록을 가져오는 함수
-def get_table_names(conn):
+# SQLite 테이블 목록을 가져오는 함수 (스키마 캐시 사용: 같은 DB면 카탈로그를 다시 조회하지 않음)
+def get_table_names(db_file):
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [row[0] for row in cursor.fetchall()]
-        return tables
+        return list(get_db_schema(db_file)['tables'])
     except sqlite3.Error as e:
         st.error(f"테이블 목록을 가져오는 중 오류 발생: {e}")
         return []
@@ -71,45 +96,39 @@ def main():
     st.title("SQL Agent with Gemini")
 
     # 세션 상태 초기화
-    if 'df' not in st.session_state:
-        st.session_state['df'] = pd.DataFrame()
     if 'selected_row' not in st.session_state:
         st.session_state['selected_row'] = None
     if 'selected_row_index' not in st.session_state:
         st.session_state['selected_row_index'] = 1  # 초기값 1로 설정
 
-    # Gemini API 키 입력
-    api_key = st.text_input("Gemini API 키를 입력하세요:", type="password")
-    if api_key:
-        genai.configure(api_key=api_key)
-        global MODEL_NAME
-        MODEL_NAME = 'gemini-1.5-flash'
+    # Gemini API 키 입력 (LLM_PROVIDER=stub이면 키 없이 로컬 스텁 사용)
+    if DEFAULT_PROVIDER == "stub":
+        provider = get_llm_provider(provider_name="stub")
+        st.caption(f"LLM 백엔드: stub ({provider.model_name})")
+    else:
+        api_key = st.text_input("Gemini API 키를 입력하세요:", type="password")
+        provider = get_llm_provider(api_key=api_key) if api_key else None
+    if provider:
 
         # SQLite 파일 선택 (파일 업로드)
         uploaded_file = st.file_uploader("SQLite 파일 업로드", type=["db", "sqlite", "sqlite3"], key="sqlite_uploader1")
 
-        if uploaded_file is not None:
-            db_file = "temp.db"  # 임시 파일 이름
-            with open(db_file, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            st.session_state['db_file'] = db_file
-            st.session_state['table_names'] = []
-
-        if 'db_file' in st.session_state:
-            db_file = st.session_state['db_file']
-            st.write(f"선택된 파일: {uploaded_file.name if uploaded_file else '임시파일'}")
-
-            conn = connect_to_sqlite(db_file)
-            if conn:
-                table_names = get_table_names(conn)
-                if table_names:
-                    st.session_state['table_names'] = table_names
-                else:
-                    st.write('테이블이 없습니다.')
-                conn.close()
-
-            if st.session_state['table_names']:
-                selected_table = st.selectbox("테이블 선택:", st.session_state['table_names'], key="sqlagent1_table_selector1")
+        previous_db_file = st.session_state.get('sqlagent1_db_file')
+        db_file, db_name = session_upload(st.session_state, "sqlagent1", uploaded_file)  # 내용 해시 경로에 한 번만 저장, 경로는 페이지 전용 키에 유지
+        if db_file != previous_db_file:  # 다른 파일로 바뀐 경우에만 초기화
+            st.session_state['sqlagent1_table_names'] = []
+
+        if db_file:
+            st.write(f"선택된 파일: {db_name}")
+
+            table_names = get_table_names(db_file)
+            if table_names:
+                st.session_state['sqlagent1_table_names'] = table_names
+            else:
+                st.write('테이블이 없습니다.')
+
+            if st.session_state['sqlagent1_table_names']:
+                selected_table = st.selectbox("테이블 선택:", st.session_state['sqlagent1_table_names'], key="sqlagent1_table_selector1")
             else:
                 selected_table = None
 
@@ -118,10 +137,12 @@ def main():
             if st.button("실행", key="sqlagent1_button1"):
                 conn = connect_to_sqlite(db_file)
                 if conn:
-                    sql_query = generate_sql_query(natural_language_query, selected_table)
+                    llm_start = time.perf_counter()
+                    sql_query = generate_sql_query(natural_language_query, selected_table, conn, provider)
+                    llm_ms = (time.perf_counter() - llm_start) * 1000
                     if sql_query:
                         st.write(f"생성된 SQL 쿼리:\n{sql_query}")
-                        execute_sql_and_display(conn, sql_query)
+                        execute_sql_and_display(conn, sql_query, llm_ms)
                     conn.close()
 
             else:
@@ -133,4 +154,4 @@ def main():
         st.write('Gemini API 키를 입력해주세요.')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
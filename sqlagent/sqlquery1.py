@@ -1,39 +1,83 @@
 import streamlit as st
 import pandas as pd
 import sqlite3
+from upload_store import session_upload, open_readonly
+from result_store import get_session_result_store
+from schema_cache import get_db_schema
+import time
+from query_jobs import submit_query, submit_script, split_statements, ScriptJob
+from query_history import record_query
 
 # SQLite 연결 설정 함수
 def connect_to_sqlite(db_file):
     try:
-        conn = sqlite3.connect(db_file)
+        conn = open_readonly(db_file)  # 업로드 저장소 파일은 바뀌지 않으므로 읽기 전용(immutable)으로 연결
         return conn
     except Exception as e:
         st.error(f"SQLite 연결 실패: {e}")
         return None
 
-# SQL 쿼리를 실행하고 결과를 st.write로 표시하는 함수
-def execute_sql_and_display(conn, sql_query):
-    try:
-        sql_query = sql_query.strip()
-        df = pd.read_sql_query(sql_query, conn)
-        with st.expander("결과 보기"):
-            st.write(f"총 행 수: {len(df)}")
-            st.write(df)
-        st.session_state['df'] = df  # 데이터프레임 저장
-    except sqlite3.Error as db_err:
-        st.error(f"데이터베이스 오류: {db_err}")
-        raise db_err
-    except Exception as e:
-        st.error(f"알 수 없는 오류: {e}")
-        raise e
+JOB_POLL_INTERVAL = 0.5   # 실행 중 화면 갱신 주기(초)
+PREVIEW_ROWS = 1000       # 실행 중에 미리 보여줄 최대 행 수
 
-# SQLite 테이블 목록을 가져오는 함수
-def get_table_names(conn):
+# 스크립트 작업의 문별 상태/소요 시간/행 수/실행 계획을 표시하는 함수
+def display_script_statements(job):
+    st.dataframe(pd.DataFrame([{"번호": i + 1, "SQL": info['sql'], "상태": info['status'],
+                                "소요 시간(ms)": None if info['elapsed'] is None else round(info['elapsed'] * 1000, 1),
+                                "행 수": info['rows'], "결과": "✔" if i == job.result_statement else "",
+                                "오류": info['error']} for i, info in enumerate(job.statements)]), hide_index=True)
+    with st.expander("문별 실행 계획 (EXPLAIN QUERY PLAN)"):
+        for i, info in enumerate(job.statements):
+            if info['plan']:
+                st.code(f"-- {i + 1}. {info['sql']}\n" + "\n".join(info['plan']))
+
+# 백그라운드 쿼리 작업의 진행 상황/결과를 표시하는 함수
+def display_query_job(job):
+    is_script = isinstance(job, ScriptJob)
+    if job.running:
+        progress = f" · {job.current + 1}/{len(job.statements)}번째 문" if is_script and job.current is not None else ""
+        st.info(f"실행 중... 가져온 행: {job.rows_fetched:,} ({job.elapsed:.1f}초){progress}")
+        if st.button("취소", key="sqlquery1_cancel_button"):
+            job.cancel()
+        if job.rows_fetched:
+            st.dataframe(job.to_dataframe(limit=PREVIEW_ROWS)) # 먼저 도착한 행 미리 보기
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun() # 작업이 끝날 때까지 주기적으로 다시 그림
+    store = get_session_result_store(st.session_state)
+    if store.get_meta("sqlquery1").get("job_id") != id(job):
+        # 끝난 작업의 행은 세션 결과 저장소로 옮기고 작업 객체에서는 비움 (같은 결과를 두 번 들고 있지 않도록)
+        taken = job.take_dataframe()
+        record_query("sqlquery1", job.sql_query, total_ms=job.elapsed * 1000, rows=len(taken),
+                     nbytes=int(taken.memory_usage(deep=True).sum()), cache_hit=False,
+                     error=None if job.status == "done" else (job.error or job.status), **job.timings)
+        store.put("sqlquery1", taken, job_id=id(job))
+    df = store.get("sqlquery1")
+    if df is None: df = pd.DataFrame()
+    if is_script:
+        display_script_statements(job)
+    if job.status == "done":
+        if is_script and job.result_statement is None:
+            st.success(f"스크립트 {len(job.statements)}개 문을 실행했습니다. (결과 행을 반환한 문 없음)")
+        else:
+            with st.expander("결과 보기", expanded=True):
+                st.write(f"총 행 수: {len(df)}" + (" - 최대 행 수에 도달하여 일부만 가져옴" if job.truncated else ""))
+                st.write(df)
+    elif job.status == "cancelled":
+        st.warning(f"쿼리를 취소했습니다. 취소 전까지 가져온 행: {len(df):,}")
+        if not df.empty: st.write(df)
+    else:
+        st.error(f"쿼리가 실행되지 않았습니다: {job.error}")
+    st.caption(f"소요 시간: {job.elapsed * 1000:.0f} ms")
+    for warning in job.warnings:
+        st.warning(f"인덱스를 사용하지 않는 조회: {warning}")
+    if job.plan and not is_script:
+        with st.expander("실행 계획 (EXPLAIN QUERY PLAN)"):
+            st.code("\n".join(job.plan))
+
+# SQLite 테이블 목록을 가져오는 함수 (스키마 캐시 사용: 같은 DB면 카탈로그를 다시 조회하지 않음)
+def get_table_names(db_file):
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = [row[0] for row in cursor.fetchall()]
-        return tables
+        return list(get_db_schema(db_file)['tables'])
     except sqlite3.Error as e:
         st.error(f"테이블 목록을 가져오는 중 오류 발생: {e}")
         return []
@@ -43,8 +87,6 @@ def main():
     st.title("SQL쿼리 조회")
 
     # 세션 상태 초기화
-    if 'df' not in st.session_state:
-        st.session_state['df'] = pd.DataFrame()
     if 'selected_row' not in st.session_state:
         st.session_state['selected_row'] = None
     if 'selected_row_index' not in st.session_state:
@@ -53,28 +95,22 @@ def main():
     # SQLite 파일 선택 (파일 업로드)
     uploaded_file = st.file_uploader("SQLite 파일 업로드", type=["db", "sqlite", "sqlite3"], key="sqlite_uploader2")
 
-    if uploaded_file is not None:
-        db_file = "temp.db"  # 임시 파일 이름
-        with open(db_file, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        st.session_state['db_file'] = db_file
-        st.session_state['table_names'] = []
-
-    if 'db_file' in st.session_state:
-        db_file = st.session_state['db_file']
-        st.write(f"선택된 파일: {uploaded_file.name if uploaded_file else '임시파일'}")
-
-        conn = connect_to_sqlite(db_file)
-        if conn:
-            table_names = get_table_names(conn)
-            if table_names:
-                st.session_state['table_names'] = table_names
-            else:
-                st.write('테이블이 없습니다.')
-            conn.close()
+    previous_db_file = st.session_state.get('sqlquery1_db_file')
+    db_file, db_name = session_upload(st.session_state, "sqlquery1", uploaded_file)  # 내용 해시 경로에 한 번만 저장, 경로는 페이지 전용 키에 유지
+    if db_file != previous_db_file:  # 다른 파일로 바뀐 경우에만 초기화
+        st.session_state['sqlquery1_table_names'] = []
 
-        if st.session_state['table_names']:
-            selected_table = st.selectbox("테이블 선택:", st.session_state['table_names'],key="sqlquery1_table_selector2")
+    if db_file:
+        st.write(f"선택된 파일: {db_name}")
+
+        table_names = get_table_names(db_file)
+        if table_names:
+            st.session_state['sqlquery1_table_names'] = table_names
+        else:
+            st.write('테이블이 없습니다.')
+
+        if st.session_state['sqlquery1_table_names']:
+            selected_table = st.selectbox("테이블 선택:", st.session_state['sqlquery1_table_names'],key="sqlquery1_table_selector2")
             default_query = f"SELECT * FROM {selected_table} LIMIT 10;"  # 선택한 테이블에 대한 기본 쿼리 생성
             sql_query = st.text_area("SQL 쿼리 입력:", value=default_query) # 기본 쿼리를 text_area에 표시
 
@@ -83,14 +119,30 @@ def main():
             sql_query = st.text_area("SQL 쿼리 입력:", "SELECT * FROM table_name LIMIT 10;")
 
 
+        # 스크립트: 여러 문을 한 연결/트랜잭션에서 차례로 실행 (TEMP 테이블 준비 후 조회 등), 결과는 한 문만 가져옴
+        run_mode = st.radio("실행 방식:", ("단일 쿼리", "스크립트"), key="sqlquery1_run_mode", horizontal=True)
+        result_index = None
+        if run_mode == "스크립트":
+            statements = split_statements(sql_query)
+            result_options = ["마지막 결과"] + [f"{i + 1}. {stmt[:80]}" for i, stmt in enumerate(statements)]
+            result_choice = st.selectbox("결과를 가져올 문:", result_options, key="sqlquery1_result_statement")
+            if result_choice in result_options[1:]:
+                result_index = result_options.index(result_choice) - 1
+
         if st.button("실행", key="sqlquery1_button1"):
-            conn = connect_to_sqlite(db_file)
-            if conn:
-                execute_sql_and_display(conn, sql_query)
-                conn.close()
+            previous_job = st.session_state.get('sqlquery1_job')
+            if previous_job is not None and previous_job.running:
+                previous_job.cancel() # 이전 쿼리가 아직 실행 중이면 중단
+            if run_mode == "스크립트":
+                st.session_state['sqlquery1_job'] = submit_script(db_file, statements, result_index)
+            else:
+                st.session_state['sqlquery1_job'] = submit_query(db_file, sql_query)
+
+        if st.session_state.get('sqlquery1_job') is not None:
+            display_query_job(st.session_state['sqlquery1_job'])
 
     else:
         st.write('SQLite 파일을 먼저 업로드해주세요.')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,133 @@
+import os
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+# --- 업로드된 SQLite 파일 저장소 ---
+# 예전에는 페이지마다 스크립트가 다시 실행될 때마다 업로드 내용을 작업 폴더의 temp.db에 덮어썼습니다.
+# (큰 파일은 매번 다시 쓰고, 동시 사용자끼리 서로의 파일을 덮어씀)
+# 이제는 업로드 하나당 한 번만 해시를 계산하고, 내용 해시 이름의 파일로 한 번만 씁니다.
+#   - 내용이 같으면 같은 경로 → 다시 쓰지 않음 / 내용이 다르면 다른 경로 → 서로 덮어쓰지 않음
+#   - 한 번 쓴 파일은 바뀌지 않으므로 read-only + immutable URI로 엽니다. (잠금/변경 확인 생략)
+#   - 전체 크기가 UPLOAD_STORE_MAX_MB를 넘으면 가장 오래 사용하지 않은 파일부터 삭제
+UPLOAD_STORE_DIR = os.environ.get("UPLOAD_STORE_DIR", os.path.join(tempfile.gettempdir(), "sqlagent_uploads"))
+UPLOAD_STORE_MAX_BYTES = int(os.environ.get("UPLOAD_STORE_MAX_MB", "2048")) * 1024 * 1024
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+UPLOAD_KEYS_MAX = 256
+
+_upload_paths = OrderedDict()   # 업로드 식별자 -> 저장 경로 (같은 업로드는 다시 해시하지 않음)
+_store_lock = threading.Lock()
+
+def _upload_key(uploaded_file):
+    """Streamlit UploadedFile 식별자 (버전에 따라 file_id 또는 id, 없으면 이름/크기)"""
+    file_id = getattr(uploaded_file, "file_id", None) or getattr(uploaded_file, "id", None)
+    return file_id if file_id is not None else (uploaded_file.name, uploaded_file.size)
+
+def content_hash(buffer):
+    """업로드 내용의 SHA-256 (큰 파일도 청크 단위로 계산)"""
+    view = memoryview(buffer)
+    digest = hashlib.sha256()
+    for offset in range(0, len(view), HASH_CHUNK_SIZE):
+        digest.update(view[offset:offset + HASH_CHUNK_SIZE])
+    return digest.hexdigest()
+
+def store_upload(uploaded_file, store_dir=UPLOAD_STORE_DIR, max_bytes=UPLOAD_STORE_MAX_BYTES):
+    """업로드 파일을 내용 해시 경로에 저장하고 경로를 반환합니다. (이미 있으면 쓰지 않음)"""
+    key = _upload_key(uploaded_file)
+    with _store_lock:
+        path = _upload_paths.get(key)
+        if path is not None and os.path.exists(path):
+            _upload_paths.move_to_end(key)
+            _touch(path)
+            return path
+    buffer = uploaded_file.getbuffer()
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, content_hash(buffer) + ".db")
+    with _store_lock:
+        if os.path.exists(path):
+            _touch(path)
+        else: # 임시 파일에 쓴 뒤 이름 변경 (다른 세션이 쓰다 만 파일을 열지 않도록)
+            fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(buffer)
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path): os.remove(tmp_path)
+                raise
+        _upload_paths[key] = path
+        while len(_upload_paths) > UPLOAD_KEYS_MAX:
+            _upload_paths.popitem(last=False)
+        _evict(store_dir, max_bytes, keep=path)
+    return path
+
+def session_upload(session_state, page, uploaded_file, store_dir=UPLOAD_STORE_DIR):
+    """업로드 파일을 저장소에 넣고, 경로와 파일 이름을 페이지 전용 세션 키({page}_db_file, {page}_db_name)에 기억합니다.
+    다른 탭을 보는 동안 업로더 위젯 값이 정리되어도 기억한 파일을 계속 사용합니다.
+    (경로, 파일 이름)을 반환하며, 기억한 파일이 없거나 저장소에서 정리되었으면 (None, None)을 반환합니다."""
+    path_key, name_key = f"{page}_db_file", f"{page}_db_name"
+    if uploaded_file is not None:
+        session_state[path_key] = store_upload(uploaded_file, store_dir)
+        session_state[name_key] = uploaded_file.name
+    path = session_state.get(path_key)
+    if path is None or not os.path.exists(path):
+        session_state.pop(path_key, None)
+        session_state.pop(name_key, None)
+        return None, None
+    return path, session_state.get(name_key)
+
+def open_readonly(db_file):
+    """저장소의 DB 파일을 읽기 전용(immutable)으로 엽니다. 저장소 밖의 파일은 일반 읽기 전용으로 엽니다."""
+    db_file = os.path.abspath(db_file)
+    immutable = os.path.dirname(db_file) == os.path.abspath(UPLOAD_STORE_DIR)
+    if immutable:
+        _touch(db_file)
+    uri = f"file:{quote(db_file)}?mode=ro" + ("&immutable=1" if immutable else "")
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+def store_usage(store_dir=UPLOAD_STORE_DIR):
+    """저장소의 (파일 수, 전체 바이트)"""
+    files = _list_files(store_dir)
+    return len(files), sum(size for _, _, size in files)
+
+def _touch(path):
+    """최근 사용 시각 갱신 (LRU 삭제 순서 기준)"""
+    try: os.utime(path, None)
+    except OSError: pass
+
+def _list_files(store_dir):
+    files = []
+    try:
+        names = os.listdir(store_dir)
+    except OSError:
+        return files
+    for name in names:
+        if name.endswith(".db"):
+            path = os.path.join(store_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+    return files
+
+def _evict(store_dir, max_bytes, keep=None):
+    """(잠금 보유 상태에서 호출) 한도를 넘으면 가장 오래 사용하지 않은 파일부터 삭제"""
+    from query_cache import close_monitors # query_cache가 이 모듈을 import하므로 순환 import를 피해 여기서 import
+    files = sorted(_list_files(store_dir))
+    total = sum(size for _, _, size in files)
+    for _, path, size in files:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        close_monitors(path) # 열린 감시용 연결이 있으면 먼저 닫음 (Windows에서는 열린 파일을 삭제할 수 없음)
+        try:
+            os.remove(path)
+            total -= size
+            print(f"업로드 저장소 정리: {os.path.basename(path)} 삭제 ({size / 1024 / 1024:.1f} MB)")
+        except OSError as e:
+            print(f"업로드 저장소 파일 삭제 실패: {e}")
@@ -0,0 +1,193 @@
+import io
+import os
+import sys
+import sqlite3
+import threading
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rfpanal"))
+import db_scbank
+import csv_ingest
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "scbank.db")
+    db_scbank.create_table(path)
+    yield path
+    db_scbank.stop_write_queues()
+    db_scbank.close_all_connections()
+
+def test_thread_connections_are_closed_when_thread_ends(db_path):
+    opened = []
+    def rerun():
+        conn = db_scbank.get_connection(db_path)
+        conn.execute("SELECT COUNT(*) FROM chk1_table").fetchone()
+        opened.append(conn)
+    for _ in range(20):
+        thread = threading.Thread(target=rerun)
+        thread.start()
+        thread.join()
+    assert len(db_scbank._all_connections) == 1   # 메인 스레드 연결만 남음
+    for conn in opened:
+        with pytest.raises(Exception):
+            conn.execute("SELECT 1")
+
+# --- 상태를 가진 DB 로직 (마이그레이션, FTS, 교체, Upsert, 집계, 쓰기 큐) ---
+def make_row(cat1, desc="desc", status="open", owner="kim", memo=""):
+    return (cat1, "c2", "c3", "c4", "c5", desc, owner, "action", status, "ok", memo)
+
+def insert_rows(db_path, rows):
+    assert db_scbank.bulk_insert_chunks([rows], db_path=db_path) == len(rows)
+
+def schema_objects(db_path, kind):
+    conn = db_scbank.get_connection(db_path)
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type=? AND tbl_name='chk1_table'", (kind,))}
+
+def test_migrate_upgrades_existing_db(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn: # 마이그레이션 이전(user_version=0) DB
+        conn.execute('''CREATE TABLE chk1_table(id INTEGER PRIMARY KEY, cat1 TEXT, cat2 TEXT, cat3 TEXT, cat4 TEXT,
+                        cat5 TEXT, desc TEXT, owner TEXT, action TEXT, status TEXT, result TEXT, memo TEXT)''')
+        conn.execute("INSERT INTO chk1_table VALUES (1, 'a', 'b', 'c', 'd', 'e', '서버 점검', 'kim', 'x', 'open', 'ok', '')")
+    conn.close()
+    try:
+        db_scbank.create_table(path)
+        assert db_scbank.get_schema_version(path) == db_scbank.SCHEMA_VERSION
+        assert "idx_chk1_status_owner" in schema_objects(path, "index")
+        assert [row[0] for row in db_scbank.search_data("점검", db_path=path)] == [1] # 기존 행도 FTS에 반영
+        assert db_scbank.count_data(path) == 1
+        assert db_scbank.migrate(path) == [] # 이미 최신이면 아무 것도 하지 않음
+    finally:
+        db_scbank.close_all_connections()
+
+def test_migrate_rechecks_version_after_lock(db_path, monkeypatch):
+    # 다른 세션이 먼저 적용한 상황: 잠금 전에 읽은 버전은 0이지만 실제 DB는 이미 최신
+    monkeypatch.setattr(db_scbank, "get_schema_version", lambda db_path=None: 0)
+    assert db_scbank.migrate(db_path) == []
+    conn = db_scbank.get_connection(db_path)
+    assert not conn.in_transaction
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db_scbank.SCHEMA_VERSION
+
+def test_fts_follows_insert_update_delete(db_path):
+    new_id = db_scbank.add_data(*make_row("a", desc="디스크 용량 부족"), db_path=db_path)
+    assert [row[0] for row in db_scbank.search_data("디스크", db_path=db_path)] == [new_id]
+    assert db_scbank.update_data(new_id, db_path=db_path, desc="메모리 누수")
+    assert db_scbank.search_data("디스크", db_path=db_path) == []
+    result = db_scbank.search_data("메모리", db_path=db_path)
+    assert [row[0] for row in result] == [new_id] and "**메모리**" in result[0][4]
+    db_scbank.get_write_queue(db_path).submit("DELETE FROM chk1_table WHERE id=?", (new_id,)).result(timeout=5)
+    assert db_scbank.search_data("메모리", db_path=db_path) == []
+
+def test_fts_query_escapes_special_characters(db_path):
+    insert_rows(db_path, [make_row("a", desc='"quoted" AND (paren)')])
+    assert len(db_scbank.search_data('"quoted', db_path=db_path)) == 1
+    assert db_scbank.search_data("   ", db_path=db_path) == []
+
+def test_summary_triggers_track_counts(db_path):
+    insert_rows(db_path, [make_row("a", status="open"), make_row("b", status="open"), make_row("c", status="done")])
+    assert db_scbank.count_data(db_path) == 3
+    assert db_scbank.get_status_counts(db_path) == [("open", 2), ("done", 1)]
+    assert db_scbank.update_data(3, db_path=db_path, status="open")
+    assert db_scbank.get_status_counts(db_path) == [("open", 3)] # cnt가 0이 된 값은 삭제
+    assert db_scbank.update_data(1, db_path=db_path, memo="x") # 집계 컬럼이 아니면 그대로
+    assert db_scbank.get_summary_counts("cat1", db_path) == [("a", 1), ("b", 1), ("c", 1)]
+    db_scbank.get_write_queue(db_path).submit("DELETE FROM chk1_table WHERE id=1").result(timeout=5)
+    assert db_scbank.count_data(db_path) == 2
+    assert db_scbank.get_summary_counts("cat1", db_path) == [("b", 1), ("c", 1)]
+    with pytest.raises(ValueError):
+        db_scbank.get_summary_counts("memo", db_path)
+
+def test_replace_table_recreates_dependents_and_derived_data(db_path):
+    insert_rows(db_path, [make_row("old", desc="예전 항목")])
+    indexes, triggers = schema_objects(db_path, "index"), schema_objects(db_path, "trigger")
+    progress = []
+    total = db_scbank.replace_table_chunks([[make_row("x", desc="새 항목")], [make_row("y", status="done")]],
+                                           db_path=db_path, progress_callback=lambda n, _: progress.append(n))
+    assert total == 2 and progress == [1, 2]
+    assert schema_objects(db_path, "index") == indexes
+    assert schema_objects(db_path, "trigger") == triggers
+    assert "chk1_table_shadow" not in {row[0] for row in db_scbank.get_connection(db_path).execute(
+        "SELECT name FROM sqlite_master WHERE type='table'")}
+    assert db_scbank.search_data("예전", db_path=db_path) == []
+    assert len(db_scbank.search_data("새", db_path=db_path)) == 1
+    assert db_scbank.count_data(db_path) == 2
+    assert db_scbank.get_status_counts(db_path) == [("done", 1), ("open", 1)]
+    # 다시 만든 트리거가 교체 후 변경에도 동작
+    db_scbank.add_data(*make_row("z", desc="추가 항목"), db_path=db_path)
+    assert db_scbank.count_data(db_path) == 3
+    assert len(db_scbank.search_data("추가", db_path=db_path)) == 1
+
+def test_replace_table_failure_keeps_old_data(db_path):
+    insert_rows(db_path, [make_row("old", desc="예전 항목")])
+    def chunks():
+        yield [make_row("x")]
+        yield [("too", "few")] # 컬럼 수가 맞지 않아 실패
+    assert db_scbank.replace_table_chunks(chunks(), db_path=db_path) is None
+    assert [row[1] for row in db_scbank.view_all_data(db_path)] == ["old"]
+    assert len(db_scbank.search_data("예전", db_path=db_path)) == 1
+    assert db_scbank.count_data(db_path) == 1
+
+def write_csv(rows):
+    lines = [",".join(db_scbank.CHK1_COLUMNS)] + [",".join(row) for row in rows]
+    return io.StringIO("\n".join(lines) + "\n")
+
+def test_upsert_applies_only_changes(db_path):
+    insert_rows(db_path, [make_row("a"), make_row("b"), make_row("c")])
+    csv_file = write_csv([make_row("a"), make_row("b", status="done"), make_row("d")])
+    diff = csv_ingest.upsert_csv(csv_file, db_path=db_path)
+    assert (diff["added"], diff["changed"], diff["removed"], diff["unchanged"]) == (1, 1, 1, 1)
+    assert diff["removed_preview"] == [3]
+    rows = {row[1]: row for row in db_scbank.view_all_data(db_path)}
+    assert sorted(rows) == ["a", "b", "d"] and rows["b"][9] == "done" and rows["b"][0] == 2 # 변경 행은 id 유지
+    assert db_scbank.get_status_counts(db_path) == [("open", 2), ("done", 1)]
+    # 같은 CSV로 다시 실행하면 저장된 해시와 같아 변경 없음
+    again = csv_ingest.upsert_csv(write_csv([make_row("a"), make_row("b", status="done"), make_row("d")]), db_path=db_path)
+    assert (again["added"], again["changed"], again["removed"], again["unchanged"]) == (0, 0, 0, 3)
+
+def test_upsert_recomputes_hash_after_direct_update(db_path):
+    insert_rows(db_path, [make_row("a")])
+    csv_ingest.upsert_csv(write_csv([make_row("a")]), db_path=db_path)
+    assert db_scbank.update_data(1, db_path=db_path, memo="직접 수정") # 트리거가 저장된 해시를 지움
+    diff = csv_ingest.upsert_csv(write_csv([make_row("a")]), db_path=db_path)
+    assert diff["changed"] == 1
+    assert db_scbank.view_all_data(db_path)[0][11] == ""
+
+def test_upsert_duplicate_keys(db_path):
+    insert_rows(db_path, [make_row("a"), make_row("a", owner="lee")]) # DB 안에서 같은 자연키
+    csv_file = write_csv([make_row("a"), make_row("a", owner="park"), make_row("b")]) # CSV 안에서 같은 자연키
+    diff = csv_ingest.upsert_csv(csv_file, db_path=db_path)
+    assert diff["csv_duplicates"] == 1 and diff["csv_rows"] == 3
+    assert (diff["added"], diff["changed"], diff["removed"], diff["unchanged"]) == (1, 0, 1, 1)
+    assert [(row[0], row[1], row[7]) for row in db_scbank.view_all_data(db_path)] == [(1, "a", "kim"), (3, "b", "kim")]
+
+def test_upsert_keeps_missing_rows_when_requested(db_path):
+    insert_rows(db_path, [make_row("a"), make_row("b")])
+    diff = csv_ingest.upsert_csv(write_csv([make_row("c")]), delete_missing=False, db_path=db_path)
+    assert (diff["added"], diff["removed"]) == (1, 0)
+    assert db_scbank.count_data(db_path) == 3
+
+def test_write_queue_failed_item_does_not_abort_batch(db_path):
+    wq = db_scbank.WriteQueue(db_path, max_wait=0.5) # 세 요청이 한 배치로 묶이도록 대기 시간을 늘림
+    try:
+        insert_sql = "INSERT INTO chk1_table(cat1, status) VALUES (?, ?)"
+        first = wq.submit(insert_sql, ("a", "open"))
+        bad = wq.submit("INSERT INTO chk1_table(no_such_column) VALUES (?)", ("x",))
+        last = wq.submit(insert_sql, ("b", "open"))
+        assert first.result(timeout=5) == 1
+        with pytest.raises(sqlite3.OperationalError):
+            bad.result(timeout=5)
+        assert last.result(timeout=5) == 2
+        stats = wq.stats()
+        assert (stats["batches"], stats["rows"], stats["errors"]) == (1, 3, 1)
+    finally:
+        wq.stop()
+    assert [row[1] for row in db_scbank.view_all_data(db_path)] == ["a", "b"]
+    assert db_scbank.count_data(db_path) == 2
+
+def test_write_queue_update_results(db_path):
+    insert_rows(db_path, [make_row("a")])
+    assert db_scbank.update_data(1, db_path=db_path, owner="lee")
+    assert not db_scbank.update_data(99, db_path=db_path, owner="lee") # 없는 id
+    with pytest.raises(ValueError):
+        db_scbank.update_data_async(1, db_path=db_path, no_such_column="x")
+    assert db_scbank.get_summary_counts("owner", db_path) == [("lee", 1)]
@@ -0,0 +1,23 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chart"))
+pytest.importorskip("plotly")
+import plotly.basedatatypes
+from chart_prep import result_chart_specs
+from figure_cache import FigureCache
+
+def test_capped_figures_are_serialized_once(monkeypatch):
+    df = pd.DataFrame({"status": ["ToDo", "Done", "Doing"] * 10, "owner": ["kim", "lee", "park"] * 10, "score": range(30)})
+    calls = []
+    to_json = plotly.basedatatypes.BaseFigure.to_json
+    monkeypatch.setattr(plotly.basedatatypes.BaseFigure, "to_json", lambda fig, *a, **k: calls.append(1) or to_json(fig, *a, **k))
+    cache = FigureCache()
+    for _, name, builder, spec in result_chart_specs(df):
+        before = len(calls)
+        fig, hit, _ = cache.get_or_build("fp", name, builder, *spec)
+        assert not hit and len(calls) - before == 1, name
+        assert cache.stats()["entries"] and cache._entries[("fp", name) + spec][1] == len(to_json(fig).encode("utf-8"))
+    assert all(cache.get_or_build("fp", name, builder, *spec)[1] for _, name, builder, spec in result_chart_specs(df))
@@ -0,0 +1,72 @@
+import os
+import sys
+import sqlite3
+from collections import OrderedDict
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sqlagent"))
+import query_cache
+from query_cache import read_sql_cached, data_stamp, close_monitors
+
+def make_db(path, rows=3):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE chk1_table(id INTEGER PRIMARY KEY, status TEXT)")
+    conn.executemany("INSERT INTO chk1_table(status) VALUES (?)", [("ToDo",)] * rows)
+    conn.commit()
+    return conn
+
+@pytest.fixture(autouse=True)
+def monitors(monkeypatch):
+    monkeypatch.setattr(query_cache, "_monitors", OrderedDict())
+    yield query_cache._monitors
+    close_monitors()
+
+def test_cache_misses_after_write_on_another_connection(tmp_path):
+    path = str(tmp_path / "data.db")
+    writer = make_db(path)
+    reader = sqlite3.connect(path)
+    sql = "SELECT COUNT(*) AS cnt FROM chk1_table"
+    df, hit = read_sql_cached(sql, reader, path)
+    assert not hit and df['cnt'][0] == 3
+    assert read_sql_cached(sql, reader, path)[1]
+    writer.execute("INSERT INTO chk1_table(status) VALUES ('Done')")
+    writer.commit()
+    df, hit = read_sql_cached(sql, reader, path)
+    assert not hit and df['cnt'][0] == 4
+    writer.close()
+    reader.close()
+
+def test_data_version_changes_on_commit(tmp_path):
+    path = str(tmp_path / "data.db")
+    writer = make_db(path)
+    before = data_stamp(path)
+    writer.execute("UPDATE chk1_table SET status = 'Done' WHERE id = 1")
+    writer.commit()
+    assert data_stamp(path)[0] != before[0]
+    writer.close()
+
+def test_upload_store_files_get_no_monitor(tmp_path, monkeypatch, monitors):
+    store_dir = tmp_path / "store"
+    store_dir.mkdir()
+    monkeypatch.setattr(query_cache, "UPLOAD_STORE_DIR", str(store_dir))
+    path = str(store_dir / "abc.db")
+    make_db(path).close()
+    assert data_stamp(path)[0] == "immutable"
+    assert not monitors
+
+def test_monitors_are_bounded_and_closed(tmp_path, monkeypatch, monitors):
+    monkeypatch.setattr(query_cache, "MONITOR_MAX_CONNECTIONS", 2)
+    paths = [str(tmp_path / f"db{i}.db") for i in range(3)]
+    for path in paths:
+        make_db(path).close()
+    data_stamp(paths[0])
+    first = next(iter(monitors.values()))
+    for path in paths[1:]:
+        data_stamp(path)
+    assert len(monitors) == 2
+    assert os.path.realpath(paths[0]) not in [key[0] for key in monitors]
+    with pytest.raises(sqlite3.ProgrammingError): # 밀려난 연결은 닫힘
+        first.execute("SELECT 1")
+    close_monitors(paths[1])
+    assert [key[0] for key in monitors] == [os.path.realpath(paths[2])]
@@ -0,0 +1,47 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sqlagent"))
+from query_guard import check_plan, fetch_limited, QueryRejected
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE chk1_table(id INTEGER PRIMARY KEY, status TEXT)")
+    conn.executemany("INSERT INTO chk1_table(status) VALUES (?)", [("ToDo",)] * 2000)
+    conn.execute("CREATE TABLE small(id INTEGER PRIMARY KEY, v TEXT)")
+    conn.execute("INSERT INTO small(v) VALUES ('ToDo')")
+    conn.commit()
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM chk1_table a, chk1_table b",
+    "SELECT * FROM chk1_table, chk1_table AS b",
+    "SELECT * FROM chk1_table a CROSS JOIN chk1_table b",
+])
+def test_aliased_cross_join_is_rejected(conn, sql):
+    with pytest.raises(QueryRejected):
+        check_plan(conn, sql, reject_rows=1000)
+
+def test_alias_resolves_to_table_rows(conn):
+    checked = check_plan(conn, "SELECT * FROM chk1_table a WHERE a.status = 'ToDo'")
+    assert checked['scans'] == [("a(chk1_table)", 2000)]
+
+def test_materialized_subquery_is_not_multiplied_with_its_own_scan(conn):
+    checked = check_plan(conn, "SELECT * FROM (SELECT * FROM chk1_table LIMIT 5) q, small", reject_rows=1000000)
+    assert checked['est_rows'] == 2000
+
+def test_unresolved_scans_are_treated_as_large(conn):
+    with pytest.raises(QueryRejected):
+        check_plan(conn, "WITH x AS (SELECT status FROM chk1_table GROUP BY status) SELECT * FROM x, x y",
+                   reject_rows=1000)
+
+@pytest.mark.parametrize("sql", ["DELETE FROM chk1_table", "WITH x AS (SELECT 1) DELETE FROM chk1_table"])
+def test_fetch_limited_rejects_writes(conn, sql):
+    with pytest.raises(QueryRejected):
+        fetch_limited(conn, sql)
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM chk1_table").fetchone()[0] == 2000
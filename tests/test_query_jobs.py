@@ -0,0 +1,92 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sqlagent"))
+import query_jobs
+from query_jobs import QueryJob, ScriptJob
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "upload.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chk1_table(id INTEGER PRIMARY KEY, status TEXT)")
+    conn.executemany("INSERT INTO chk1_table(status) VALUES (?)", [("ToDo",), ("Done",), ("Done",)])
+    conn.commit()
+    conn.close()
+    return path
+
+def _fail(*args, **kwargs):
+    raise RuntimeError("boom")
+
+@pytest.mark.parametrize("make_job", [
+    lambda db_file: QueryJob(db_file, "SELECT * FROM chk1_table"),
+    lambda db_file: ScriptJob(db_file, ["SELECT * FROM chk1_table"]),
+])
+def test_unexpected_error_finishes_job(db_file, monkeypatch, make_job):
+    monkeypatch.setattr(query_jobs, "check_plan", _fail)
+    job = make_job(db_file)
+    job.run()
+    assert job.status == "error" and not job.running
+    assert "boom" in job.error
+
+@pytest.mark.parametrize("script, expected", [
+    ("SELECT 'a;b' AS x; -- c;d\nSELECT 2;", ["SELECT 'a;b' AS x;", "-- c;d\nSELECT 2;"]),
+    ("SELECT 1 /* x; y */ ;; ;\n-- 주석만 있는 문;\n", ["SELECT 1 /* x; y */ ;"]),
+    ('SELECT 1; SELECT "a;b" FROM t', ["SELECT 1;", 'SELECT "a;b" FROM t;']), # 마지막 문은 ; 없이 끝나도 포함
+    ("CREATE TEMP TRIGGER tr AFTER INSERT ON t BEGIN SELECT 1; SELECT 2; END; SELECT 3",
+     ["CREATE TEMP TRIGGER tr AFTER INSERT ON t BEGIN SELECT 1; SELECT 2; END;", "SELECT 3;"]),
+    ("  \n-- 비어 있음\n", []),
+])
+def test_split_statements(script, expected):
+    assert query_jobs.split_statements(script) == expected
+
+class KeepOpenConnection(sqlite3.Connection):
+    """작업이 끝난 뒤 연결 상태를 확인할 수 있도록 close()를 무시하는 연결"""
+    def close(self):
+        pass
+
+@pytest.fixture
+def writable_conn(db_file, monkeypatch):
+    # 읽기 전용 연결이 아니어도 스크립트의 변경이 마지막 ROLLBACK으로 모두 취소되는지 확인
+    conn = sqlite3.connect(db_file, check_same_thread=False, factory=KeepOpenConnection)
+    monkeypatch.setattr(query_jobs, "open_readonly", lambda path: conn)
+    yield conn
+    sqlite3.Connection.close(conn)
+
+def test_script_runs_in_one_transaction_and_rolls_back(db_file, writable_conn):
+    statements = query_jobs.split_statements("""
+        BEGIN;
+        CREATE TEMP TABLE done_rows AS SELECT * FROM chk1_table WHERE status = 'Done';
+        INSERT INTO chk1_table(status) VALUES ('New');
+        COMMIT;
+        SELECT COUNT(*) AS cnt FROM done_rows;
+        SELECT status FROM chk1_table ORDER BY id;
+        END;
+    """)
+    job = ScriptJob(db_file, statements)
+    job.run()
+    assert job.status == "done", job.error
+    assert [info['status'] for info in job.statements] == ["skipped", "done", "done", "skipped", "done", "done", "skipped"]
+    assert job.statements[2]['rows'] == 1 and job.statements[4]['rows'] == 1
+    assert job.result_statement == 5 # 행을 반환하는 마지막 문
+    assert job.to_dataframe()['status'].tolist() == ["ToDo", "Done", "Done", "New"] # COMMIT을 건너뛰어 같은 트랜잭션에서 보임
+    assert not writable_conn.in_transaction
+    assert writable_conn.execute("SELECT name FROM sqlite_temp_master").fetchall() == []
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM chk1_table").fetchone()[0] == 3
+
+def test_script_result_index_and_failing_statement(db_file):
+    job = ScriptJob(db_file, ["SELECT status FROM chk1_table", "SELECT COUNT(*) FROM chk1_table"], result_index=0)
+    job.run()
+    assert job.status == "done" and job.result_statement == 0
+    assert len(job.to_dataframe()) == 3 and job.statements[1]['rows'] == 1
+
+    job = ScriptJob(db_file, ["CREATE TEMP TABLE t AS SELECT 1 AS x", "INSERT INTO chk1_table(status) VALUES ('New')",
+                              "SELECT * FROM t"])
+    job.run()
+    assert job.status == "error" and job.error.startswith("2번째 문에서 중단")
+    assert [info['status'] for info in job.statements] == ["done", "error", "pending"] # 읽기 전용 연결이라 쓰기 실패
+    with sqlite3.connect(db_file) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM chk1_table").fetchone()[0] == 3
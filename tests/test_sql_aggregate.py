@@ -0,0 +1,21 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sqlagent"))
+from sql_aggregate import infer_column_kind
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "items.db"))
+    conn.execute("CREATE TABLE items(id INTEGER PRIMARY KEY, status TEXT, due TEXT, score REAL)")
+    conn.executemany("INSERT INTO items(status, due, score) VALUES (?, ?, ?)",
+                     [("ToDo", "2024-01-05", 1.5), ("Done", "2024-02-10 09:30:00", 2.0)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("column, kind", [("score", "numeric"), ("due", "date"), ("status", "category")])
+def test_infer_column_kind(conn, column, kind):
+    assert infer_column_kind(conn, "SELECT * FROM items;", column) == kind
@@ -0,0 +1,46 @@
+import os
+import sys
+import sqlite3
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sqlagent"))
+import upload_store
+
+class FakeUpload:
+    """Streamlit UploadedFile 대신 사용하는 최소 객체 (name, size, file_id, getbuffer)"""
+    def __init__(self, path, name="upload.db"):
+        with open(path, "rb") as f:
+            self._data = f.read()
+        self.name, self.size, self.file_id = name, len(self._data), f"id-{name}"
+
+    def getbuffer(self):
+        return memoryview(self._data)
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "_upload_paths", upload_store.OrderedDict())
+    return str(tmp_path / "store")
+
+@pytest.fixture
+def upload(tmp_path):
+    path = str(tmp_path / "source.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chk1_table(id INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+    return FakeUpload(path)
+
+def test_session_upload_keeps_path_when_uploader_is_cleared(store_dir, upload):
+    session_state = {}
+    db_file, name = upload_store.session_upload(session_state, "sqlquery1", upload, store_dir)
+    assert os.path.dirname(db_file) == store_dir and name == "upload.db"
+    # 다른 탭을 보는 동안 업로더 값이 정리되어 None이 와도 같은 파일을 사용
+    assert upload_store.session_upload(session_state, "sqlquery1", None, store_dir) == (db_file, "upload.db")
+    assert upload_store.session_upload(session_state, "barchart1", None, store_dir) == (None, None)
+
+def test_session_upload_forgets_evicted_file(store_dir, upload):
+    session_state = {}
+    db_file, _ = upload_store.session_upload(session_state, "sqlquery1", upload, store_dir)
+    os.remove(db_file)
+    assert upload_store.session_upload(session_state, "sqlquery1", None, store_dir) == (None, None)
+    assert "sqlquery1_db_file" not in session_state